@@ -0,0 +1,140 @@
+"""
+Measure throughput of concurrent patch and call workloads, for checking that
+patchy is correct and scales on free-threaded builds of Python.
+
+For each thread count, first one thread repeatedly patches and unpatches a
+shared function, while the remaining threads call it and check every result
+comes from one version or the other. Then every thread repeatedly patches and
+unpatches its own function. Each phase runs for a fixed duration. Run with:
+
+    python benchmarks/threads.py --threads 1 2 4 8 --duration 2
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import threading
+from collections.abc import Callable
+from time import perf_counter
+
+import patchy
+
+PATCH = """\
+@@ -1,2 +1,2 @@
+ def shared() -> int:
+-    return 1
++    return 2
+"""
+
+
+def shared() -> int:
+    return 1
+
+
+def make_private() -> Callable[[], int]:
+    def shared() -> int:
+        return 1
+
+    return shared
+
+
+def run(thread_count: int, duration: float) -> tuple[float, float, float]:
+    """
+    Return the rates of calls to the shared function while it's patched by
+    another thread, of patches to the shared function, and of patches to
+    functions private to each thread.
+    """
+    calls = [0] * thread_count
+    patches = [0]
+    private_patches = [0] * thread_count
+    stop = threading.Event()
+    barrier = threading.Barrier(thread_count + 1)
+    errors: list[BaseException] = []
+
+    def caller(index: int) -> None:
+        barrier.wait()
+        count = 0
+        while not stop.is_set():
+            if shared() not in (1, 2):
+                errors.append(AssertionError("Torn call"))
+            count += 1
+        calls[index] = count
+
+    def patcher() -> None:
+        barrier.wait()
+        count = 0
+        while not stop.is_set():
+            patchy.patch(shared, PATCH)
+            patchy.unpatch(shared, PATCH)
+            count += 2
+        patches[0] = count
+
+    def private_patcher(index: int) -> None:
+        func = make_private()
+        barrier.wait()
+        count = 0
+        while not stop.is_set():
+            patchy.patch(func, PATCH)
+            patchy.unpatch(func, PATCH)
+            count += 2
+        private_patches[index] = count
+
+    def timed(targets: list[threading.Thread]) -> float:
+        for thread in targets:
+            thread.start()
+        barrier.wait()
+        start = perf_counter()
+        stop.wait(duration)
+        stop.set()
+        for thread in targets:
+            thread.join()
+        elapsed = perf_counter() - start
+        stop.clear()
+        barrier.reset()
+        return elapsed
+
+    callers = [
+        threading.Thread(target=caller, args=(i,)) for i in range(thread_count - 1)
+    ] + [threading.Thread(target=patcher)]
+    if thread_count == 1:
+        # No patcher, so calls measure the uncontended baseline
+        callers = [threading.Thread(target=caller, args=(0,))]
+    elapsed = timed(callers)
+    call_rate = sum(calls) / elapsed
+    patch_rate = patches[0] / elapsed
+
+    elapsed = timed(
+        [
+            threading.Thread(target=private_patcher, args=(i,))
+            for i in range(thread_count)
+        ]
+    )
+    private_rate = sum(private_patches) / elapsed
+
+    if errors:
+        raise errors[0]
+    patchy.unpatch_all()
+    return call_rate, patch_rate, private_rate
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--duration", type=float, default=1.0)
+    args = parser.parse_args(argv)
+
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print(f"Python {sys.version.split()[0]}, GIL {'enabled' if gil else 'disabled'}")
+    print(f"{'threads':>7}  {'calls/s':>12}  {'patches/s':>10}  {'private/s':>10}")
+    for thread_count in args.threads:
+        call_rate, patch_rate, private_rate = run(thread_count, args.duration)
+        print(
+            f"{thread_count:>7}  {call_rate:>12,.0f}  {patch_rate:>10,.0f}"
+            + f"  {private_rate:>10,.0f}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
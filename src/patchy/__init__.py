@@ -1,3 +1,13 @@
 from __future__ import annotations
 
 from .api import *  # noqa
+from .astpatch import *  # noqa
+from .benchmark import *  # noqa
+from .binding import *  # noqa
+from .bundle import *  # noqa
+from .inlining import *  # noqa
+from .instrumentation import *  # noqa
+from .semantic import *  # noqa
+from .stripping import *  # noqa
+from .transfer import *  # noqa
+from .watching import *  # noqa
@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from collections.abc import Sequence
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m patchy")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    check_parser = subparsers.add_parser(
+        "check",
+        help="Check that patch files still apply, without importing their targets.",
+    )
+    check_parser.add_argument(
+        "patches",
+        nargs="+",
+        help="Patch files, or directories of them, named <dotted.target>.patch.",
+    )
+    check_parser.add_argument(
+        "--path",
+        action="append",
+        help="Directory to search for target modules. Defaults to sys.path.",
+    )
+    check_parser.add_argument(
+        "--jobs",
+        type=int,
+        default=None,
+        help="Number of worker processes. Defaults to the number of CPUs.",
+    )
+
+    bundle_parser = subparsers.add_parser(
+        "bundle",
+        help="Build a source bundle, for patching where source files aren't deployed.",
+    )
+    bundle_parser.add_argument("output", help="Path of the bundle file to write.")
+    bundle_parser.add_argument(
+        "packages",
+        nargs="+",
+        help="Dotted names of modules or packages to include.",
+    )
+    bundle_parser.add_argument(
+        "--path",
+        action="append",
+        help="Directory to search for modules. Defaults to sys.path.",
+    )
+
+    args = parser.parse_args(argv)
+
+    if args.command == "bundle":
+        from .bundle import build_source_bundle
+
+        count = build_source_bundle(args.output, args.packages, args.path or sys.path)
+        json.dump({"bundle": args.output, "definitions": count}, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+        return 0
+
+    from .check import check
+
+    results = check(args.patches, args.path or sys.path, jobs=args.jobs)
+    ok = sum(result["status"] == "ok" for result in results)
+    report = {
+        "results": results,
+        "summary": {"total": len(results), "ok": ok, "failed": len(results) - ok},
+    }
+    json.dump(report, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+    return 0 if ok == len(results) else 1
+
+
+if __name__ == "__main__":  # pragma: no cover
+    raise SystemExit(main())
@@ -1,54 +1,206 @@
 from __future__ import annotations
 
 import ast
+import copy
+import gc
+import hashlib
 import inspect
+import linecache
 import os
+import re
 import shutil
 import subprocess
-from collections.abc import Callable
-from functools import wraps
+import sys
+import threading
+import warnings
+import weakref
+import zlib
+from collections.abc import Callable, Mapping, Sequence
+from functools import partial, wraps
 from tempfile import mkdtemp
 from textwrap import dedent
-from types import CodeType, TracebackType
-from typing import Any, TypeVar, cast
+from types import CodeType, FunctionType, TracebackType
+from typing import Any, NamedTuple, TypeVar, cast, overload
 from weakref import WeakKeyDictionary
 
-from .cache import PatchingCache
+from . import instrumentation as _instrumentation
+from .bundle import SourceBundle
+from .cache import DiskCache, PatchingCache
+from .fingerprint import distribution_version, fingerprint, version_matches
+from .reloading import forget_all as _forget_tracked
+from .reloading import restore as _restore_tracked
+from .reloading import snapshot as _snapshot_tracked
+from .reloading import track as _track
+from .static import FunctionNode, node_source
 
 if True:
     import __future__
 
 from pkgutil import resolve_name as pkgutil_resolve_name
 
-__all__ = ("patch", "mc_patchface", "unpatch", "replace", "temp_patch")
+__all__ = (
+    "patch",
+    "mc_patchface",
+    "ensure_patched",
+    "unpatch",
+    "replace",
+    "temp_patch",
+    "patch_variants",
+    "patch_class",
+    "unpatch_class",
+    "set_cache_dir",
+    "set_source_bundle",
+    "patched",
+    "unpatch_all",
+    "set_lean_mode",
+    "set_optimize_level",
+    "memory_report",
+)
 
 
 # Public API
 
 
-def patch(func: Callable[..., Any] | str, patch_text: str) -> None:
-    _do_patch(func, patch_text, forwards=True)
+def patch(
+    func: Callable[..., Any] | str,
+    patch_text: str,
+    *,
+    optimize: int | None = None,
+    all_instances: bool = False,
+) -> None:
+    _do_patch(
+        func,
+        patch_text,
+        forwards=True,
+        optimize=optimize,
+        all_instances=all_instances,
+        stacklevel=3,
+    )
 
 
 mc_patchface = patch
 
 
-def unpatch(func: Callable[..., Any] | str, patch_text: str) -> None:
-    _do_patch(func, patch_text, forwards=False)
+def ensure_patched(
+    func: Callable[..., Any] | str,
+    patch_text: str,
+    *,
+    optimize: int | None = None,
+) -> bool:
+    if isinstance(func, str):
+        func = cast(Callable[..., Any], pkgutil_resolve_name(func))
+    patch_text = dedent(patch_text)
+    if optimize is not None:
+        _check_optimize_level(optimize)
+
+    return _do_patch(
+        func,
+        patch_text,
+        forwards=True,
+        optimize=optimize,
+        ensure=True,
+        stacklevel=3,
+    )
+
+
+def unpatch(
+    func: Callable[..., Any] | str,
+    patch_text: str,
+    *,
+    optimize: int | None = None,
+    all_instances: bool = False,
+) -> None:
+    _do_patch(
+        func,
+        patch_text,
+        forwards=False,
+        optimize=optimize,
+        all_instances=all_instances,
+    )
 
 
 def replace(
     func: Callable[..., Any],
     expected_source: str | None,
     new_source: str,
+    *,
+    optimize: int | None = None,
 ) -> None:
-    if expected_source is not None:
-        expected_source = dedent(expected_source)
-        current_source = _get_source(func)
-        _assert_ast_equal(current_source, expected_source, func.__name__)
-
     new_source = dedent(new_source)
-    _set_source(func, new_source)
+    with _lock:
+        if expected_source is not None:
+            expected_source = dedent(expected_source)
+            current_source = _get_source(func)
+            _assert_ast_equal(current_source, expected_source, func.__name__)
+
+        _set_source(func, new_source, optimize=optimize)
+        _track(func, None, new_source=new_source)
+
+
+def patch_variants(
+    func: Callable[..., Any] | str,
+    variants: Mapping[str, str],
+    *,
+    optimize: int | None = None,
+) -> str:
+    if isinstance(func, str):
+        func = cast(Callable[..., Any], pkgutil_resolve_name(func))
+    if optimize is not None:
+        _check_optimize_level(optimize)
+
+    real_func = _get_real_func(func)
+    while True:
+        with _lock:
+            current_code = real_func.__code__
+            stored = _source_map.get(real_func)
+
+        # Try the variants and compile without the lock, as for _do_patch()
+        source = _unpack(stored) if stored is not None else _original_source(func)
+        for key in _order_variants(func, source, variants):
+            patch_text = dedent(variants[key])
+            try:
+                new_source = _apply_patch(
+                    source,
+                    patch_text,
+                    True,
+                    func.__name__,
+                    quick_fail=True,
+                    stacklevel=3,
+                )
+            except ValueError:
+                continue
+            break
+        else:
+            raise ValueError(
+                f"None of the patch variants could be applied to '{func.__name__}'."
+                + f" Tried: {', '.join(variants)}."
+            )
+        new_code = _compile_source(func, new_source, optimize)
+
+        with _lock:
+            if real_func.__code__ is not current_code:
+                continue
+            _install_code(func, new_code, new_source, patch_text)
+            _track(func, patch_text)
+        return key
+
+
+def patch_class(
+    cls: type | str,
+    patch_text: str,
+    *,
+    optimize: int | None = None,
+) -> None:
+    _do_patch_class(cls, patch_text, forwards=True, optimize=optimize, stacklevel=3)
+
+
+def unpatch_class(
+    cls: type | str,
+    patch_text: str,
+    *,
+    optimize: int | None = None,
+) -> None:
+    _do_patch_class(cls, patch_text, forwards=False, optimize=optimize)
 
 
 AnyFunc = TypeVar("AnyFunc", bound=Callable[..., Any])
@@ -60,7 +212,7 @@ class temp_patch:
         self.patch_text = patch_text
 
     def __enter__(self) -> None:
-        patch(self.func, self.patch_text)
+        _do_patch(self.func, self.patch_text, forwards=True, stacklevel=3)
 
     def __exit__(
         self,
@@ -79,6 +231,89 @@ class temp_patch:
         return cast(AnyFunc, wrapper)
 
 
+def patched() -> list[Callable[..., Any]]:
+    with _lock:
+        return list(_registry.keys())
+
+
+def unpatch_all() -> None:
+    with _lock:
+        for real_func, record in list(_registry.items()):
+            _swap_code(real_func, record.original_code, patched=False)
+        _source_map.clear()
+        _registry.clear()
+        _forget_tracked()
+
+
+def set_lean_mode(enabled: bool) -> None:
+    global _lean_mode
+    with _lock:
+        _lean_mode = enabled
+        _patching_cache.set_lean(enabled)
+        for real_func, stored in list(_source_map.items()):
+            _source_map[real_func] = _pack(_unpack(stored))
+        for real_func, record in list(_registry.items()):
+            record.history[:] = [
+                entry._replace(source=_pack(_unpack(entry.source)))
+                for entry in record.history
+            ]
+            latest = record.history[-1]
+            if real_func.__code__ is latest.code:
+                _cache_lines(latest.code, latest.source)
+
+
+def set_optimize_level(level: int) -> None:
+    global _optimize_level
+    _check_optimize_level(level)
+    _optimize_level = level
+
+
+def memory_report() -> dict[str, int]:
+    seen: set[int] = set()
+    with _lock:
+        source_map = sum(_sizeof(stored, seen) for stored in _source_map.values())
+        history = sum(
+            _sizeof(record.original_code, seen)
+            + sum(
+                _sizeof(entry.code, seen) + _sizeof(entry.source, seen)
+                for entry in record.history
+            )
+            for record in _registry.values()
+        )
+        line_cache = sum(
+            _sizeof_lines(linecache.cache.get(real_func.__code__.co_filename), seen)
+            for real_func in _registry
+        )
+    patching_cache = _patching_cache.sizeof(seen)
+    return {
+        "functions": len(_registry),
+        "source_map_bytes": source_map,
+        "history_bytes": history,
+        "patching_cache_bytes": patching_cache,
+        "linecache_bytes": line_cache,
+        "total_bytes": source_map + history + patching_cache + line_cache,
+    }
+
+
+def set_cache_dir(path: str | os.PathLike[str] | None) -> None:
+    global _disk_cache
+    if path is None:
+        _disk_cache = None
+    else:
+        _disk_cache = DiskCache(os.fspath(path))
+
+
+def set_source_bundle(path: str | os.PathLike[str] | None) -> None:
+    global _source_bundle
+    with _lock:
+        if _source_bundle is not None:
+            _source_bundle.close()
+        if path is None:
+            _source_bundle = None
+        else:
+            _source_bundle = SourceBundle(os.fspath(path))
+
+
 # Gritty internals
 
 
@@ -86,32 +321,357 @@ def _do_patch(
     func: Callable[..., Any] | str,
     patch_text: str,
     forwards: bool,
-) -> None:
+    track: bool = True,
+    optimize: int | None = None,
+    all_instances: bool = False,
+    ensure: bool = False,
+    stacklevel: int = 2,
+) -> bool:
+    """
+    Apply or unapply a patch to a function. Any warning points at the frame
+    `stacklevel` levels up from here, which public functions set to their
+    caller's. With ensure, a patch that's already applied is skipped. Returns
+    whether the function was changed.
+    """
     if isinstance(func, str):
         func = cast(Callable[..., Any], pkgutil_resolve_name(func))
-    source = _get_source(func)
     patch_text = dedent(patch_text)
+    if optimize is not None:
+        _check_optimize_level(optimize)
 
-    new_source = _apply_patch(source, patch_text, forwards, func.__name__)
+    real_func = _get_real_func(func)
+    # Only record the patch text for forwards changes, which can be popped
+    history_text = patch_text if forwards else None
+    while True:
+        with _lock:
+            applied = _is_applied(func, patch_text) if ensure else False
+            if applied:
+                return False
+            sharing = _sharing_code(func) if all_instances else []
+            if not forwards and _pop_history(func, patch_text):
+                for other in sharing:
+                    _pop_history(other, patch_text)
+                if track:
+                    _track(func, patch_text, forwards)
+                return True
+            current_code = real_func.__code__
+            stored = _source_map.get(real_func)
+
+        # Patch and compile without the lock, so changes to other functions
+        # can proceed meanwhile. The source is only fetched if the result
+        # isn't in the disk cache, which only unmodified functions use.
+        new_source = None
+        cached = False
+        disk_key = None
+        if stored is None:
+            disk_key = _disk_cache_key(func, patch_text, forwards)
+        if disk_key is not None:
+            assert _disk_cache is not None
+            try:
+                entry = _disk_cache.retrieve(disk_key[0])
+            except KeyError:
+                pass
+            else:
+                if entry.get("fingerprint") == disk_key[1]:
+                    new_source = entry["source"]
+                    cached = True
+        if new_source is None:
+            source = _unpack(stored) if stored is not None else _original_source(func)
+            if applied is None and _only_reverses(
+                source, patch_text, func.__name__, stacklevel + 1
+            ):
+                with _lock:
+                    if real_func.__code__ is current_code:
+                        return False
+                continue
+            new_source = _apply_patch(
+                source, patch_text, forwards, func.__name__, stacklevel=stacklevel + 1
+            )
+        new_code = _compile_source(func, new_source, optimize)
+
+        with _lock:
+            if real_func.__code__ is not current_code:
+                # Changed by another thread meanwhile, so start again from its
+                # new code
+                continue
+            _install_code(func, new_code, new_source, history_text)
+            for other in sharing:
+                _install_code(other, new_code, new_source, history_text)
+            if track:
+                _track(func, patch_text, forwards)
+
+        if disk_key is not None and not cached:
+            assert _disk_cache is not None
+            _disk_cache.store(
+                disk_key[0], {"fingerprint": disk_key[1], "source": new_source}
+            )
+        return True
 
-    _set_source(func, new_source)
 
+# Guards the registry, the source map, and code swaps, so each change to a
+# function is recorded atomically with respect to other threads. Changes are
+# computed without it where possible, then only installed if the function's
+# code is unchanged since. Re-entrant, so code holding it can call back into
+# the public API.
+_lock = threading.RLock()
 
 _patching_cache = PatchingCache(maxsize=100)
 
+_disk_cache: DiskCache | None = None
+
+_source_bundle: SourceBundle | None = None
+
+# Passed to compile() for patched code. -1 uses the interpreter's level, as
+# set by -O or PYTHONOPTIMIZE.
+_optimize_level = -1
+
+# Recorded as the patch text for bind_globals() changes, so unbinding can pop
+# them
+_BIND_LABEL = "patchy: bind globals\n"
+
+
+def _check_optimize_level(level: int) -> None:
+    if level not in (-1, 0, 1, 2):
+        raise ValueError(f"Invalid optimize level {level!r}, must be -1, 0, 1, or 2.")
+
+
+def _pop_history(func: Callable[..., Any], patch_text: str) -> bool:
+    """
+    Undo a patch by restoring the code from before it was applied, if it was
+    the last change made to the function. Returns whether this was possible.
+    """
+    real_func = _get_real_func(func)
+    record = _registry.get(real_func)
+    if (
+        record is None
+        or record.history[-1].patch_text != patch_text
+        or record.history[-1].code is not real_func.__code__
+    ):
+        return False
+
+    record.history.pop()
+    if record.history:
+        previous = record.history[-1]
+        _swap_code(real_func, previous.code)
+        _source_map[real_func] = previous.source
+        _cache_lines(previous.code, previous.source)
+    else:
+        _swap_code(real_func, record.original_code, patched=False)
+        _source_map.pop(real_func, None)
+        del _registry[real_func]
+    return True
+
+
+def _is_applied(func: Callable[..., Any], patch_text: str) -> bool | None:
+    """
+    Check from the registry whether a patch is currently applied to a
+    function, or return None if that can't be known. Patches are recorded in
+    each function's history until unpatched, but changes without a patch,
+    such as replace(), hide whether earlier patches remain.
+    """
+    record = _registry.get(_get_real_func(func))
+    if record is None:
+        return False
+    for entry in reversed(record.history):
+        if entry.patch_text == patch_text:
+            return True
+        if entry.patch_text is None:
+            return None
+    return False
+
+
+def _only_reverses(source: str, patch_text: str, name: str, stacklevel: int) -> bool:
+    """
+    Probe whether a patch is already in some source, for when the registry
+    can't tell: it is if the patch doesn't apply, but reverses cleanly.
+    """
+    try:
+        _apply_patch(
+            source, patch_text, True, name, quick_fail=True, stacklevel=stacklevel + 1
+        )
+    except ValueError:
+        try:
+            _apply_patch(source, patch_text, False, name, quick_fail=True)
+        except ValueError:
+            return False
+        return True
+    return False
+
+
+def _patch_to(func: Callable[..., Any], new_source: str, label: str) -> str:
+    """
+    Change a function's source with a patch made by diffing, so the change
+    is recorded, tracked, and can be unapplied like any other patch. The
+    patch starts with a label line, which `patch` ignores, for finding it
+    again with _labelled_patch(). Returns the patch. The result is cached, so
+    `patch` isn't run. The patch is dedented as _do_patch() would, so blank
+    context lines match the cache key and the recorded patch.
+    """
+    source = _get_source(func)
+    patch_text = dedent(f"patchy: {label}\n" + _diff(source, new_source))
+    _patching_cache.store(source, patch_text, True, new_source)
+    _do_patch(func, patch_text, forwards=True)
+    return patch_text
+
+
+def _diff(source: str, new_source: str) -> str:
+    """
+    Make a patch from one source to another, without file header lines.
+    """
+    # Deferred, as difflib is slow to import
+    import difflib
+
+    diff = difflib.unified_diff(
+        source.splitlines(keepends=True), new_source.splitlines(keepends=True)
+    )
+    # Drop the ---/+++ file header lines
+    return "".join(list(diff)[2:])
+
+
+def _labelled_patch(func: Callable[..., Any], label: str) -> str | None:
+    """
+    Find the patch made by _patch_to() with a label, if it's applied to a
+    function, as far as can be known from its history.
+    """
+    record = _registry.get(_get_real_func(func))
+    if record is None:
+        return None
+    first_line = f"patchy: {label}\n"
+    for entry in reversed(record.history):
+        if entry.patch_text is None:
+            return None
+        if entry.patch_text.startswith(first_line):
+            return entry.patch_text
+    return None
+
+
+def _sharing_code(func: Callable[..., Any]) -> list[FunctionType]:
+    """
+    Find the other live functions using the same code object as a function,
+    such as those made by the same factory or decorator.
+    """
+    real_func = _get_real_func(func)
+    code = real_func.__code__
+    return [
+        obj
+        for obj in gc.get_referrers(code)
+        if isinstance(obj, FunctionType)
+        and obj is not real_func
+        and obj.__code__ is code
+    ]
+
+
+def _disk_cache_key(
+    func: Callable[..., Any],
+    patch_text: str,
+    forwards: bool,
+) -> tuple[str, dict[str, str | None]] | None:
+    """
+    Return the disk cache key for applying a patch to a function, along with
+    the fingerprint of the function's current code that a cached result must
+    match. Only unmodified functions can be looked up, since the fingerprint
+    describes the code on disk. The key includes the first line number, to
+    tell apart definitions with the same name, like property setters.
+    """
+    real_func = _get_real_func(func)
+    if _disk_cache is None or real_func in _source_map:
+        return None
+
+    filename = real_func.__code__.co_filename
+    current = fingerprint(func.__module__, filename)
+    if current is None:
+        return None
+
+    key = ":".join(
+        [
+            filename,
+            func.__qualname__,
+            str(real_func.__code__.co_firstlineno),
+            "forwards" if forwards else "backwards",
+            hashlib.sha256(patch_text.encode()).hexdigest(),
+        ]
+    )
+    return key, current
+
+
+def _order_variants(
+    func: Callable[..., Any],
+    source: str,
+    variants: Mapping[str, str],
+) -> list[str]:
+    """
+    Order the keys of patch variants to try, those selected for the function
+    first: one keyed by the hash of its current source, then any whose
+    version specifier matches its distribution's version, then the rest.
+    """
+    digest = "sha256:" + hashlib.sha256(source.encode()).hexdigest()
+    selected = [key for key in variants if key == digest]
+    specifiers = [key for key in variants if not key.startswith("sha256:")]
+    if not specifiers:
+        # Finding the distribution's version is slow, so skip it when only
+        # source hashes are used
+        return selected + [key for key in variants if key not in selected]
+
+    dist = distribution_version(func.__module__)
+    version = dist.partition("==")[2] if dist is not None else None
+    for key in specifiers:
+        # Check against a dummy version for code outside distributions, so
+        # invalid specifiers are always reported
+        if version_matches(version or "0", key) and version is not None:
+            selected.append(key)
+    return selected + [key for key in variants if key not in selected]
+
+
+def _could_apply(source: str, patch_text: str, forwards: bool) -> bool:
+    """
+    Cheaply check whether a patch might apply, by checking the lines it
+    removes are all in the source. `patch` allows fuzz on context lines,
+    but not on removed ones.
+    """
+    removed = "+" if not forwards else "-"
+    lines = set(source.splitlines())
+    return all(
+        line[1:] in lines
+        for line in patch_text.splitlines()
+        if line.startswith(removed) and not line.startswith(removed * 3 + " ")
+    )
+
 
 def _apply_patch(
     source: str,
     patch_text: str,
     forwards: bool,
     name: str,
+    quick_fail: bool = False,
+    stacklevel: int = 2,
 ) -> str:
+    """
+    Apply a patch to source with the `patch` utility, raising ValueError if
+    it doesn't apply. With quick_fail, patches that can't apply are rejected
+    without running `patch` where possible, and the error message is brief.
+    Patches applied forwards with an offset or fuzz are rebased, with a
+    warning pointing at the frame `stacklevel` levels up from here.
+    """
     # Cached ?
     try:
         return _patching_cache.retrieve(source, patch_text, forwards)
     except KeyError:
         pass
 
+    rebased_key = _rebased_key(source, patch_text)
+    if forwards and _disk_cache is not None:
+        try:
+            cached = _disk_cache.retrieve(rebased_key)
+        except KeyError:
+            pass
+        else:
+            new_source = cast(str, cached["source"])
+            _patching_cache.store(source, patch_text, forwards, new_source)
+            return new_source
+
+    if quick_fail and not _could_apply(source, patch_text, forwards):
+        raise ValueError(f"Patch does not apply to '{name}'.")
+
     # Write out files
     tempdir = mkdtemp(prefix="patchy")
     try:
@@ -133,6 +693,8 @@ def _apply_patch(
         result = subprocess.run(command, capture_output=True, text=True)
 
         if result.returncode != 0:
+            if quick_fail:
+                raise ValueError(f"Patch does not apply to '{name}'.")
             msg = "Could not {action} the patch {prep} '{name}'.".format(
                 action=("apply" if forwards else "unapply"),
                 prep=("to" if forwards else "from"),
@@ -147,11 +709,41 @@ def _apply_patch(
     finally:
         shutil.rmtree(tempdir)
 
+    # Unapplying inexactly is expected once other changes have been made
+    # since, so only forwards patches need rebasing
+    if forwards and _INEXACT_RE.search(result.stdout):
+        rebased = _diff(source, new_source)
+        if _disk_cache is not None:
+            _disk_cache.store(rebased_key, {"patch": rebased, "source": new_source})
+        warnings.warn(
+            f"The patch for '{name}' only applied with an offset or fuzz. It"
+            + f" can be rebased to apply exactly as:\n{rebased}",
+            stacklevel=stacklevel,
+        )
+
     _patching_cache.store(source, patch_text, forwards, new_source)
 
     return new_source
 
 
+# Lines from `patch` about hunks that didn't apply at their exact position
+_INEXACT_RE = re.compile(r"^Hunk #\d+ succeeded at .*(fuzz|offset)", re.MULTILINE)
+
+
+def _rebased_key(source: str, patch_text: str) -> str:
+    """
+    Return the disk cache key for the rebased result of applying a patch
+    forwards to some source, which is looked up by hashes of both.
+    """
+    return ":".join(
+        [
+            "rebased",
+            hashlib.sha256(source.encode()).hexdigest(),
+            hashlib.sha256(patch_text.encode()).hexdigest(),
+        ]
+    )
+
+
 def _get_flags_mask() -> int:
     result = 0
     for name in __future__.all_feature_names:
@@ -162,18 +754,150 @@ def _get_flags_mask() -> int:
 FEATURE_MASK = _get_flags_mask()
 
 
-# Stores the source of functions that have had their source changed
-_source_map: WeakKeyDictionary[Callable[..., Any], str] = WeakKeyDictionary()
+# Stores the source of functions that have had their source changed. In lean
+# mode, sources are stored compressed, as bytes.
+_source_map: WeakKeyDictionary[Callable[..., Any], str | bytes] = WeakKeyDictionary()
+
+_lean_mode = False
+
+
+def _pack(source: str) -> str | bytes:
+    if _lean_mode:
+        return zlib.compress(source.encode())
+    return source
+
+
+def _unpack(stored: str | bytes) -> str:
+    if isinstance(stored, bytes):
+        return zlib.decompress(stored).decode()
+    return stored
+
+
+def _sizeof(obj: object, seen: set[int]) -> int:
+    """
+    Approximate the memory retained by an object, including the constants
+    and nested code objects of code objects. Objects already counted in
+    `seen` are skipped.
+    """
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, CodeType):
+        size += _sizeof(obj.co_code, seen)
+        size += sum(_sizeof(const, seen) for const in obj.co_consts)
+    return size
+
+
+def _sizeof_lines(entry: tuple[Any, ...] | None, seen: set[int]) -> int:
+    """
+    Approximate the memory retained by a linecache entry for patched code,
+    including its lines once they've been read.
+    """
+    if entry is None or not isinstance(entry[2], _PatchedLines):
+        return 0
+    lines = entry[2]
+    size = _sizeof(entry, seen) + _sizeof(lines, seen) + _sizeof(lines.stored, seen)
+    if lines.lines is not None:
+        size += _sizeof(lines.lines, seen)
+        size += sum(_sizeof(line, seen) for line in lines.lines)
+    return size
+
+
+class _Entry(NamedTuple):
+    # The patch applied forwards to make this change, or None for other
+    # changes
+    patch_text: str | None
+    code: CodeType
+    source: str | bytes
+
+
+class _Record:
+    """
+    Registry entry for a function that patchy has changed: its code object
+    from before the first change, and a history stack of each change since.
+    """
+
+    __slots__ = ("original_code", "history")
+
+    def __init__(self, original_code: CodeType) -> None:
+        self.original_code = original_code
+        self.history: list[_Entry] = []
+
+
+_registry: WeakKeyDictionary[Callable[..., Any], _Record] = WeakKeyDictionary()
+
+
+class _Snapshot(NamedTuple):
+    registry: dict[Callable[..., Any], tuple[CodeType, list[_Entry]]]
+    source_map: dict[Any, str | bytes]
+    tracked: dict[str, Any]
+
+
+def _snapshot() -> _Snapshot:
+    """
+    Capture all of patchy's state, for restoring with _restore().
+    """
+    with _lock:
+        return _Snapshot(
+            registry={
+                real_func: (record.original_code, list(record.history))
+                for real_func, record in _registry.items()
+            },
+            source_map=dict(_source_map.items()),
+            tracked=_snapshot_tracked(),
+        )
+
+
+def _restore(snapshot: _Snapshot) -> None:
+    """
+    Return every function to its code at the time of a snapshot, and reset
+    patchy's records to match. Only functions changed since are touched.
+    """
+    with _lock:
+        for real_func, record in list(_registry.items()):
+            if real_func not in snapshot.registry:
+                _swap_code(real_func, record.original_code, patched=False)
+        _registry.clear()
+        for real_func, (original_code, history) in snapshot.registry.items():
+            record = _registry[real_func] = _Record(original_code)
+            record.history[:] = history
+            latest = history[-1]
+            if real_func.__code__ is not latest.code:
+                _swap_code(real_func, latest.code)
+                _cache_lines(latest.code, latest.source)
+        _source_map.clear()
+        _source_map.update(snapshot.source_map)
+        _restore_tracked(snapshot.tracked)
 
 
 def _get_source(func: Callable[..., Any]) -> str:
     real_func = _get_real_func(func)
     try:
-        return _source_map[real_func]
+        return _unpack(_source_map[real_func])
     except KeyError:
-        source = inspect.getsource(func)
-        source = dedent(source)
-        return source
+        return _original_source(func)
+
+
+def _original_source(obj: Any) -> str:
+    """
+    Fetch the source of an unchanged function or class from its file, or
+    failing that, from the source bundle, if one is set.
+    """
+    try:
+        source = inspect.getsource(obj)
+    except OSError:
+        if _source_bundle is None:
+            raise
+        if isinstance(obj, type):
+            first_lineno = getattr(obj, "__firstlineno__", None)
+        else:
+            first_lineno = _original_code(_get_real_func(obj)).co_firstlineno
+        bundled = _source_bundle.get(obj.__module__, obj.__qualname__, first_lineno)
+        if bundled is None:
+            raise
+        return bundled
+    return dedent(source)
 
 
 def _class_name(func: Callable[..., Any]) -> str | None:
@@ -188,20 +912,52 @@ def _class_name(func: Callable[..., Any]) -> str | None:
         return class_name
 
 
-def _set_source(func: Callable[..., Any], func_source: str) -> None:
+def _set_source(
+    func: Callable[..., Any],
+    func_source: str,
+    patch_text: str | None = None,
+    optimize: int | None = None,
+) -> None:
+    new_code = _compile_source(func, func_source, optimize)
+    _install_code(func, new_code, func_source, patch_text)
+
+
+def _compile_source(
+    func: Callable[..., Any],
+    func_source: str,
+    optimize: int | None = None,
+    transform: Callable[[ast.AST], None] | None = None,
+) -> CodeType:
+    """
+    Compile new source for a function into a code object that can replace
+    its __code__, at the given optimize level, or the global one if None.
+    If given, transform is called to modify the function's AST in place
+    before it is compiled.
+    """
+    if optimize is None:
+        optimize = _optimize_level
     # Fetch the actual function we are changing
     real_func = _get_real_func(func)
     # Figure out any future headers that may be required
     feature_flags = real_func.__code__.co_flags & FEATURE_MASK
 
     class_name = _class_name(func)
+    # Use a filename and line numbers based on the original function, so
+    # tracebacks and profilers can find the patched source
+    original_code = _original_code(real_func)
+    filename = _patched_filename(original_code, func.__qualname__, func_source)
 
     def _compile(
         code: str | ast.Module,
         flags: int = 0,
     ) -> CodeType | ast.Module:
         result: CodeType | ast.Module = compile(
-            code, "<patchy>", "exec", flags=feature_flags | flags, dont_inherit=True
+            code,
+            filename,
+            "exec",
+            flags=feature_flags | flags,
+            dont_inherit=True,
+            optimize=optimize,
         )
         return result
 
@@ -241,6 +997,9 @@ def _set_source(func: Callable[..., Any], func_source: str) -> None:
         else:
             fv_force_use = []
         _ast = _parse(func_source).body[0]
+        ast.increment_lineno(_ast, original_code.co_firstlineno - 1)
+        if transform is not None:
+            transform(_ast)
         _ast.body = _ast.body + fv_force_use  # type: ignore [attr-defined]
         return _def, _ast, fv_body
 
@@ -258,6 +1017,7 @@ def _set_source(func: Callable[..., Any], func_source: str) -> None:
             return SomeClass.patched_func
         """
 
+        assert class_name is not None
         _def, _ast, fv_body = _process_freevars()
         _global = (
             ""
@@ -265,7 +1025,7 @@ def _set_source(func: Callable[..., Any], func_source: str) -> None:
             else f"    global {class_name}\n"
         )
         class_src = f"{_global}    class {class_name}(object):\n        pass"
-        ret = f"    return {class_name}.{func.__name__}"
+        ret = f"    return {class_name}.{_mangle(class_name, func.__name__)}"
         to_parse = "\n".join([_def] + fv_body + [class_src, ret])
         new_source = _parse(to_parse)
         new_source.body[0].body[-2].body[0] = _ast  # type: ignore [attr-defined]
@@ -296,12 +1056,465 @@ def _set_source(func: Callable[..., Any], func_source: str) -> None:
         localz,
     )
     new_func = localz["__patchy_freevars__"]()
+    return cast(CodeType, new_func.__code__)
+
+
+def _original_code(real_func: Callable[..., Any]) -> CodeType:
+    try:
+        return _registry[real_func].original_code
+    except KeyError:
+        return real_func.__code__
+
+
+def _patched_filename(original_code: CodeType, qualname: str, source: str) -> str:
+    """
+    Make the filename for patched code. It includes a hash of the source, so
+    functions sharing a qualname, such as those made by a factory, only share
+    a linecache entry when they have the same lines.
+    """
+    digest = hashlib.sha256(source.encode()).hexdigest()[:12]
+    return f"{original_code.co_filename}#patchy:{qualname}:{digest}"
+
+
+def _cache_lines(code: CodeType, stored: str | bytes) -> None:
+    """
+    Register patched source in linecache, under the filename of its code
+    object, so it's shown in tracebacks. The lines are only unpacked when
+    first read.
+    """
+    lines = _PatchedLines(stored, code.co_firstlineno)
+    # An mtime of None stops linecache.checkcache() from discarding the entry.
+    # Readers only index, slice, and iterate the lines, so any sequence works.
+    linecache.cache[code.co_filename] = (  # type: ignore [assignment]
+        len(stored),
+        None,
+        lines,
+        code.co_filename,
+    )
+
+
+class _PatchedLines(Sequence[str]):
+    """
+    The lines of a patched function's source for linecache, numbered from the
+    first line of its code. The blank lines before that aren't stored, and
+    the source is unpacked and split when first read.
+    """
+
+    def __init__(self, stored: str | bytes, first_lineno: int) -> None:
+        self.stored = stored
+        self.padding = first_lineno - 1
+        self.lines: list[str] | None = None
+
+    def _load(self) -> list[str]:
+        if self.lines is None:
+            lines = _unpack(self.stored).splitlines(keepends=True)
+            if not lines[-1].endswith("\n"):
+                lines[-1] += "\n"
+            self.lines = lines
+        return self.lines
+
+    def __len__(self) -> int:
+        return self.padding + len(self._load())
+
+    @overload
+    def __getitem__(self, index: int) -> str: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[str]: ...
+
+    def __getitem__(self, index: int | slice) -> str | list[str]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        if index < self.padding:
+            return "\n"
+        return self._load()[index - self.padding]
+
+
+# Patched filename -> weak references to the functions running code with it,
+# so its linecache entry is dropped once no live function uses it
+_line_users: dict[str, set[weakref.ref[Callable[..., Any]]]] = {}
+
+
+# Releases from _release_lines() calls that couldn't take the lock, left
+# for the next _use_lines() call
+_pending_releases: list[tuple[str, weakref.ref[Callable[..., Any]]]] = []
 
-    # Put the new Code object in place
-    real_func.__code__ = new_func.__code__
+
+def _use_lines(real_func: Callable[..., Any], filename: str) -> None:
+    with _lock:
+        while _pending_releases:
+            _drop_line_user(*_pending_releases.pop())
+        _line_users.setdefault(filename, set()).add(
+            weakref.ref(real_func, partial(_release_lines, filename))
+        )
+
+
+def _release_lines(filename: str, ref: weakref.ref[Callable[..., Any]]) -> None:
+    """
+    Drop a function's use of a patched filename's lines, under the lock. As
+    a weakref callback, this can run during any allocation, including in a
+    thread waiting for a lock that the lock's holder needs, so it doesn't
+    block: if the lock is held elsewhere, the release is deferred.
+    """
+    if not _lock.acquire(blocking=False):
+        _pending_releases.append((filename, ref))
+        return
+    try:
+        _drop_line_user(filename, ref)
+    finally:
+        _lock.release()
+
+
+def _drop_line_user(filename: str, ref: weakref.ref[Callable[..., Any]]) -> None:
+    users = _line_users.get(filename)
+    if users is None:
+        return
+    users.discard(ref)
+    if not users:
+        del _line_users[filename]
+        linecache.cache.pop(filename, None)
+
+
+def _with_filename(code: CodeType, filename: str) -> CodeType:
+    consts = tuple(
+        _with_filename(const, filename) if isinstance(const, CodeType) else const
+        for const in code.co_consts
+    )
+    return code.replace(co_filename=filename, co_consts=consts)
+
+
+def _swap_code(
+    real_func: Callable[..., Any],
+    new_code: CodeType,
+    patched: bool = True,
+) -> None:
+    old_code = real_func.__code__
+    # A single attribute store: concurrent callers each run either the old or
+    # the new code object in full, even on free-threaded builds
+    real_func.__code__ = new_code
+    if "#patchy:" in new_code.co_filename:
+        _use_lines(real_func, new_code.co_filename)
+    if (
+        "#patchy:" in old_code.co_filename
+        and old_code.co_filename != new_code.co_filename
+    ):
+        _release_lines(old_code.co_filename, weakref.ref(real_func))
+    _instrumentation.code_changed(real_func, old_code, new_code if patched else None)
+
+
+def _install_code(
+    func: Callable[..., Any],
+    new_code: CodeType,
+    func_source: str,
+    patch_text: str | None,
+) -> None:
+    real_func = _get_real_func(func)
+    if _is_bound(real_func):
+        raise ValueError(
+            f"Globals are bound in '{func.__name__}', and changing its code would"
+            + " unbind them. Call unbind_globals() first."
+        )
+    # Put the new Code object in place, registering the original first
+    try:
+        record = _registry[real_func]
+    except KeyError:
+        record = _registry[real_func] = _Record(real_func.__code__)
+    _swap_code(real_func, new_code)
+    stored_source = _pack(func_source)
+    _cache_lines(new_code, stored_source)
+    record.history.append(_Entry(patch_text, new_code, stored_source))
     # Store the modified source. This used to be attached to the function but
     # that is a bit naughty
-    _source_map[real_func] = func_source
+    _source_map[real_func] = stored_source
+
+
+def _is_bound(func: Callable[..., Any]) -> bool:
+    """
+    Whether a function's current code is from bind_globals().
+    """
+    real_func = _get_real_func(func)
+    record = _registry.get(real_func)
+    return (
+        record is not None
+        and record.history[-1].patch_text == _BIND_LABEL
+        and record.history[-1].code is real_func.__code__
+    )
+
+
+def _do_patch_class(
+    cls: type | str,
+    patch_text: str,
+    forwards: bool,
+    track: bool = True,
+    optimize: int | None = None,
+    stacklevel: int = 2,
+) -> None:
+    if isinstance(cls, str):
+        cls = cast(type, pkgutil_resolve_name(cls))
+    patch_text = dedent(patch_text)
+    if optimize is not None:
+        _check_optimize_level(optimize)
+    while True:
+        with _lock:
+            stored = _source_map.get(cls)
+
+        # Patch and compile without the lock, as for _do_patch()
+        source = _unpack(stored) if stored is not None else _original_source(cls)
+        new_source = _apply_patch(
+            source, patch_text, forwards, cls.__name__, stacklevel=stacklevel + 1
+        )
+        changes = _class_changes(cls, source, new_source, optimize)
+        # Back to the source on disk, so there's nothing to remember
+        unchanged = not forwards and new_source == _original_source(cls)
+
+        with _lock:
+            if _source_map.get(cls) != stored or any(
+                change.func.__code__ is not change.code for change in changes
+            ):
+                continue
+            for change in changes:
+                _check_class_owned(cls, change.func, change.old_source)
+            history_text = patch_text if forwards else None
+            for change in changes:
+                if not forwards and _pop_history(change.func, patch_text):
+                    continue
+                _install_code(change.func, change.new_code, change.source, history_text)
+            if unchanged:
+                _source_map.pop(cls, None)
+            else:
+                _source_map[cls] = _pack(new_source)
+            if track:
+                _track(cls, patch_text, forwards)
+        return
+
+
+def _class_def(source: str, name: str) -> tuple[ast.ClassDef, list[FunctionNode]]:
+    node = ast.parse(source).body[0]
+    if not isinstance(node, ast.ClassDef):
+        raise ValueError(f"The source of '{name}' is not a class definition.")
+    methods = [
+        item
+        for item in node.body
+        if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef))
+    ]
+    return node, methods
+
+
+def _class_skeleton(node: ast.ClassDef) -> str:
+    skeleton = copy.copy(node)
+    skeleton.body = [
+        item
+        for item in node.body
+        if not isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef))
+    ]
+    return ast.dump(skeleton)
+
+
+class _MethodChange(NamedTuple):
+    func: Callable[..., Any]
+    # The method's code when the change was made, to check it's unchanged
+    # before installing
+    code: CodeType
+    # The method's source in the class before and after the change
+    old_source: str
+    source: str
+    new_code: CodeType
+
+
+def _class_changes(
+    cls: type,
+    source: str,
+    new_source: str,
+    optimize: int | None = None,
+) -> list[_MethodChange]:
+    """
+    Compile new code for every method changed between two versions of a
+    class's source. Methods are compiled together in one class, so they get
+    the same name mangling as the originals. Definitions are matched by
+    position, and only the last definition of a name can be changed, since
+    it's the one the class holds.
+    """
+    name = cls.__name__
+    old_node, old_methods = _class_def(source, name)
+    new_node, new_methods = _class_def(new_source, name)
+    if _class_skeleton(old_node) != _class_skeleton(new_node) or [
+        item.name for item in old_methods
+    ] != [item.name for item in new_methods]:
+        raise ValueError(
+            f"Patches to the class '{name}' may only change the bodies of"
+            + " existing methods."
+        )
+
+    old_lines = source.splitlines(keepends=True)
+    last_defs = {item.name: i for i, item in enumerate(new_methods)}
+    changed: dict[str, tuple[FunctionType, FunctionNode]] = {}
+    codes: dict[str, CodeType] = {}
+    old_sources: dict[str, str] = {}
+    for i, (old_def, new_def) in enumerate(zip(old_methods, new_methods)):
+        if ast.dump(old_def) == ast.dump(new_def):
+            continue
+        method_name = new_def.name
+        if [ast.dump(d) for d in old_def.decorator_list] != [
+            ast.dump(d) for d in new_def.decorator_list
+        ]:
+            raise ValueError(
+                f"Patches to the class '{name}' may not change the decorators"
+                + f" of '{method_name}'."
+            )
+        if last_defs[method_name] != i:
+            raise ValueError(
+                f"Can't patch '{name}.{method_name}', it's defined more than"
+                + " once in the class."
+            )
+        func = _class_function(cls, method_name)
+        codes[method_name] = func.__code__
+        old_sources[method_name] = node_source(old_lines, old_def)
+        _check_class_owned(cls, func, old_sources[method_name])
+        changed[method_name] = (func, new_def)
+    if not changed:
+        return []
+
+    new_lines = new_source.splitlines(keepends=True)
+    method_sources = {
+        method_name: node_source(new_lines, node)
+        for method_name, (_, node) in changed.items()
+    }
+    new_codes = _compile_methods(cls, changed, method_sources, optimize)
+    changes = []
+    for method_name, (func, _) in changed.items():
+        method_source = method_sources[method_name]
+        new_code = new_codes[method_name]
+        if new_code.co_freevars != codes[method_name].co_freevars:
+            new_code = _compile_source(func, method_source, optimize)
+        changes.append(
+            _MethodChange(
+                func,
+                codes[method_name],
+                old_sources[method_name],
+                method_source,
+                new_code,
+            )
+        )
+    return changes
+
+
+def _check_class_owned(cls: type, func: Callable[..., Any], class_source: str) -> None:
+    """
+    Check a method's current source is the one in its class's source, which
+    it isn't if it's been changed since by other means, such as patch().
+    Rebuilding it from the class's source would silently drop those changes.
+    """
+    stored = _source_map.get(func)
+    if stored is not None and _unpack(stored) != class_source:
+        raise ValueError(
+            f"Can't patch '{cls.__name__}.{func.__name__}' through its class,"
+            + " as it has been changed by other means, such as patch(). Undo"
+            + " those changes first."
+        )
+
+
+def _mangle(class_name: str, name: str) -> str:
+    if name.startswith("__") and not name.endswith("__"):
+        return "_" + class_name.lstrip("_") + name
+    return name
+
+
+def _get_member(target: Any, name: str) -> Any:
+    """
+    Fetch an attribute by the name in a qualname, which for private members
+    of classes is stored mangled.
+    """
+    if isinstance(target, type):
+        name = _mangle(target.__name__, name)
+    return getattr(target, name)
+
+
+def _class_function(cls: type, name: str) -> FunctionType:
+    attr = cls.__dict__[_mangle(cls.__name__, name)]
+    if isinstance(attr, (classmethod, staticmethod)):
+        attr = attr.__func__
+    if not isinstance(attr, FunctionType):
+        raise ValueError(f"Can't patch '{cls.__name__}.{name}', it's not a function.")
+    return attr
+
+
+def _compile_methods(
+    cls: type,
+    methods: dict[str, tuple[FunctionType, FunctionNode]],
+    sources: dict[str, str],
+    optimize: int | None = None,
+) -> dict[str, CodeType]:
+    """
+    Compile new method definitions in a class with the same name, inside a
+    function providing all their freevars, similar to _set_source(), at the
+    given optimize level, or the global one if None:
+
+    def __patchy_freevars__():
+        eg_free_var_spam = object()
+
+        class SomeClass:
+            def patched_method(self):
+                return self.__some_mangled_prop
+                eg_free_var_spam    <- force use of original freevars
+
+        return SomeClass
+
+    Decorators are dropped, since only the underlying functions are needed.
+    """
+    name = cls.__name__
+    funcs = [func for func, _ in methods.values()]
+    feature_flags = funcs[0].__code__.co_flags & FEATURE_MASK
+    freevars = sorted(
+        {fv for func in funcs for fv in func.__code__.co_freevars} - {"__class__"}
+    )
+
+    body: list[ast.stmt] = []
+    for func, node in methods.values():
+        node = copy.deepcopy(node)
+        # Align line numbers with the original method
+        first_lineno = (
+            node.decorator_list[0].lineno if node.decorator_list else node.lineno
+        )
+        ast.increment_lineno(node, _original_code(func).co_firstlineno - first_lineno)
+        # Decorators are dropped, but first line numbers should include them
+        if node.decorator_list:
+            node.lineno = node.decorator_list[0].lineno
+        node.decorator_list = []
+        node.body += ast.parse("\n".join(func.__code__.co_freevars)).body
+        body.append(node)
+
+    _global = [] if name in freevars else [f"    global {name}"]
+    fv_body = [f"    {fv} = object()" for fv in freevars]
+    class_src = [f"    class {name}:", "        pass", f"    return {name}"]
+    wrapper = ast.parse(
+        "\n".join(["def __patchy_freevars__():"] + _global + fv_body + class_src)
+    )
+    wrapper.body[0].body[-2].body = body  # type: ignore [attr-defined]
+
+    localz: dict[str, Any] = {}
+    new_code = compile(
+        wrapper,
+        "<patchy>",
+        "exec",
+        flags=feature_flags,
+        dont_inherit=True,
+        optimize=_optimize_level if optimize is None else optimize,
+    )
+    exec(new_code, dict(sys.modules[cls.__module__].__dict__), localz)
+    new_class = localz["__patchy_freevars__"]()
+    return {
+        method_name: _with_filename(
+            new_class.__dict__[_mangle(name, method_name)].__code__,
+            _patched_filename(
+                _original_code(func), func.__qualname__, sources[method_name]
+            ),
+        )
+        for method_name, (func, _) in methods.items()
+    }
 
 
 def _get_real_func(func: Callable[..., Any]) -> Callable[..., Any]:
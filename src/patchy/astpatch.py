@@ -0,0 +1,261 @@
+from __future__ import annotations
+
+import ast
+import re
+from collections.abc import Callable, Sequence
+from pkgutil import resolve_name as pkgutil_resolve_name
+from textwrap import dedent
+from typing import Any, NamedTuple, cast
+
+from .api import _get_source, _lock, _patch_to
+from .static import edited_source, indent_source, node_span, splice, statement_span
+
+__all__ = ("ast_patch", "Replace", "Insert", "Delete")
+
+
+class Replace(NamedTuple):
+    path: str
+    source: str
+    expected: str | None = None
+
+
+class Insert(NamedTuple):
+    path: str
+    source: str
+
+
+class Delete(NamedTuple):
+    path: str
+    expected: str | None = None
+
+
+Edit = Replace | Insert | Delete
+
+
+def ast_patch(func: Callable[..., Any] | str, edits: Sequence[Edit]) -> str:
+    if isinstance(func, str):
+        func = cast(Callable[..., Any], pkgutil_resolve_name(func))
+    name = func.__name__
+    with _lock:
+        source = _get_source(func)
+
+        for edit in edits:
+            tree = ast.parse(source).body[0]
+            location = _resolve(tree, edit.path, name)
+            candidates = _splice_edit(source, location, edit)
+            _apply_edit(location, edit, name)
+            source = edited_source(tree, candidates)
+
+        return _patch_to(func, source, "ast_patch")
+
+
+# Gritty internals
+
+_STEP_RE = re.compile(
+    r"""
+    (?P<field>[A-Za-z_]\w*)(?:\[(?P<index>-?\d+)\])?
+    |
+    call\((?P<call>[\w.]+)\)
+    """,
+    re.VERBOSE,
+)
+
+
+class _Location(NamedTuple):
+    parent: ast.AST
+    field: str
+    position: int | None
+    node: Any
+
+
+def _resolve(tree: ast.AST, path: str, name: str) -> _Location:
+    """
+    Walk a structural path from the function node, e.g. "body[2]",
+    "body[-1].value", or "body[0].call(self.foo)", which finds the first call
+    to self.foo in source order within the first statement.
+    """
+    node: Any = tree
+    location = None
+    for step in _split(path):
+        match = _STEP_RE.fullmatch(step)
+        if match is None:
+            raise ValueError(f"Invalid AST path {path!r} for '{name}'.")
+        if match["call"] is not None:
+            location = _find_call(location, node, match["call"], path, name)
+        else:
+            field = match["field"]
+            if not isinstance(node, ast.AST) or field not in node._fields:
+                raise ValueError(
+                    f"AST path {path!r} for '{name}' has no field {field!r}."
+                )
+            value = getattr(node, field)
+            index = None
+            if match["index"] is not None:
+                index = int(match["index"])
+                try:
+                    value = value[index]
+                except (IndexError, TypeError):
+                    raise ValueError(
+                        f"AST path {path!r} for '{name}' has no {step!r}."
+                    ) from None
+                if index < 0:
+                    index += len(getattr(node, field))
+            location = _Location(node, field, index, value)
+        node = location.node
+    if location is None:
+        raise ValueError(f"Invalid AST path {path!r} for '{name}'.")
+    return location
+
+
+def _split(path: str) -> list[str]:
+    # Split on dots outside of call(...) steps
+    return re.findall(r"call\([\w.]+\)|[^.]+", path)
+
+
+def _find_call(
+    location: _Location | None,
+    node: Any,
+    target: str,
+    path: str,
+    name: str,
+) -> _Location:
+    def matches(child: Any) -> bool:
+        return isinstance(child, ast.Call) and ast.unparse(child.func) == target
+
+    found: list[_Location] = []
+    if isinstance(node, list):
+        assert location is not None
+        roots = node
+        found.extend(
+            _Location(location.parent, location.field, position, child)
+            for position, child in enumerate(node)
+            if matches(child)
+        )
+    else:
+        roots = [node]
+        if location is not None and matches(node):
+            found.append(location)
+
+    for parent in (n for root in roots for n in ast.walk(root)):
+        for field, value in ast.iter_fields(parent):
+            if isinstance(value, list):
+                found.extend(
+                    _Location(parent, field, position, child)
+                    for position, child in enumerate(value)
+                    if matches(child)
+                )
+            elif matches(value):
+                found.append(_Location(parent, field, None, value))
+
+    if not found:
+        raise ValueError(f"AST path {path!r} for '{name}' found no call to {target}.")
+    return min(found, key=lambda loc: (loc.node.lineno, loc.node.col_offset))
+
+
+def _parse_statements(source: str) -> list[ast.stmt]:
+    return ast.parse(dedent(source)).body
+
+
+def _parse_like(node: Any, source: str) -> list[ast.stmt] | ast.expr:
+    if isinstance(node, ast.expr):
+        return ast.parse(dedent(source), mode="eval").body
+    return _parse_statements(source)
+
+
+def _check_expected(
+    location: _Location, expected: str | None, path: str, name: str
+) -> None:
+    if expected is None:
+        return
+    expected_node = _parse_like(location.node, expected)
+    if isinstance(expected_node, list):
+        matches = len(expected_node) == 1 and ast.dump(expected_node[0]) == ast.dump(
+            location.node
+        )
+    else:
+        matches = ast.dump(expected_node) == ast.dump(location.node)
+    if not matches:
+        raise ValueError(
+            f"The code at AST path {path!r} of '{name}' has changed from expected.\n"
+            + f"The current code is:\n{ast.unparse(location.node)}\n"
+            + f"The expected code is:\n{dedent(expected)}"
+        )
+
+
+def _splice_edit(source: str, location: _Location, edit: Edit) -> list[str]:
+    """
+    Make the source text for an edit, trying to change only the text of
+    the nodes it affects. Returns candidates, to check against the edited
+    tree, as splicing only reproduces it if the new code fits in place.
+    """
+    lines = source.splitlines(keepends=True)
+    parent, field, index, node = location
+
+    if isinstance(node, ast.expr) and isinstance(edit, Replace):
+        start, end = node_span(lines, node)
+        text = dedent(edit.source).strip()
+        # Replacements may need brackets to keep precedence in place
+        return [splice(source, [(start, end, new)]) for new in (text, f"({text})")]
+
+    appending = isinstance(edit, Insert) and isinstance(node, list) and node != []
+    statement = node[-1] if appending else node
+    if not isinstance(statement, ast.stmt):
+        return []
+    span = statement_span(lines, statement)
+    if span is None:
+        return []
+    start, end, indent = span
+    if appending:
+        start = end
+    elif isinstance(edit, Insert):
+        end = start
+
+    if isinstance(edit, Delete):
+        emptied = len(getattr(parent, field)) == 1 and field in ("body", "finalbody")
+        text = f"{indent}pass\n" if emptied else ""
+    else:
+        text = indent_source(edit.source, indent)
+    return [splice(source, [(start, end, text)])]
+
+
+def _apply_edit(location: _Location, edit: Edit, name: str) -> None:
+    parent, field, index, node = location
+    container = getattr(parent, field)
+
+    if isinstance(edit, Insert):
+        if isinstance(node, list):
+            node.extend(_parse_statements(edit.source))
+        elif index is not None and isinstance(node, ast.stmt):
+            container[index:index] = _parse_statements(edit.source)
+        else:
+            raise ValueError(
+                f"AST path {edit.path!r} for '{name}' must point to a statement"
+                + " to insert before, or a list of statements to append to."
+            )
+        return
+
+    if isinstance(node, list):
+        raise ValueError(
+            f"AST path {edit.path!r} for '{name}' must point to a node, not a list."
+        )
+    _check_expected(location, edit.expected, edit.path, name)
+
+    if isinstance(edit, Delete):
+        if index is None or not isinstance(node, ast.stmt):
+            raise ValueError(
+                f"AST path {edit.path!r} for '{name}' must point to a statement"
+                + " to delete."
+            )
+        del container[index]
+        if not container and field in ("body", "finalbody"):
+            container.append(ast.Pass())
+        return
+
+    new = _parse_like(node, edit.source)
+    if isinstance(new, list):
+        assert index is not None
+        container[index : index + 1] = new
+    elif index is None:
+        setattr(parent, field, new)
+    else:
+        container[index] = new
@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import gc
+from collections.abc import Callable, Sequence
+from pkgutil import resolve_name as pkgutil_resolve_name
+from textwrap import dedent
+from time import perf_counter
+from types import CodeType
+from typing import Any, NamedTuple, cast
+
+from . import api
+from .api import (
+    _apply_patch,
+    _cache_lines,
+    _compile_source,
+    _get_real_func,
+    _get_source,
+    _swap_code,
+)
+
+__all__ = ("compare", "Comparison", "Timings")
+
+
+class Timings(NamedTuple):
+    # Seconds per call
+    min: float
+    median: float
+    mean: float
+    stdev: float
+
+    @classmethod
+    def from_samples(cls, samples: Sequence[float]) -> Timings:
+        # Deferred, as statistics is slow to import
+        import statistics
+
+        return cls(
+            min=min(samples),
+            median=statistics.median(samples),
+            mean=statistics.fmean(samples),
+            stdev=statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        )
+
+
+class Comparison(NamedTuple):
+    original: Timings
+    patched: Timings
+
+    @property
+    def speedup(self) -> float:
+        return self.original.median / self.patched.median
+
+    def __str__(self) -> str:
+        lines = []
+        for name, timings in (("original", self.original), ("patched", self.patched)):
+            lines.append(
+                f"{name}: median {_format(timings.median)}"
+                + f", min {_format(timings.min)}"
+                + f", mean {_format(timings.mean)} ± {_format(timings.stdev)}"
+            )
+        lines.append(f"speedup: {self.speedup:.2f}x")
+        return "\n".join(lines)
+
+
+def _format(seconds: float) -> str:
+    for unit, scale in (("s", 1.0), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.3g} {unit}"
+    return f"{seconds / 1e-9:.3g} ns"
+
+
+def compare(
+    func: Callable[..., Any] | str,
+    patch_text: str,
+    args_factory: Callable[[], tuple[Any, ...]],
+    *,
+    number: int = 1000,
+    repeat: int = 20,
+    warmup: int = 100,
+) -> Comparison:
+    if isinstance(func, str):
+        func = cast(Callable[..., Any], pkgutil_resolve_name(func))
+    real_func = _get_real_func(func)
+
+    source = _get_source(func)
+    new_source = _apply_patch(source, dedent(patch_text), True, func.__name__)
+    patched_code = _compile_source(func, new_source)
+
+    with api._lock:
+        original_code: CodeType = real_func.__code__
+        lines: dict[CodeType, str | bytes | None] = {
+            original_code: None,
+            patched_code: new_source,
+        }
+        record = api._registry.get(real_func)
+        if record is not None and record.history[-1].code is original_code:
+            lines[original_code] = record.history[-1].source
+    installed = original_code
+
+    def run(code: CodeType, count: int) -> float:
+        all_args = [args_factory() for _ in range(count)]
+        swap(code)
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            start = perf_counter()
+            for args in all_args:
+                func(*args)
+            return perf_counter() - start
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+    def swap(code: CodeType) -> None:
+        nonlocal installed
+        with api._lock:
+            if real_func.__code__ is not installed:
+                raise RuntimeError(
+                    f"'{func.__name__}' was changed during the comparison."
+                )
+            # Swap as patchy does, but only report the original code as
+            # patched, so the candidate never gets instrumented
+            stored = lines[code]
+            _swap_code(
+                real_func, code, patched=code is original_code and stored is not None
+            )
+            # Swapping away releases the lines of the previous code, so
+            # register those for the code swapped in again
+            if stored is not None:
+                _cache_lines(code, stored)
+            installed = code
+
+    original_samples: list[float] = []
+    patched_samples: list[float] = []
+    # The lock is only held for each swap, so other threads can patch while
+    # calls are timed. Swaps check the code is still what was swapped in, so
+    # a change made by another thread stops the comparison rather than being
+    # lost.
+    try:
+        run(original_code, warmup)
+        run(patched_code, warmup)
+        # Interleave runs, alternating which goes first, so that drift in
+        # machine state affects both equally
+        for i in range(repeat):
+            order = [
+                (original_code, original_samples),
+                (patched_code, patched_samples),
+            ]
+            if i % 2:
+                order.reverse()
+            for code, samples in order:
+                samples.append(run(code, number) / number)
+        swap(original_code)
+    except BaseException:
+        with api._lock:
+            if real_func.__code__ is installed:
+                swap(original_code)
+        raise
+
+    return Comparison(
+        original=Timings.from_samples(original_samples),
+        patched=Timings.from_samples(patched_samples),
+    )
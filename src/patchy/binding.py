@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import ast
+import builtins
+import warnings
+from collections.abc import Callable, Iterable, Iterator
+from pkgutil import resolve_name as pkgutil_resolve_name
+from types import CodeType, FunctionType
+from typing import Any, cast
+
+from .api import (
+    _BIND_LABEL,
+    _compile_source,
+    _get_real_func,
+    _get_source,
+    _install_code,
+    _is_bound,
+    _lock,
+    _pop_history,
+)
+from .inlining import _bound_names, _is_private
+
+__all__ = ("bind_globals", "unbind_globals")
+
+
+def bind_globals(
+    func: Callable[..., Any] | str,
+    names: Iterable[str] | None = None,
+    *,
+    rebind: bool = False,
+) -> list[str]:
+    if isinstance(func, str):
+        func = cast(Callable[..., Any], pkgutil_resolve_name(func))
+    name = func.__name__
+    with _lock:
+        if _is_bound(func):
+            if not rebind:
+                raise ValueError(f"Globals are already bound in '{name}'.")
+            _pop_history(func, _BIND_LABEL)
+
+        source = _get_source(func)
+        real_func = cast(FunctionType, _get_real_func(func))
+        freevars = real_func.__code__.co_freevars
+        tree = ast.parse(source).body[0]
+        lookups = {lookup for *_, lookup in _lookups(tree, freevars)}
+        if names is None:
+            values = {
+                lookup: value
+                for lookup in lookups
+                if (value := _resolve(real_func, lookup)) is not _MISSING
+            }
+            if not values:
+                raise ValueError(f"'{name}' has no global lookups that can be bound.")
+        else:
+            values = {}
+            for lookup in names:
+                if lookup not in lookups:
+                    raise ValueError(
+                        f"'{name}' has no lookups of '{lookup}' that can be bound."
+                    )
+                value = _resolve(real_func, lookup)
+                if value is _MISSING:
+                    raise ValueError(f"Could not find '{lookup}' from '{name}'.")
+                values[lookup] = value
+
+        def transform(tree: ast.AST) -> None:
+            for parent, field, index, lookup in list(_lookups(tree, freevars)):
+                if lookup in values:
+                    _replace(parent, field, index, _PLACEHOLDER + lookup)
+
+        with warnings.catch_warnings():
+            # Calling a constant, which placeholders look like, is a warning
+            warnings.simplefilter("ignore", SyntaxWarning)
+            code = _compile_source(func, source, transform=transform)
+        _install_code(func, _bind_constants(code, values), source, _BIND_LABEL)
+    return sorted(values)
+
+
+def unbind_globals(func: Callable[..., Any] | str) -> None:
+    if isinstance(func, str):
+        func = cast(Callable[..., Any], pkgutil_resolve_name(func))
+    with _lock:
+        if not _pop_history(func, _BIND_LABEL):
+            raise ValueError(f"'{func.__name__}' has no bound globals.")
+
+
+# Gritty internals
+
+_PLACEHOLDER = "__patchy_bound__:"
+
+# Zero-argument super() needs the compiler to see the name
+_UNBINDABLE = frozenset(("super",))
+
+_MISSING = object()
+
+
+def _resolve(real_func: FunctionType, name: str) -> Any:
+    try:
+        return real_func.__globals__[name]
+    except KeyError:
+        return getattr(builtins, name, _MISSING)
+
+
+def _lookups(
+    tree: ast.AST,
+    freevars: tuple[str, ...],
+) -> Iterator[tuple[ast.AST, str, int | None, str]]:
+    """
+    Yield the positions of global name lookups in a function's tree that can
+    be bound, as (parent, field, index, name). Only names that are called,
+    passed to calls, or have attributes looked up are included, since the
+    compiler never folds constants there. Names assigned anywhere in the
+    function are left alone, as are private names, which get mangled in
+    classes.
+    """
+    skip = set(_bound_names(tree)) | set(freevars) | _UNBINDABLE
+    for parent in ast.walk(tree):
+        places: list[tuple[str, int | None]]
+        if isinstance(parent, ast.Call):
+            places = [("func", None)]
+            places += [("args", index) for index in range(len(parent.args))]
+        elif isinstance(parent, (ast.Attribute, ast.keyword)):
+            places = [("value", None)]
+        else:
+            continue
+        for field, index in places:
+            node = getattr(parent, field)
+            if index is not None:
+                node = node[index]
+            if (
+                isinstance(node, ast.Name)
+                and node.id not in skip
+                and not _is_private(node.id)
+            ):
+                yield parent, field, index, node.id
+
+
+def _replace(parent: ast.AST, field: str, index: int | None, value: str) -> None:
+    old = getattr(parent, field)
+    if index is None:
+        setattr(parent, field, ast.copy_location(ast.Constant(value), old))
+    else:
+        old[index] = ast.copy_location(ast.Constant(value), old[index])
+
+
+def _bind_constants(code: CodeType, values: dict[str, Any]) -> CodeType:
+    """
+    Swap the placeholder constants in a code object, and any nested in it,
+    for the values they stand for.
+    """
+    consts = []
+    for const in code.co_consts:
+        if isinstance(const, CodeType):
+            const = _bind_constants(const, values)
+        elif isinstance(const, str) and const.startswith(_PLACEHOLDER):
+            const = values[const.removeprefix(_PLACEHOLDER)]
+        consts.append(const)
+    return code.replace(co_consts=tuple(consts))
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import ast
+import os
+import tempfile
+from collections.abc import Iterable, Sequence
+
+from .static import iter_definitions, iter_module_files, node_source
+
+__all__ = ("build_source_bundle",)
+
+
+def build_source_bundle(
+    output: str | os.PathLike[str],
+    packages: Iterable[str],
+    path: Sequence[str],
+) -> int:
+    # Deferred, as zipfile is slow to import
+    import zipfile
+
+    output = os.fspath(output)
+    directory = os.path.dirname(output) or "."
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    count = 0
+    try:
+        with (
+            os.fdopen(fd, "wb") as fp,
+            zipfile.ZipFile(fp, "w", zipfile.ZIP_DEFLATED) as bundle,
+        ):
+            for package in packages:
+                for module, filename in iter_module_files(package, path):
+                    with open(filename, encoding="utf-8") as source_file:
+                        text = source_file.read()
+                    lines = text.splitlines(keepends=True)
+                    for qualname, node in iter_definitions(ast.parse(text, filename)):
+                        first_lineno = (
+                            node.decorator_list[0].lineno
+                            if node.decorator_list
+                            else node.lineno
+                        )
+                        bundle.writestr(
+                            _entry_name(module, qualname, first_lineno),
+                            node_source(lines, node),
+                        )
+                        count += 1
+        os.replace(temp_path, output)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return count
+
+
+class SourceBundle:
+    """
+    A zip file of the sources of classes and functions, stored dedented, one
+    entry per definition, so a lookup is one dictionary access into the zip's
+    directory. Entries are named by the first line of their definition too,
+    to tell apart those sharing a qualname, like property setters.
+    """
+
+    def __init__(self, path: str) -> None:
+        import zipfile
+
+        self.path = path
+        self._zip = zipfile.ZipFile(path)
+        self._by_qualname: dict[str, list[str]] | None = None
+
+    def get(
+        self, module: str, qualname: str, first_lineno: int | None = None
+    ) -> str | None:
+        """
+        Return the source of a definition, or None if it isn't in the bundle.
+        Without its first line number, such as for classes on Python < 3.13,
+        the definition is only found if no others share its qualname.
+        """
+        if first_lineno is not None:
+            name = _entry_name(module, qualname, first_lineno)
+        else:
+            names = self._names(module, qualname)
+            if len(names) != 1:
+                return None
+            name = names[0]
+        try:
+            data = self._zip.read(name)
+        except KeyError:
+            return None
+        return data.decode("utf-8")
+
+    def _names(self, module: str, qualname: str) -> list[str]:
+        if self._by_qualname is None:
+            self._by_qualname = {}
+            for name in self._zip.namelist():
+                prefix = name.rpartition(":")[0]
+                self._by_qualname.setdefault(prefix, []).append(name)
+        return self._by_qualname.get(f"{module}:{qualname}", [])
+
+    def close(self) -> None:
+        self._zip.close()
+
+
+def _entry_name(module: str, qualname: str, first_lineno: int) -> str:
+    return f"{module}:{qualname}:{first_lineno}"
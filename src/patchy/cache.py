@@ -1,30 +1,138 @@
 from __future__ import annotations
 
+import hashlib
+import os
 import random
+import sys
+import tempfile
+import threading
+import zlib
+from typing import Any, cast
 
 
 class PatchingCache:
     def __init__(self, maxsize: int) -> None:
         self.maxsize = maxsize
-        self._cache: dict[tuple[str, str, bool], str] = {}
+        self.lean = False
+        self._cache: dict[tuple[str | bytes, str | bytes, bool], str | bytes] = {}
+        self._lock = threading.Lock()
 
     def clear(self) -> None:
-        self._cache = {}
+        with self._lock:
+            self._cache = {}
+
+    def set_lean(self, lean: bool) -> None:
+        """
+        Switch between storing full sources and storing them compressed,
+        keyed by hashes. Entries stored the other way are dropped.
+        """
+        with self._lock:
+            if lean != self.lean:
+                self.lean = lean
+                self._cache = {}
+
+    def _key(
+        self, source: str, patch_text: str, forwards: bool
+    ) -> tuple[str | bytes, str | bytes, bool]:
+        if self.lean:
+            return (
+                hashlib.sha256(source.encode()).digest(),
+                hashlib.sha256(patch_text.encode()).digest(),
+                forwards,
+            )
+        return (source, patch_text, forwards)
+
+    def _value(self, source: str) -> str | bytes:
+        if self.lean:
+            return zlib.compress(source.encode())
+        return source
+
+    def sizeof(self, seen: set[int]) -> int:
+        """
+        Approximate the memory used by cached strings, skipping objects whose
+        id is in `seen`, and adding the rest.
+        """
+        size = 0
+        with self._lock:
+            items = list(self._cache.items())
+        for key, value in items:
+            for obj in (key[0], key[1], value):
+                if id(obj) not in seen:
+                    seen.add(id(obj))
+                    size += sys.getsizeof(obj)
+        return size
 
     def retrieve(self, source: str, patch_text: str, forwards: bool) -> str:
-        return self._cache[(source, patch_text, forwards)]
+        with self._lock:
+            value = self._cache[self._key(source, patch_text, forwards)]
+        if isinstance(value, bytes):
+            return zlib.decompress(value).decode()
+        return value
 
     def store(
         self, source: str, patch_text: str, forwards: bool, new_source: str
     ) -> None:
-        if len(self._cache) + 2 > self.maxsize:
-            # Delete a random 25%, at least 2
-            delete_count = max(2, len(self._cache) // 4)
-            to_delete = random.sample(list(self._cache.keys()), delete_count)
-            for key in to_delete:
-                del self._cache[key]
-
-        # Cache in both directions - makes reversal faster
-        self._cache[(source, patch_text, forwards)] = new_source
-        other_direction = not forwards
-        self._cache[(new_source, patch_text, other_direction)] = source
+        with self._lock:
+            if len(self._cache) + 2 > self.maxsize:
+                # Delete a random 25%, at least 2
+                delete_count = max(2, len(self._cache) // 4)
+                to_delete = random.sample(list(self._cache.keys()), delete_count)
+                for key in to_delete:
+                    del self._cache[key]
+
+            # Cache in both directions - makes reversal faster
+            key = self._key(source, patch_text, forwards)
+            self._cache[key] = self._value(new_source)
+            other_direction = not forwards
+            key = self._key(new_source, patch_text, other_direction)
+            self._cache[key] = self._value(source)
+
+
+class DiskCache:
+    """
+    A persistent cache of JSON-serializable entries, stored one file per key,
+    so it can be shared between processes and survive restarts.
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+
+    def _path(self, key: str) -> str:
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return os.path.join(self.directory, digest + ".json")
+
+    def retrieve(self, key: str) -> dict[str, Any]:
+        # Deferred, as json is slow to import
+        import json
+
+        try:
+            with open(self._path(key)) as fp:
+                entry = json.load(fp)
+        except (OSError, ValueError):
+            raise KeyError(key) from None
+        if not isinstance(entry, dict) or entry.get("key") != key:
+            raise KeyError(key)
+        return cast(dict[str, Any], entry["value"])
+
+    def store(self, key: str, value: dict[str, Any]) -> None:
+        """
+        Store an entry if possible. Like failing to read, failing to write is
+        ignored, such as when the directory can't be created or written to,
+        since callers have already made the change the entry records.
+        """
+        import json
+
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        except OSError:
+            return
+        try:
+            with os.fdopen(fd, "w") as fp:
+                json.dump({"key": key, "value": value}, fp)
+            os.replace(temp_path, self._path(key))
+        except OSError:
+            os.unlink(temp_path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
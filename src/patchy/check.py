@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import os
+from collections.abc import Iterable, Sequence
+from textwrap import dedent
+from typing import Any
+
+from .api import _apply_patch
+from .static import get_static_source
+
+__all__ = ("check",)
+
+PATCH_SUFFIX = ".patch"
+
+
+def check(
+    patch_paths: Iterable[str],
+    path: Sequence[str],
+    jobs: int | None = None,
+) -> list[dict[str, Any]]:
+    patches = [
+        (target, filename, _read(filename))
+        for target, filename in iter_patch_files(patch_paths)
+    ]
+    path = list(path)
+    if jobs == 1 or len(patches) <= 1:
+        # A loop rather than a comprehension, so warnings point at our caller
+        results = []
+        for target, filename, patch_text in patches:
+            results.append(_check_one(target, filename, patch_text, path, 3))
+        return results
+
+    # Deferred, as concurrent.futures is slow to import
+    from concurrent.futures import ProcessPoolExecutor
+
+    workers = jobs or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(
+            executor.map(
+                _check_one,
+                *zip(*patches),
+                [path] * len(patches),
+                chunksize=max(1, len(patches) // (4 * workers)),
+            )
+        )
+
+
+def iter_patch_files(patch_paths: Iterable[str]) -> list[tuple[str, str]]:
+    """
+    Expand files and directories into (target, filename) pairs. Each patch
+    file is named after the dotted path of the function it patches, e.g.
+    ``django.utils.text.slugify.patch``.
+    """
+    result = []
+    for patch_path in patch_paths:
+        if os.path.isdir(patch_path):
+            filenames = sorted(
+                os.path.join(patch_path, name)
+                for name in os.listdir(patch_path)
+                if name.endswith(PATCH_SUFFIX)
+            )
+        else:
+            filenames = [patch_path]
+        for filename in filenames:
+            name = os.path.basename(filename)
+            if not name.endswith(PATCH_SUFFIX):
+                raise ValueError(f"Patch file '{filename}' must end with .patch.")
+            result.append((name[: -len(PATCH_SUFFIX)], filename))
+    return result
+
+
+def _read(filename: str) -> str:
+    with open(filename, encoding="utf-8") as fp:
+        return fp.read()
+
+
+def _check_one(
+    target: str,
+    filename: str,
+    patch_text: str,
+    path: list[str],
+    stacklevel: int = 2,
+) -> dict[str, Any]:
+    result: dict[str, Any] = {"target": target, "patch_file": filename}
+    try:
+        source = get_static_source(target, path)
+    except (LookupError, OSError, SyntaxError) as exc:
+        result.update(status="missing", message=str(exc))
+        return result
+
+    try:
+        new_source = _apply_patch(
+            source,
+            dedent(patch_text),
+            True,
+            target.rpartition(".")[2],
+            stacklevel=stacklevel + 1,
+        )
+    except ValueError as exc:
+        result.update(status="failed", message=str(exc))
+        return result
+
+    try:
+        compile(new_source, f"<patchy {target}>", "exec", dont_inherit=True)
+    except SyntaxError as exc:
+        result.update(status="invalid", message=str(exc))
+        return result
+
+    result.update(status="ok", message="")
+    return result
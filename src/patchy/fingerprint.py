@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+from functools import cache
+
+
+@cache
+def _packages_distributions() -> dict[str, list[str]]:
+    # Deferred, as importlib.metadata is slow to import
+    from importlib import metadata
+
+    return dict(metadata.packages_distributions())
+
+
+@cache
+def distribution_version(module: str) -> str | None:
+    """
+    Return the version of the installed distribution that provides the given
+    module, or None if it doesn't come from one.
+    """
+    from importlib import metadata
+
+    top_level = module.partition(".")[0]
+    for name in sorted(_packages_distributions().get(top_level, [])):
+        try:
+            return f"{name}=={metadata.version(name)}"
+        except metadata.PackageNotFoundError:  # pragma: no cover
+            continue
+    return None
+
+
+_file_hashes: dict[tuple[str, int, int], str] = {}
+
+
+def file_hash(filename: str) -> str:
+    """
+    Return a hash of the contents of the given file. Results are memoized by
+    modification time and size, so repeated calls only cost a stat().
+    """
+    stat = os.stat(filename)
+    key = (filename, stat.st_mtime_ns, stat.st_size)
+    try:
+        return _file_hashes[key]
+    except KeyError:
+        pass
+    with open(filename, "rb") as fp:
+        digest = hashlib.sha256(fp.read()).hexdigest()
+    _file_hashes[key] = digest
+    return digest
+
+
+def fingerprint(module: str, filename: str) -> dict[str, str | None] | None:
+    """
+    Identify the current version of the code in a module, by the version of
+    its owning distribution and the hash of its defining file.
+    """
+    try:
+        digest = file_hash(filename)
+    except OSError:
+        return None
+    return {"distribution": distribution_version(module), "file_hash": digest}
+
+
+_SPECIFIER_RE = re.compile(r"\s*(==|!=|~=|>=|<=|>|<)\s*([0-9][0-9A-Za-z.*+!-]*)\s*")
+
+_RELEASE_RE = re.compile(r"v?(\d+(?:\.\d+)*)", re.IGNORECASE)
+
+# Pre-release, post-release, and development release parts after the release
+# segments, in PEP 440's normalized and alternative spellings
+_SUFFIX_RE = re.compile(
+    r"""
+    (?:[-_.]?(?P<pre>alpha|a|beta|b|preview|pre|c|rc)[-_.]?(?P<pre_number>\d*))?
+    (?:-(?P<implicit_post>\d+)|[-_.]?(?P<post>post|rev|r)[-_.]?(?P<post_number>\d*))?
+    (?:[-_.]?(?P<dev>dev)[-_.]?(?P<dev_number>\d*))?
+    """,
+    re.IGNORECASE | re.VERBOSE,
+)
+
+_PRE_PHASES = {"a": 0, "alpha": 0, "b": 1, "beta": 1}
+
+
+def _release(version: str) -> tuple[tuple[int, ...], str]:
+    """
+    Parse the leading numeric release segments of a version, e.g. (4, 2, 1)
+    for "4.2.1rc1", and return them with the rest of the version.
+    """
+    match = _RELEASE_RE.match(version.strip())
+    if match is None:
+        return (), version
+    release = tuple(int(part) for part in match[1].split("."))
+    return release, version.strip()[match.end() :]
+
+
+def _suffix_key(rest: str) -> tuple[int, ...]:
+    """
+    Make a sort key for the part of a version after its release segments,
+    ordering as PEP 440 does: development releases, then pre-releases, the
+    release itself, and post-releases. Local version labels are ignored.
+    """
+    match = _SUFFIX_RE.match(rest)
+    assert match is not None
+    if match["pre"] is not None:
+        phase = _PRE_PHASES.get(match["pre"].lower(), 2)
+        pre = (phase, int(match["pre_number"] or 0))
+    elif (
+        match["dev"] is not None
+        and match["post"] is None
+        and match["implicit_post"] is None
+    ):
+        # A development release of the release itself sorts before its
+        # pre-releases
+        pre = (-1, 0)
+    else:
+        pre = (3, 0)
+    if match["implicit_post"] is not None:
+        post = int(match["implicit_post"])
+    elif match["post"] is not None:
+        post = int(match["post_number"] or 0)
+    else:
+        post = -1
+    dev = (0, int(match["dev_number"] or 0)) if match["dev"] is not None else (1, 0)
+    return (*pre, post, *dev)
+
+
+# The suffix key of a final release, without pre, post, or dev parts
+_FINAL = _suffix_key("")
+
+
+def _is_prerelease(suffix_key: tuple[int, ...]) -> bool:
+    """
+    Check whether a suffix key from _suffix_key() is for a pre-release or
+    development release.
+    """
+    return suffix_key[0] != 3 or suffix_key[3] == 0
+
+
+def version_matches(version: str, specifier: str) -> bool:
+    """
+    Check a version against a comma-separated specifier such as
+    ">=4.2,<5", ordering versions as PEP 440 does, so 5.0rc1 < 5. As in
+    PEP 440, < excludes pre-releases of the version named, and > excludes
+    its post-releases, so 5.0rc1 doesn't match <5. A trailing ".*" is
+    supported for == and !=, matching release segments.
+    """
+    current, rest = _release(version)
+    current_suffix = _suffix_key(rest)
+    for clause in specifier.split(","):
+        match = _SPECIFIER_RE.fullmatch(clause)
+        if match is None:
+            raise ValueError(f"Invalid version specifier {specifier!r}.")
+        op, target = match.groups()
+        if target.endswith(".*"):
+            if op not in ("==", "!="):
+                raise ValueError(f"Invalid version specifier {specifier!r}.")
+            prefix = _release(target[:-2])[0]
+            if (current[: len(prefix)] == prefix) != (op == "=="):
+                return False
+            continue
+        wanted, wanted_rest = _release(target)
+        # Pad so that e.g. 4.2 == 4.2.0
+        width = max(len(current), len(wanted))
+        left = (current + (0,) * (width - len(current)), current_suffix)
+        right = (wanted + (0,) * (width - len(wanted)), _suffix_key(wanted_rest))
+        if op == "~=":
+            if len(wanted) < 2:
+                raise ValueError(f"Invalid version specifier {specifier!r}.")
+            if left < right or left[0][: len(wanted) - 1] != wanted[:-1]:
+                return False
+        elif not {
+            "==": left == right,
+            "!=": left != right,
+            ">=": left >= right,
+            "<=": left <= right,
+            ">": left > right,
+            "<": left < right,
+        }[op]:
+            return False
+        if left[0] != right[0]:
+            continue
+        # Exclusive comparisons don't match pre-releases or post-releases of
+        # the version named, unless it is one itself. A final release's
+        # pre-releases are all those of its release segments, whilst other
+        # versions only have development releases and post-releases of
+        # their own.
+        if (
+            op == "<"
+            and _is_prerelease(left[1])
+            and not _is_prerelease(right[1])
+            and (right[1] == _FINAL or left[1][:3] == right[1][:3])
+        ):
+            return False
+        if (
+            op == ">"
+            and left[1][2] != -1
+            and right[1][2:] == _FINAL[2:]
+            and left[1][:2] == right[1][:2]
+        ):
+            return False
+    return True
@@ -0,0 +1,541 @@
+from __future__ import annotations
+
+import ast
+import copy
+import inspect
+from collections.abc import Callable, Iterator
+from pkgutil import resolve_name as pkgutil_resolve_name
+from types import FunctionType
+from typing import Any, TypeGuard, cast
+
+from .api import (
+    _class_name,
+    _do_patch,
+    _get_real_func,
+    _get_source,
+    _labelled_patch,
+    _lock,
+    _patch_to,
+)
+from .static import edited_source, indent_source, node_span, splice, statement_span
+
+__all__ = ("inline", "uninline")
+
+
+def inline(caller: Callable[..., Any] | str, callee_name: str) -> int:
+    if isinstance(caller, str):
+        caller = cast(Callable[..., Any], pkgutil_resolve_name(caller))
+    name = caller.__name__
+    with _lock:
+        real_caller = _get_real_func(caller)
+        if _labelled_patch(caller, f"inline {callee_name}") is not None:
+            raise ValueError(f"'{callee_name}' is already inlined into '{name}'.")
+
+        source = _get_source(caller)
+        tree = ast.parse(source).body[0]
+        assert isinstance(tree, (ast.FunctionDef, ast.AsyncFunctionDef))
+        callee = _resolve_callee(real_caller, callee_name)
+        inliner = _Inliner(real_caller, tree, callee_name, callee)
+        if not inliner.problems:
+            tree.body = inliner.visit_body(tree.body)
+        if inliner.problems:
+            raise ValueError(
+                f"Cannot inline '{callee_name}' into '{name}': "
+                + "; ".join(inliner.problems)
+                + "."
+            )
+        if inliner.count == 0:
+            raise ValueError(f"'{name}' has no calls to '{callee_name}'.")
+
+        ast.fix_missing_locations(tree)
+        candidates = _candidates(source, inliner.replaced)
+        _patch_to(caller, edited_source(tree, candidates), f"inline {callee_name}")
+    return inliner.count
+
+
+def uninline(caller: Callable[..., Any] | str, callee_name: str) -> None:
+    if isinstance(caller, str):
+        caller = cast(Callable[..., Any], pkgutil_resolve_name(caller))
+    with _lock:
+        patch_text = _labelled_patch(caller, f"inline {callee_name}")
+        if patch_text is None:
+            raise ValueError(
+                f"'{callee_name}' is not inlined into '{caller.__name__}'."
+            )
+        _do_patch(caller, patch_text, forwards=False)
+
+
+# Gritty internals
+
+# Names that look up the calling frame, so behave differently once inlined
+_FRAME_NAMES = frozenset(("__class__", "eval", "exec", "locals", "super", "vars"))
+
+_CONSTANT_TYPES = (bool, bytes, complex, float, int, str, type(None))
+
+
+def _resolve_callee(real_caller: Any, callee_name: str) -> FunctionType:
+    first, *rest = callee_name.split(".")
+    try:
+        callee = real_caller.__globals__[first]
+        for attribute in rest:
+            callee = getattr(callee, attribute)
+    except (KeyError, AttributeError):
+        raise ValueError(
+            f"Could not find '{callee_name}' from '{real_caller.__name__}'."
+        ) from None
+    callee = _get_real_func(callee)
+    if not isinstance(callee, FunctionType) or callee.__name__ == "<lambda>":
+        raise ValueError(f"'{callee_name}' is not a Python function.")
+    return callee
+
+
+def _bound_names(tree: ast.AST) -> Iterator[str]:
+    """
+    Yield every name that code within a tree binds, in any scope.
+    """
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and not isinstance(node.ctx, ast.Load):
+            yield node.id
+        elif isinstance(node, ast.arg):
+            yield node.arg
+        elif isinstance(node, ast.alias):
+            yield node.asname or node.name.partition(".")[0]
+        elif isinstance(
+            node,
+            (
+                ast.FunctionDef,
+                ast.AsyncFunctionDef,
+                ast.ClassDef,
+                ast.ExceptHandler,
+                ast.MatchAs,
+                ast.MatchStar,
+            ),
+        ):
+            if node.name is not None:
+                yield node.name
+        elif isinstance(node, (ast.Global, ast.Nonlocal)):
+            yield from node.names
+
+
+def _walk_scope(tree: ast.AST) -> Iterator[ast.AST]:
+    """
+    Like ast.walk(), but without descending into nested functions and
+    classes.
+    """
+    todo = [tree]
+    while todo:
+        node = todo.pop()
+        yield node
+        if node is tree or not isinstance(
+            node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda)
+        ):
+            todo.extend(ast.iter_child_nodes(node))
+
+
+def _is_private(name: str) -> bool:
+    return name.startswith("__") and not name.endswith("__")
+
+
+def _candidates(
+    source: str, replaced: list[tuple[ast.AST, ast.expr | list[ast.stmt]]]
+) -> list[str]:
+    """
+    Make the caller's source with the text of each replacement spliced over
+    the statement or call it replaced, so the rest keeps its comments and
+    formatting, as is and with brackets around expressions, in case
+    precedence needs them. Replacements nested in others are part of the
+    outer one's text. Returns no candidates if a replaced statement shares a
+    line with other code.
+    """
+    lines = source.splitlines(keepends=True)
+    # (start, end, text, bracketed text) of each replacement
+    spans: list[tuple[int, int, str, str]] = []
+    for original, replacement in replaced:
+        if isinstance(replacement, list):
+            assert isinstance(original, ast.stmt)
+            span = statement_span(lines, original)
+            if span is None:
+                return []
+            start, end, indent = span
+            text = "\n".join(ast.unparse(statement) for statement in replacement)
+            # Keep any comment after the statement on its last line
+            assert original.end_lineno is not None
+            assert original.end_col_offset is not None
+            last_line = lines[original.end_lineno - 1].encode()
+            comment = last_line[original.end_col_offset :].decode().strip()
+            if comment:
+                text += f"  {comment}"
+            text = indent_source(text, indent)
+            spans.append((start, end, text, text))
+        else:
+            assert isinstance(original, ast.expr)
+            start, end = node_span(lines, original)
+            text = ast.unparse(replacement)
+            spans.append((start, end, text, f"({text})"))
+
+    outermost = [
+        span
+        for span in spans
+        if not any(
+            other is not span and other[0] <= span[0] and span[1] <= other[1]
+            for other in spans
+        )
+    ]
+    return [
+        splice(source, [(start, end, text) for start, end, text, _ in outermost]),
+        splice(source, [(start, end, text) for start, end, _, text in outermost]),
+    ]
+
+
+class _Inliner(ast.NodeTransformer):
+    """
+    Replace calls to a callee with its body. Calls that are a whole
+    statement, such as `x = f(a)`, become the callee's statements, with its
+    arguments and locals given fresh names. Other calls are replaced with the
+    callee's return expression, if it's a single return statement.
+    Problems that make inlining unsafe are collected in `problems`.
+    """
+
+    def __init__(
+        self,
+        real_caller: Any,
+        tree: ast.FunctionDef | ast.AsyncFunctionDef,
+        callee_name: str,
+        callee: FunctionType,
+    ) -> None:
+        self.callee_name = callee_name
+        self.callee = callee
+        self.count = 0
+        self.problems: list[str] = []
+        # Each statement or call inlined into, and what replaced it
+        self.replaced: list[tuple[ast.AST, ast.expr | list[ast.stmt]]] = []
+        self.caller_bound = set(_bound_names(tree))
+        self.caller_bound.update(real_caller.__code__.co_freevars)
+
+        definition = ast.parse(_get_source(callee)).body[0]
+        assert isinstance(definition, (ast.FunctionDef, ast.AsyncFunctionDef))
+        self.arguments = definition.args
+        self.body = definition.body
+        if (
+            isinstance(self.body[0], ast.Expr)
+            and isinstance(self.body[0].value, ast.Constant)
+            and isinstance(self.body[0].value.value, str)
+            and len(self.body) > 1
+        ):
+            # Drop the docstring
+            self.body = self.body[1:]
+        # Names the body binds, which are given fresh names when inlined
+        self.body_bound = set(_bound_names(ast.Module(self.body, [])))
+        self.expression = None
+        if len(self.body) == 1 and isinstance(self.body[0], ast.Return):
+            self.expression = self.body[0].value or ast.Constant(None)
+        self.params = [
+            arg.arg
+            for arg in (
+                *self.arguments.posonlyargs,
+                *self.arguments.args,
+                *self.arguments.kwonlyargs,
+            )
+        ]
+        self.used = self.caller_bound | self.body_bound | set(self.params)
+        self.used.update(
+            node.id for node in ast.walk(tree) if isinstance(node, ast.Name)
+        )
+
+        self._check_callee(real_caller, callee_name.partition(".")[0])
+
+    def _check_callee(self, real_caller: Any, first_name: str) -> None:
+        problem = self.problems.append
+        callee = self.callee
+        if first_name in self.caller_bound:
+            problem(f"'{real_caller.__name__}' has a local named '{first_name}'")
+        if hasattr(callee, "__wrapped__"):
+            problem("it is wrapped by a decorator")
+        if callee.__closure__:
+            problem("it uses closure variables")
+        if callee.__code__.co_flags & (
+            inspect.CO_GENERATOR | inspect.CO_COROUTINE | inspect.CO_ASYNC_GENERATOR
+        ):
+            problem("it is a generator or coroutine")
+        if self.arguments.vararg or self.arguments.kwarg:
+            problem("it takes *args or **kwargs")
+
+        nodes = list(_walk_scope(ast.Module(self.body, [])))
+        if any(
+            isinstance(
+                node,
+                (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda),
+            )
+            for node in nodes
+        ):
+            problem("it defines functions or classes")
+        if any(isinstance(node, (ast.Global, ast.Nonlocal)) for node in nodes):
+            problem("it has global or nonlocal statements")
+        returns = [node for node in nodes if isinstance(node, ast.Return)]
+        if returns and (len(returns) > 1 or returns[0] is not self.body[-1]):
+            problem("it returns before its end")
+
+        names = {node.id for node in nodes if isinstance(node, ast.Name)}
+        for frame_name in sorted(names & _FRAME_NAMES):
+            problem(f"it uses '{frame_name}'")
+        identifiers = names | {
+            node.attr for node in nodes if isinstance(node, ast.Attribute)
+        }
+        if any(_is_private(identifier) for identifier in identifiers) and (
+            _class_name(real_caller) != _class_name(callee)
+        ):
+            problem("it uses private names, which are mangled differently")
+
+        missing = object()
+        for global_name in sorted(
+            {
+                node.id
+                for node in nodes
+                if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load)
+            }
+            - self.body_bound
+            - set(self.params)
+            - _FRAME_NAMES
+        ):
+            if global_name in self.caller_bound or callee.__globals__.get(
+                global_name, missing
+            ) is not real_caller.__globals__.get(global_name, missing):
+                problem(
+                    f"it uses '{global_name}', which refers to something else"
+                    + f" in '{real_caller.__name__}'"
+                )
+
+    # Statements
+
+    def visit_body(self, body: list[ast.stmt]) -> list[ast.stmt]:
+        new_body: list[ast.stmt] = []
+        for statement in body:
+            result = self.visit(statement)
+            if isinstance(result, list):
+                new_body.extend(result)
+            else:
+                new_body.append(result)
+        return new_body
+
+    def _is_call(self, node: Any) -> TypeGuard[ast.Call]:
+        return isinstance(node, ast.Call) and ast.unparse(node.func) == self.callee_name
+
+    def visit_Expr(self, node: ast.Expr) -> Any:
+        if not self._is_call(node.value):
+            return self.generic_visit(node)
+        result, statements = self._inline_statements(node.value)
+        if result is not None and not isinstance(result, (ast.Constant, ast.Name)):
+            statements.append(ast.Expr(result))
+        replacement = statements or [ast.Pass()]
+        self.replaced.append((node, replacement))
+        return replacement
+
+    def visit_Assign(self, node: ast.Assign) -> Any:
+        if not self._is_call(node.value):
+            return self.generic_visit(node)
+        result, statements = self._inline_statements(node.value)
+        node.value = result or ast.Constant(None)
+        return self._replace(node, [*statements, node])
+
+    def visit_AugAssign(self, node: ast.AugAssign) -> Any:
+        # Only simple targets, since other targets are evaluated before the
+        # value
+        if not (isinstance(node.target, ast.Name) and self._is_call(node.value)):
+            return self.generic_visit(node)
+        result, statements = self._inline_statements(node.value)
+        node.value = result or ast.Constant(None)
+        return self._replace(node, [*statements, node])
+
+    def visit_AnnAssign(self, node: ast.AnnAssign) -> Any:
+        if not self._is_call(node.value):
+            return self.generic_visit(node)
+        assert node.value is not None
+        result, statements = self._inline_statements(node.value)
+        node.value = result or ast.Constant(None)
+        return self._replace(node, [*statements, node])
+
+    def visit_Return(self, node: ast.Return) -> Any:
+        if not self._is_call(node.value):
+            return self.generic_visit(node)
+        assert node.value is not None
+        result, statements = self._inline_statements(node.value)
+        node.value = result
+        return self._replace(node, [*statements, node])
+
+    def generic_visit(self, node: ast.AST) -> ast.AST:
+        # Nested statement lists are visited as bodies, so statements can be
+        # replaced with several
+        for field, value in ast.iter_fields(node):
+            if isinstance(value, list) and value and isinstance(value[0], ast.stmt):
+                setattr(node, field, self.visit_body(value))
+            elif isinstance(value, list):
+                value[:] = [
+                    self.visit(item) if isinstance(item, ast.AST) else item
+                    for item in value
+                ]
+            elif isinstance(value, ast.AST):
+                setattr(node, field, self.visit(value))
+        return node
+
+    def _replace(self, node: ast.stmt, replacement: list[ast.stmt]) -> list[ast.stmt]:
+        self.replaced.append((node, replacement))
+        return replacement
+
+    def _inline_statements(
+        self, call: ast.Call
+    ) -> tuple[ast.expr | None, list[ast.stmt]]:
+        """
+        Inline a call that is a whole statement, returning the callee's
+        result expression, or None, and the statements that precede it.
+        """
+        call.args = [self.visit(arg) for arg in call.args]
+        for keyword in call.keywords:
+            keyword.value = self.visit(keyword.value)
+        bindings = self._bind(call)
+        if bindings is None:
+            return call, []
+        self.count += 1
+
+        renames = {
+            name: self._fresh(name)
+            for name in sorted(self.body_bound)
+            if name not in self.params
+        }
+        substitutions: dict[str, ast.expr] = {}
+        statements: list[ast.stmt] = []
+        for param, value in bindings:
+            if param not in self.body_bound and self._is_substitutable(value):
+                substitutions[param] = value
+            else:
+                renames[param] = self._fresh(param)
+                statements.append(
+                    ast.Assign([ast.Name(renames[param], ast.Store())], value)
+                )
+
+        body = [
+            _Renamer(substitutions, renames).visit(copy.deepcopy(statement))
+            for statement in self.body
+        ]
+        result = None
+        if isinstance(body[-1], ast.Return):
+            result = body.pop().value
+        statements.extend(body)
+        return result, statements
+
+    # Expressions
+
+    def visit_Call(self, node: ast.Call) -> Any:
+        self.generic_visit(node)
+        if not self._is_call(node):
+            return node
+        line = f"the call on line {node.lineno}"
+        if self.expression is None:
+            self.problems.append(
+                f"{line} isn't a whole statement, which it must be for a"
+                + " function with more than a return statement"
+            )
+            return node
+        bindings = self._bind(node)
+        if bindings is None:
+            return node
+        if not all(
+            param not in self.body_bound and self._is_substitutable(value)
+            for param, value in bindings
+        ):
+            self.problems.append(
+                f"{line} isn't a whole statement, which it must be to pass"
+                + " values other than local names or constants"
+            )
+            return node
+        self.count += 1
+        renames = {name: self._fresh(name) for name in sorted(self.body_bound)}
+        new = _Renamer(dict(bindings), renames).visit(copy.deepcopy(self.expression))
+        self.replaced.append((node, new))
+        return new
+
+    # Helpers
+
+    def _bind(self, call: ast.Call) -> list[tuple[str, ast.expr]] | None:
+        """
+        Match a call's arguments to the callee's parameters, in the order the
+        call evaluates them, followed by any defaults. Records a problem and
+        returns None if they don't match.
+        """
+        line = f"the call on line {call.lineno}"
+        arguments = self.arguments
+        positional = [arg.arg for arg in (*arguments.posonlyargs, *arguments.args)]
+        keywords = {arg.arg for arg in (*arguments.args, *arguments.kwonlyargs)}
+        if any(isinstance(arg, ast.Starred) for arg in call.args) or any(
+            keyword.arg is None for keyword in call.keywords
+        ):
+            self.problems.append(f"{line} passes * or ** arguments")
+            return None
+        if len(call.args) > len(positional):
+            self.problems.append(f"{line} passes too many arguments")
+            return None
+
+        bindings = list(zip(positional, call.args))
+        bound = set(positional[: len(call.args)])
+        for keyword in call.keywords:
+            assert keyword.arg is not None
+            if keyword.arg not in keywords or keyword.arg in bound:
+                self.problems.append(
+                    f"{line} passes unexpected argument '{keyword.arg}'"
+                )
+                return None
+            bindings.append((keyword.arg, keyword.value))
+            bound.add(keyword.arg)
+
+        defaults = dict(
+            zip(
+                reversed(positional),
+                reversed(self.callee.__defaults__ or ()),
+            )
+        )
+        defaults.update(self.callee.__kwdefaults__ or {})
+        for param in self.params:
+            if param in bound:
+                continue
+            if param not in defaults:
+                self.problems.append(f"{line} is missing argument '{param}'")
+                return None
+            default = defaults[param]
+            if not isinstance(default, _CONSTANT_TYPES):
+                self.problems.append(
+                    f"{line} uses the default for '{param}', which isn't a constant"
+                )
+                return None
+            bindings.append((param, ast.Constant(default)))
+        return bindings
+
+    def _is_substitutable(self, value: ast.expr) -> bool:
+        """
+        Whether an argument can be used directly in the callee's body,
+        because nothing the body runs can change its value.
+        """
+        return isinstance(value, ast.Constant) or (
+            isinstance(value, ast.Name) and value.id in self.caller_bound
+        )
+
+    def _fresh(self, name: str) -> str:
+        base = f"_{self.callee.__name__.strip('_')}_{name.strip('_')}"
+        fresh = base
+        number = 1
+        while fresh in self.used:
+            number += 1
+            fresh = f"{base}_{number}"
+        self.used.add(fresh)
+        return fresh
+
+
+class _Renamer(ast.NodeTransformer):
+    def __init__(self, substitutions: dict[str, ast.expr], renames: dict[str, str]):
+        self.substitutions = substitutions
+        self.renames = renames
+
+    def visit_Name(self, node: ast.Name) -> ast.expr:
+        if node.id in self.substitutions:
+            return copy.deepcopy(self.substitutions[node.id])
+        if node.id in self.renames:
+            node.id = self.renames[node.id]
+        return node
@@ -0,0 +1,246 @@
+from __future__ import annotations
+
+import sys
+import threading
+from collections.abc import Callable
+from time import perf_counter
+from types import CodeType, FrameType
+from typing import Any
+
+__all__ = (
+    "enable_instrumentation",
+    "disable_instrumentation",
+    "instrumentation_snapshot",
+)
+
+
+def enable_instrumentation() -> None:
+    global _enabled
+    if _enabled:
+        return
+    from .api import _lock, _original_code, _registry
+
+    with _lock:
+        _enabled = True
+        if _monitoring is not None:
+            _start_monitoring()
+        else:
+            _start_profiling()
+        for real_func in list(_registry.keys()):
+            if real_func.__code__ is not _original_code(real_func):
+                _track(real_func, real_func.__code__)
+
+
+def disable_instrumentation() -> None:
+    global _enabled
+    if not _enabled:
+        return
+    from .api import _lock
+
+    with _lock:
+        _enabled = False
+        for code in list(_names):
+            _untrack(code)
+        if _monitoring is not None:
+            _stop_monitoring()
+        else:
+            _stop_profiling()
+
+
+def instrumentation_snapshot(reset: bool = False) -> dict[str, dict[str, Any]]:
+    with _stats_lock:
+        snapshot = {
+            name: {"calls": stats[0], "total_time": stats[1]}
+            for name, stats in _stats.items()
+        }
+        if reset:
+            _stats.clear()
+    return snapshot
+
+
+# Gritty internals
+
+_enabled = False
+
+# Patched code objects being instrumented -> name to report them under
+_names: dict[CodeType, str] = {}
+
+# Name -> [calls, total_time]
+_stats: dict[str, list[Any]] = {}
+_stats_lock = threading.Lock()
+
+# Per-thread stack of start times for instrumented frames
+_local = threading.local()
+
+
+def code_changed(
+    func: Callable[..., Any],
+    old_code: CodeType,
+    new_code: CodeType | None,
+) -> None:
+    """
+    Called by the patching machinery whenever it swaps a function's code.
+    new_code is None when the function is restored to its original code.
+    """
+    if not _enabled:
+        return
+    _untrack(old_code)
+    if new_code is not None:
+        _track(func, new_code)
+
+
+def _track(func: Callable[..., Any], code: CodeType) -> None:
+    _names[code] = f"{func.__module__}.{func.__qualname__}"
+    if _monitoring is not None:
+        _monitoring.set_local_events(_tool_id, code, _LOCAL_EVENTS)
+
+
+def _untrack(code: CodeType) -> None:
+    if _names.pop(code, None) is not None and _monitoring is not None:
+        _monitoring.set_local_events(_tool_id, code, 0)
+
+
+# The following run within profiling hooks, where coverage can't measure them
+
+
+def _stack() -> list[float]:  # pragma: no cover
+    try:
+        stack: list[float] = _local.stack
+    except AttributeError:
+        stack = _local.stack = []
+    return stack
+
+
+def _enter(code: CodeType, is_call: bool) -> None:  # pragma: no cover
+    if is_call:
+        # Untracking can race with calls, so the code may no longer have a
+        # name. The start time is still pushed, to pair with _exit().
+        name = _names.get(code)
+        if name is not None:
+            with _stats_lock:
+                try:
+                    _stats[name][0] += 1
+                except KeyError:
+                    _stats[name] = [1, 0.0]
+    _stack().append(perf_counter())
+
+
+def _exit(code: CodeType) -> None:  # pragma: no cover
+    end = perf_counter()
+    stack = _stack()
+    if not stack:
+        # Entered before instrumentation was enabled
+        return
+    elapsed = end - stack.pop()
+    with _stats_lock:
+        try:
+            _stats[_names[code]][1] += elapsed
+        except KeyError:
+            pass
+
+
+# sys.monitoring implementation, for Python 3.12+
+
+_monitoring: Any = getattr(sys, "monitoring", None)
+_tool_id = -1
+_LOCAL_EVENTS = 0
+
+if _monitoring is not None:
+    _events = _monitoring.events
+    _LOCAL_EVENTS = (
+        _events.PY_START | _events.PY_RESUME | _events.PY_RETURN | _events.PY_YIELD
+    )
+
+    def _start_monitoring() -> None:
+        global _tool_id
+        for tool_id in (4, 3):
+            try:
+                _monitoring.use_tool_id(tool_id, "patchy")
+            except ValueError:
+                continue
+            _tool_id = tool_id
+            break
+        else:
+            raise RuntimeError("No free sys.monitoring tool ID for patchy.")
+
+        def on_start(code: CodeType, offset: int) -> None:  # pragma: no cover
+            _enter(code, True)
+
+        def on_resume(code: CodeType, offset: int) -> None:  # pragma: no cover
+            _enter(code, False)
+
+        def on_exit(
+            code: CodeType, offset: int, value: object
+        ) -> None:  # pragma: no cover
+            _exit(code)
+
+        def on_unwind(
+            code: CodeType, offset: int, exc: BaseException
+        ) -> None:  # pragma: no cover
+            # PY_UNWIND can only be enabled globally, so filter here
+            if code in _names:
+                _exit(code)
+
+        _monitoring.register_callback(_tool_id, _events.PY_START, on_start)
+        _monitoring.register_callback(_tool_id, _events.PY_RESUME, on_resume)
+        _monitoring.register_callback(_tool_id, _events.PY_RETURN, on_exit)
+        _monitoring.register_callback(_tool_id, _events.PY_YIELD, on_exit)
+        _monitoring.register_callback(_tool_id, _events.PY_UNWIND, on_unwind)
+        _monitoring.set_events(_tool_id, _events.PY_UNWIND)
+
+    def _stop_monitoring() -> None:
+        global _tool_id
+        _monitoring.set_events(_tool_id, 0)
+        for event in (
+            _events.PY_START,
+            _events.PY_RESUME,
+            _events.PY_RETURN,
+            _events.PY_YIELD,
+            _events.PY_UNWIND,
+        ):
+            _monitoring.register_callback(_tool_id, event, None)
+        _monitoring.free_tool_id(_tool_id)
+        _tool_id = -1
+
+
+# Profile function implementation, for older versions
+
+_previous_profile: Any = None
+
+
+def _profile(frame: FrameType, event: str, arg: Any) -> None:  # pragma: no cover
+    if _previous_profile is not None:
+        _previous_profile(frame, event, arg)
+    code = frame.f_code
+    if code not in _names:
+        return
+    if event == "call":
+        _enter(code, _is_start(frame))
+    elif event == "return":
+        _exit(code)
+
+
+def _is_start(frame: FrameType) -> bool:  # pragma: no cover
+    """
+    Whether a "call" profile event starts a frame, rather than resuming a
+    generator or coroutine, which sys.monitoring reports separately.
+    """
+    if sys.version_info >= (3, 11):
+        # The RESUME instruction's argument is 0 at the start
+        return frame.f_code.co_code[frame.f_lasti + 1] == 0
+    else:
+        return frame.f_lasti < 0
+
+
+def _start_profiling() -> None:
+    global _previous_profile
+    _previous_profile = sys.getprofile()
+    sys.setprofile(_profile)
+    threading.setprofile(_profile)
+
+
+def _stop_profiling() -> None:
+    global _previous_profile
+    sys.setprofile(_previous_profile)
+    threading.setprofile(_previous_profile)
+    _previous_profile = None
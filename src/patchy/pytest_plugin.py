@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+from collections.abc import Callable, Generator
+from pkgutil import resolve_name as pkgutil_resolve_name
+from textwrap import dedent
+from time import perf_counter
+from types import CodeType
+from typing import Any, cast
+
+import pytest
+
+from .api import (
+    _apply_patch,
+    _compile_source,
+    _get_real_func,
+    _get_source,
+    _install_code,
+    _lock,
+    _pop_history,
+    _restore,
+    _snapshot,
+)
+from .reloading import track as _track
+
+
+class _Session:
+    """
+    Per-session state: compiled patches, keyed by the function, the code
+    they apply to, the patch, and direction, plus usage statistics.
+    """
+
+    def __init__(self) -> None:
+        self.compiled: dict[
+            tuple[Callable[..., Any], CodeType, str, bool], tuple[CodeType, str]
+        ] = {}
+        self.applied = 0
+        self.compilations = 0
+        self.elapsed = 0.0
+
+
+_session_key = pytest.StashKey[_Session]()
+
+
+class PatchyFixture:
+    def __init__(self, session: _Session) -> None:
+        self._session = session
+
+    def patch(self, func: Callable[..., Any] | str, patch_text: str) -> None:
+        self._toggle(func, patch_text, forwards=True)
+
+    def unpatch(self, func: Callable[..., Any] | str, patch_text: str) -> None:
+        self._toggle(func, patch_text, forwards=False)
+
+    def _toggle(
+        self,
+        func: Callable[..., Any] | str,
+        patch_text: str,
+        forwards: bool,
+    ) -> None:
+        start = perf_counter()
+        try:
+            if isinstance(func, str):
+                func = cast(Callable[..., Any], pkgutil_resolve_name(func))
+            patch_text = dedent(patch_text)
+            with _lock:
+                if forwards or not _pop_history(func, patch_text):
+                    self._install(func, patch_text, forwards)
+                _track(func, patch_text, forwards)
+            self._session.applied += 1
+        finally:
+            self._session.elapsed += perf_counter() - start
+
+    def _install(
+        self,
+        func: Callable[..., Any],
+        patch_text: str,
+        forwards: bool,
+    ) -> None:
+        real_func = _get_real_func(func)
+        key = (real_func, real_func.__code__, patch_text, forwards)
+        try:
+            new_code, new_source = self._session.compiled[key]
+        except KeyError:
+            source = _get_source(func)
+            new_source = _apply_patch(source, patch_text, forwards, func.__name__)
+            new_code = _compile_source(func, new_source)
+            self._session.compiled[key] = (new_code, new_source)
+            self._session.compilations += 1
+        history_text = patch_text if forwards else None
+        _install_code(func, new_code, new_source, history_text)
+
+
+@pytest.fixture
+def patchy(request: pytest.FixtureRequest) -> Generator[PatchyFixture]:
+    session = request.config.stash[_session_key]
+    start = perf_counter()
+    snapshot = _snapshot()
+    session.elapsed += perf_counter() - start
+    try:
+        yield PatchyFixture(session)
+    finally:
+        start = perf_counter()
+        _restore(snapshot)
+        session.elapsed += perf_counter() - start
+
+
+def pytest_configure(config: pytest.Config) -> None:
+    config.stash[_session_key] = _Session()
+
+
+def pytest_terminal_summary(terminalreporter: Any, config: pytest.Config) -> None:
+    session = config.stash[_session_key]
+    if session.applied == 0:
+        return
+    terminalreporter.write_line(
+        f"patchy: {session.applied} patches applied"
+        + f" ({session.compilations} compiled)"
+        + f" in {session.elapsed:.3f}s"
+    )
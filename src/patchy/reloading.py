@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import sys
+import warnings
+from collections.abc import Callable, Sequence
+from importlib.machinery import ModuleSpec
+from types import ModuleType
+from typing import Any, NamedTuple
+
+
+class _Op(NamedTuple):
+    qualname: str
+    # Set for patch() and unpatch()
+    patch_text: str | None
+    forwards: bool
+    # Set for replace()
+    new_source: str | None
+
+
+# Module name -> operations to re-apply after it is reloaded, in order
+_module_ops: dict[str, list[_Op]] = {}
+
+
+def track(
+    func: Callable[..., Any],
+    patch_text: str | None,
+    forwards: bool = True,
+    new_source: str | None = None,
+) -> None:
+    """
+    Record a change made to a module-level function, method, or class, so it
+    can be re-applied if its module is reloaded.
+    """
+    module = getattr(func, "__module__", None)
+    qualname = func.__qualname__
+    if module is None or "<locals>" in qualname:
+        return
+
+    ops = _module_ops.setdefault(module, [])
+    if new_source is not None:
+        # Replacing discards all earlier changes
+        ops[:] = [op for op in ops if op.qualname != qualname]
+    elif not forwards:
+        # Unpatching cancels out the matching patch
+        for i in range(len(ops) - 1, -1, -1):
+            op = ops[i]
+            if op.qualname != qualname:
+                continue
+            if op.patch_text == patch_text and op.forwards:
+                del ops[i]
+                return
+            break
+
+    ops.append(_Op(qualname, patch_text, forwards, new_source))
+    if _finder not in sys.meta_path:
+        sys.meta_path.insert(0, _finder)
+
+
+def forget_all() -> None:
+    _module_ops.clear()
+
+
+def snapshot() -> dict[str, list[_Op]]:
+    return {module: list(ops) for module, ops in _module_ops.items()}
+
+
+def restore(saved: dict[str, list[_Op]]) -> None:
+    _module_ops.clear()
+    _module_ops.update((module, list(ops)) for module, ops in saved.items())
+
+
+def _repatch(module: ModuleType) -> None:
+    from .api import _do_patch, _do_patch_class, _get_member, _lock, _set_source
+
+    ops = _module_ops.get(module.__name__, [])
+    for op in list(ops):
+        target: Any = module
+        try:
+            for name in op.qualname.split("."):
+                target = _get_member(target, name)
+            if op.patch_text is not None and isinstance(target, type):
+                _do_patch_class(target, op.patch_text, op.forwards, track=False)
+            elif op.patch_text is not None:
+                _do_patch(target, op.patch_text, op.forwards, track=False)
+            else:
+                assert op.new_source is not None
+                with _lock:
+                    _set_source(target, op.new_source)
+        except Exception as exc:
+            ops.remove(op)
+            warnings.warn(
+                f"Could not re-apply change to '{module.__name__}.{op.qualname}'"
+                + f" after reload: {exc}",
+                stacklevel=2,
+            )
+
+
+class _ReloadFinder:
+    """
+    Detect reloads of modules with patched functions. importlib.reload() is
+    the only caller that passes an existing module as `target`, so normal
+    imports pass straight through. For reloads, the spec from the remaining
+    finders has its loader's exec_module() wrapped for one call to re-apply
+    changes after the module body has run.
+
+    The import system only needs find_spec(), so this doesn't subclass
+    importlib.abc.MetaPathFinder, which is slow to import.
+    """
+
+    def find_spec(
+        self,
+        fullname: str,
+        path: Sequence[str] | None,
+        target: ModuleType | None = None,
+    ) -> ModuleSpec | None:
+        if target is None or not _module_ops.get(fullname):
+            return None
+
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec: ModuleSpec | None = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+
+        loader = spec.loader
+        if (
+            loader is None
+            or isinstance(loader, type)
+            or "exec_module" in getattr(loader, "__dict__", {"exec_module": None})
+        ):
+            return spec
+
+        def exec_module(module: ModuleType) -> None:
+            del loader.exec_module
+            loader.exec_module(module)
+            _repatch(module)
+
+        loader.exec_module = exec_module  # type: ignore [method-assign]
+        return spec
+
+
+_finder = _ReloadFinder()
@@ -0,0 +1,336 @@
+from __future__ import annotations
+
+import ast
+import copy
+import importlib
+import re
+import sys
+from collections.abc import Iterator
+from types import FunctionType
+from typing import Any, NamedTuple
+
+from .api import (
+    _class_function,
+    _do_patch,
+    _get_source,
+    _labelled_patch,
+    _lock,
+    _patch_to,
+)
+from .static import (
+    FunctionNode,
+    edited_source,
+    iter_functions,
+    iter_module_files,
+    node_span,
+    splice,
+)
+
+__all__ = ("FunctionIndex", "semantic_patch", "semantic_unpatch")
+
+
+class FunctionIndex:
+    def __init__(self, package: str) -> None:
+        self.package = package
+        self._functions: list[_IndexedFunction] = []
+        # Name used in a function -> indexes into _functions
+        self._by_name: dict[str, set[int]] = {}
+        for module, filename in iter_module_files(package, sys.path):
+            with open(filename, encoding="utf-8") as fp:
+                tree = ast.parse(fp.read(), filename)
+            for qualname, node in iter_functions(tree):
+                position = len(self._functions)
+                self._functions.append(_IndexedFunction(module, qualname, node))
+                for name in _names(node):
+                    self._by_name.setdefault(name, set()).add(position)
+
+    def __len__(self) -> int:
+        return len(self._functions)
+
+    def find(self, pattern: str) -> list[str]:
+        return [
+            f"{function.module}.{function.qualname}"
+            for function in self._find(_parse_pattern(pattern))
+        ]
+
+    def _find(self, pattern_node: ast.expr) -> list[_IndexedFunction]:
+        return [
+            function
+            for function in self._candidates(pattern_node)
+            if any(_matches(pattern_node, node) for node in _walk_body(function.node))
+        ]
+
+    def _candidates(self, pattern_node: ast.expr) -> list[_IndexedFunction]:
+        """
+        Narrow down to the functions using every name in the pattern, other
+        than metavariables, which any match needs.
+        """
+        positions: set[int] | None = None
+        for name in _names(pattern_node):
+            if name.startswith(_META_PREFIX):
+                continue
+            found = self._by_name.get(name, set())
+            positions = found if positions is None else positions & found
+        if positions is None:
+            return list(self._functions)
+        return [self._functions[position] for position in sorted(positions)]
+
+
+def semantic_patch(
+    target: str | FunctionIndex,
+    pattern: str,
+    replacement: str,
+) -> list[str]:
+    index = target if isinstance(target, FunctionIndex) else FunctionIndex(target)
+    pattern_node = _parse_pattern(pattern)
+    replacement_node = _parse_pattern(replacement)
+    unbound = {
+        name for name in _names(replacement_node) if name.startswith(_META_PREFIX)
+    } - set(_names(pattern_node))
+    if unbound:
+        names = ", ".join(sorted("$" + name[len(_META_PREFIX) :] for name in unbound))
+        raise ValueError(f"Replacement uses metavariables not in pattern: {names}.")
+
+    changed = []
+    with _lock:
+        for function in index._find(pattern_node):
+            func = _resolve(function)
+            if func is None:
+                continue
+            source = _get_source(func)
+            tree = ast.parse(source).body[0]
+            assert isinstance(tree, (ast.FunctionDef, ast.AsyncFunctionDef))
+            rewriter = _Rewriter(pattern_node, replacement_node, replacement, source)
+            tree.body = [rewriter.visit(statement) for statement in tree.body]
+            if rewriter.count == 0:
+                continue
+            new_source = edited_source(tree, rewriter.candidates(tree))
+            _patch_to(func, new_source, _label(pattern, replacement))
+            changed.append(f"{function.module}.{function.qualname}")
+    return changed
+
+
+def semantic_unpatch(
+    target: str | FunctionIndex,
+    pattern: str,
+    replacement: str,
+) -> list[str]:
+    index = target if isinstance(target, FunctionIndex) else FunctionIndex(target)
+    label = _label(pattern, replacement)
+    changed = []
+    with _lock:
+        for function in index._find(_parse_pattern(pattern)):
+            func = _resolve(function)
+            if func is None:
+                continue
+            patch_text = _labelled_patch(func, label)
+            if patch_text is None:
+                continue
+            _do_patch(func, patch_text, forwards=False)
+            changed.append(f"{function.module}.{function.qualname}")
+    return changed
+
+
+# Gritty internals
+
+# Metavariables are written $name, and parsed as names with this prefix
+_META_PREFIX = "__patchy_meta_"
+_META_RE = re.compile(r"\$(\w+)")
+
+
+# Expressions that never need brackets around their source
+_ATOMIC_TYPES = (
+    ast.Attribute,
+    ast.Call,
+    ast.Constant,
+    ast.Dict,
+    ast.DictComp,
+    ast.JoinedStr,
+    ast.List,
+    ast.ListComp,
+    ast.Name,
+    ast.Set,
+    ast.SetComp,
+    ast.Subscript,
+)
+
+
+def _label(pattern: str, replacement: str) -> str:
+    return " ".join(f"semantic {pattern} -> {replacement}".split())
+
+
+class _IndexedFunction(NamedTuple):
+    module: str
+    qualname: str
+    node: FunctionNode
+
+
+def _names(node: ast.AST) -> Iterator[str]:
+    for child in ast.walk(node):
+        if isinstance(child, ast.Name):
+            yield child.id
+        elif isinstance(child, ast.Attribute):
+            yield child.attr
+
+
+def _parse_pattern(source: str) -> ast.expr:
+    try:
+        return ast.parse(_META_RE.sub(_META_PREFIX + r"\1", source), mode="eval").body
+    except SyntaxError as exc:
+        raise ValueError(f"Invalid pattern {source!r}: {exc}") from None
+
+
+def _walk_body(node: FunctionNode) -> Iterator[ast.AST]:
+    for statement in node.body:
+        yield from ast.walk(statement)
+
+
+def _matches(
+    pattern: Any,
+    node: Any,
+    bindings: dict[str, ast.expr] | None = None,
+) -> bool:
+    """
+    Structurally compare a pattern with a node, ignoring positions. Each
+    metavariable matches any expression, but must match the same one
+    wherever it appears. Bindings are recorded in `bindings`.
+    """
+    if bindings is None:
+        bindings = {}
+    if isinstance(pattern, ast.Name) and pattern.id.startswith(_META_PREFIX):
+        if not isinstance(node, ast.expr):
+            return False
+        bound = bindings.setdefault(pattern.id, node)
+        return bound is node or ast.dump(bound) == ast.dump(node)
+    if type(pattern) is not type(node):
+        return False
+    if isinstance(pattern, list):
+        return len(pattern) == len(node) and all(
+            _matches(p, n, bindings) for p, n in zip(pattern, node)
+        )
+    if isinstance(pattern, ast.AST):
+        return all(
+            _matches(
+                getattr(pattern, field, None), getattr(node, field, None), bindings
+            )
+            for field in pattern._fields
+        )
+    return bool(pattern == node)
+
+
+class _Rewriter(ast.NodeTransformer):
+    """
+    Replace every expression matching a pattern, innermost first, so
+    matches nested inside others are rewritten too. Also tracks the text of
+    each replacement, made from the replacement's source and the source of
+    the expressions its metavariables stand for, to splice into the
+    function's source.
+    """
+
+    def __init__(
+        self,
+        pattern: ast.expr,
+        replacement: ast.expr,
+        replacement_source: str,
+        source: str,
+    ) -> None:
+        self.pattern = pattern
+        self.replacement = replacement
+        self.replacement_source = replacement_source.strip()
+        self.source = source
+        self.lines = source.splitlines(keepends=True)
+        # id() of each replacement node -> the node, the span of the node it
+        # replaced, and its text
+        self.replaced: dict[int, tuple[ast.expr, int, int, str]] = {}
+        self.count = 0
+
+    def visit(self, node: ast.AST) -> Any:
+        node = self.generic_visit(node)
+        bindings: dict[str, ast.expr] = {}
+        if isinstance(node, ast.expr) and _matches(self.pattern, node, bindings):
+            self.count += 1
+            new = _Substituter(bindings).visit(copy.deepcopy(self.replacement))
+            text = _META_RE.sub(
+                lambda match: self.text(bindings[_META_PREFIX + match[1]], True),
+                self.replacement_source,
+            )
+            start, end = node_span(self.lines, node)
+            self.replaced[id(new)] = (new, start, end, text)
+            return new
+        return node
+
+    def candidates(self, tree: ast.AST) -> list[str]:
+        """
+        Make the function's source with the replacements spliced in, as is,
+        and with brackets, in case precedence needs them.
+        """
+        return [
+            splice(self.source, self.edits(tree, brackets))
+            for brackets in (False, True)
+        ]
+
+    def edits(self, node: ast.AST, brackets: bool) -> Iterator[tuple[int, int, str]]:
+        """
+        Find the outermost replacements within a node, as splice edits.
+        """
+        for child in ast.iter_child_nodes(node):
+            if id(child) in self.replaced:
+                new, start, end, text = self.replaced[id(child)]
+                yield start, end, _bracket(new, text) if brackets else text
+            else:
+                yield from self.edits(child, brackets)
+
+    def text(self, node: ast.expr, brackets: bool) -> str:
+        """
+        Get the source for an expression in the rewritten tree. Nodes
+        copied into earlier replacements keep the positions they were
+        copied from, so may get the wrong source, which the check of the
+        spliced source against the tree catches.
+        """
+        if id(node) in self.replaced:
+            text = self.replaced[id(node)][3]
+        else:
+            start, end = node_span(self.lines, node)
+            edits = [
+                (edit_start - start, edit_end - start, edit_text)
+                for edit_start, edit_end, edit_text in self.edits(node, True)
+            ]
+            text = splice(self.source[start:end], edits)
+        return _bracket(node, text) if brackets else text
+
+
+def _bracket(node: ast.expr, text: str) -> str:
+    return text if isinstance(node, _ATOMIC_TYPES) else f"({text})"
+
+
+class _Substituter(ast.NodeTransformer):
+    def __init__(self, bindings: dict[str, ast.expr]) -> None:
+        self.bindings = bindings
+
+    def visit_Name(self, node: ast.Name) -> ast.expr:
+        try:
+            return copy.deepcopy(self.bindings[node.id])
+        except KeyError:
+            return node
+
+
+def _resolve(function: _IndexedFunction) -> FunctionType | None:
+    """
+    Import the live function for an indexed one, or return None if it isn't
+    a plain function, e.g. because a decorator replaced it.
+    """
+    target: Any = importlib.import_module(function.module)
+    *class_names, name = function.qualname.split(".")
+    func: Any
+    try:
+        for class_name in class_names:
+            target = getattr(target, class_name)
+        if class_names:
+            func = _class_function(target, name)
+        else:
+            func = getattr(target, name)
+    except (AttributeError, KeyError, ValueError):
+        return None
+    if not isinstance(func, FunctionType) or func.__code__.co_name != name:
+        return None
+    return func
@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import ast
+import os
+from collections.abc import Iterable, Iterator, Sequence
+from textwrap import dedent
+
+FunctionNode = ast.FunctionDef | ast.AsyncFunctionDef
+
+
+def find_module_file(module: str, path: Sequence[str]) -> str | None:
+    """
+    Locate the source file for a dotted module name on the given search path,
+    without importing anything.
+    """
+    parts = module.split(".")
+    for entry in path:
+        base = os.path.join(entry or os.curdir, *parts)
+        for candidate in (base + ".py", os.path.join(base, "__init__.py")):
+            if os.path.isfile(candidate):
+                return candidate
+    return None
+
+
+def iter_module_files(package: str, path: Sequence[str]) -> Iterator[tuple[str, str]]:
+    """
+    Yield (module name, filename) pairs for a module, or every module in a
+    package, found on the given search path without importing anything.
+    """
+    filename = find_module_file(package, path)
+    if filename is None:
+        raise LookupError(f"Could not find a module for '{package}'.")
+    yield package, filename
+    if os.path.basename(filename) != "__init__.py":
+        return
+    root = os.path.dirname(filename)
+    for dirpath, dirnames, filenames in os.walk(root):
+        # Only descend into subpackages
+        dirnames[:] = sorted(
+            name
+            for name in dirnames
+            if os.path.isfile(os.path.join(dirpath, name, "__init__.py"))
+        )
+        parts = [package]
+        if dirpath != root:
+            parts += os.path.relpath(dirpath, root).split(os.sep)
+        for name in sorted(filenames):
+            if not name.endswith(".py"):
+                continue
+            if name == "__init__.py":
+                if dirpath == root:
+                    continue
+                module_parts = parts
+            else:
+                module_parts = parts + [name[:-3]]
+            yield ".".join(module_parts), os.path.join(dirpath, name)
+
+
+def iter_definitions(
+    tree: ast.Module,
+) -> Iterator[tuple[str, FunctionNode | ast.ClassDef]]:
+    """
+    Yield (qualname, node) pairs for every class, function, and method in a
+    module, skipping those defined inside functions, as they can't be
+    referred to by dotted path.
+    """
+
+    def walk(
+        body: list[ast.stmt], prefix: str
+    ) -> Iterator[tuple[str, FunctionNode | ast.ClassDef]]:
+        for node in body:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                yield prefix + node.name, node
+            elif isinstance(node, ast.ClassDef):
+                yield prefix + node.name, node
+                yield from walk(node.body, f"{prefix}{node.name}.")
+
+    yield from walk(tree.body, "")
+
+
+def iter_functions(
+    tree: ast.Module,
+) -> Iterator[tuple[str, FunctionNode]]:
+    """
+    Yield (qualname, node) pairs for every function and method in a module,
+    as for iter_definitions().
+    """
+    for qualname, node in iter_definitions(tree):
+        if not isinstance(node, ast.ClassDef):
+            yield qualname, node
+
+
+def node_source(lines: Sequence[str], node: FunctionNode | ast.ClassDef) -> str:
+    """
+    Extract the source of a definition from its file's lines, matching the
+    block that inspect.getsource() would return, decorators included.
+    """
+    start = node.decorator_list[0].lineno if node.decorator_list else node.lineno
+    end = node.end_lineno
+    assert end is not None
+    return dedent("".join(lines[start - 1 : end]))
+
+
+def node_span(lines: Sequence[str], node: ast.expr) -> tuple[int, int]:
+    """
+    Find the start and end indexes of an expression in the source joined
+    from `lines`. AST columns count UTF-8 bytes, so are converted.
+    """
+
+    def index(lineno: int, col_offset: int) -> int:
+        column = len(lines[lineno - 1].encode()[:col_offset].decode())
+        return sum(len(line) for line in lines[: lineno - 1]) + column
+
+    assert node.end_lineno is not None and node.end_col_offset is not None
+    return (
+        index(node.lineno, node.col_offset),
+        index(node.end_lineno, node.end_col_offset),
+    )
+
+
+def statement_span(lines: Sequence[str], node: ast.stmt) -> tuple[int, int, str] | None:
+    """
+    Find the start and end indexes of the whole lines of a statement, with
+    any decorators, in the source joined from `lines`, and its indentation.
+    Return None if it shares its first or last line with other code.
+    """
+    decorators = getattr(node, "decorator_list", None)
+    first = decorators[0].lineno if decorators else node.lineno
+    line = lines[first - 1]
+    indent = line[: len(line) - len(line.lstrip())]
+    if decorators:
+        shared = not line.lstrip().startswith("@")
+    else:
+        shared = node.col_offset != len(indent.encode())
+    assert node.end_lineno is not None and node.end_col_offset is not None
+    rest = lines[node.end_lineno - 1].encode()[node.end_col_offset :].decode()
+    rest = rest.strip()
+    if shared or (rest and not rest.startswith("#")):
+        return None
+    return (
+        sum(len(line) for line in lines[: first - 1]),
+        sum(len(line) for line in lines[: node.end_lineno]),
+        indent,
+    )
+
+
+def indent_source(source: str, indent: str) -> str:
+    """
+    Dedent statements' source, then indent it by `indent`, ending in a
+    newline.
+    """
+    lines = dedent(source).strip("\n").splitlines()
+    return "".join(f"{indent}{line}\n" if line.strip() else "\n" for line in lines)
+
+
+def splice(source: str, edits: Iterable[tuple[int, int, str]]) -> str:
+    """
+    Replace non-overlapping spans of source, given as (start, end, text).
+    """
+    for start, end, text in sorted(edits, reverse=True):
+        source = source[:start] + text + source[end:]
+    return source
+
+
+def edited_source(tree: ast.stmt, candidates: Iterable[str]) -> str:
+    """
+    Pick the source for an edited definition: the first of `candidates`,
+    made by editing its text so they keep comments and formatting, that
+    parses to the same tree, or else source generated from the tree.
+    """
+    expected = ast.dump(tree)
+    for candidate in candidates:
+        try:
+            body = ast.parse(candidate).body
+        except SyntaxError:
+            continue
+        if len(body) == 1 and ast.dump(body[0]) == expected:
+            return candidate
+    return ast.unparse(ast.fix_missing_locations(tree)) + "\n"
+
+
+def get_static_source(target: str, path: Sequence[str]) -> str:
+    """
+    Fetch the dedented source of the function at dotted path `target` by
+    parsing module files on `path`, rather than importing them.
+    """
+    parts = target.split(".")
+    for split in range(len(parts) - 1, 0, -1):
+        filename = find_module_file(".".join(parts[:split]), path)
+        if filename is not None:
+            break
+    else:
+        raise LookupError(f"Could not find a module for '{target}'.")
+
+    with open(filename, encoding="utf-8") as fp:
+        text = fp.read()
+    qualname = ".".join(parts[split:])
+    for name, node in iter_functions(ast.parse(text, filename)):
+        if name == qualname:
+            return node_source(text.splitlines(keepends=True), node)
+    raise LookupError(f"Could not find '{qualname}' in '{filename}'.")
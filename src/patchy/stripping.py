@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import ast
+from collections.abc import Callable, Sequence
+from fnmatch import fnmatchcase
+from pkgutil import resolve_name as pkgutil_resolve_name
+from typing import Any, cast
+
+from .api import _do_patch, _get_source, _labelled_patch, _lock, _patch_to
+from .static import edited_source, splice, statement_span
+
+__all__ = ("strip_calls", "restore_calls")
+
+
+def strip_calls(func: Callable[..., Any] | str, matcher: str) -> int:
+    if isinstance(func, str):
+        func = cast(Callable[..., Any], pkgutil_resolve_name(func))
+    name = func.__name__
+    with _lock:
+        if _labelled_patch(func, f"strip {matcher}") is not None:
+            raise ValueError(
+                f"Calls to '{matcher}' are already stripped from '{name}'."
+            )
+
+        source = _get_source(func)
+        tree = ast.parse(source).body[0]
+        count, edits = _strip(tree, matcher, source.splitlines(keepends=True))
+        if count == 0:
+            raise ValueError(f"'{name}' has no calls to '{matcher}'.")
+
+        candidates = [] if edits is None else [splice(source, edits)]
+        _patch_to(func, edited_source(tree, candidates), f"strip {matcher}")
+    return count
+
+
+def restore_calls(func: Callable[..., Any] | str, matcher: str) -> None:
+    if isinstance(func, str):
+        func = cast(Callable[..., Any], pkgutil_resolve_name(func))
+    with _lock:
+        patch_text = _labelled_patch(func, f"strip {matcher}")
+        if patch_text is None:
+            raise ValueError(
+                f"Calls to '{matcher}' aren't stripped from '{func.__name__}'."
+            )
+        _do_patch(func, patch_text, forwards=False)
+
+
+# Gritty internals
+
+_BLOCK_FIELDS = ("body", "orelse", "finalbody")
+
+
+def _strip(
+    tree: ast.AST, matcher: str, lines: Sequence[str]
+) -> tuple[int, list[tuple[int, int, str]] | None]:
+    """
+    Remove the statements in a function's tree, including in nested blocks
+    and functions, that are just a call to a target matching matcher.
+    Blocks left empty get a `pass`. Returns the number removed, and edits
+    that remove their lines from the source joined from `lines`, or None if
+    any shares a line with other code.
+    """
+    count = 0
+    edits: list[tuple[int, int, str]] | None = []
+    for node in ast.walk(tree):
+        for field in _BLOCK_FIELDS:
+            statements = getattr(node, field, None)
+            if not isinstance(statements, list):
+                continue
+            kept = []
+            removed = []
+            for statement in statements:
+                if _is_matching_call(statement, matcher):
+                    removed.append(statement)
+                else:
+                    kept.append(statement)
+            if not removed:
+                continue
+            count += len(removed)
+            setattr(node, field, kept or [ast.Pass()])
+            for position, statement in enumerate(removed):
+                span = statement_span(lines, statement)
+                if span is None or edits is None:
+                    edits = None
+                    continue
+                start, end, indent = span
+                text = f"{indent}pass\n" if not kept and position == 0 else ""
+                edits.append((start, end, text))
+    return count, edits
+
+
+def _is_matching_call(statement: ast.stmt, matcher: str) -> bool:
+    return (
+        isinstance(statement, ast.Expr)
+        and isinstance(statement.value, ast.Call)
+        and fnmatchcase(ast.unparse(statement.value.func), matcher)
+    )
@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import importlib
+import marshal
+import warnings
+from collections.abc import Callable
+from importlib.util import MAGIC_NUMBER
+from types import CodeType
+from typing import Any
+
+from .api import (
+    _cache_lines,
+    _Entry,
+    _get_member,
+    _get_real_func,
+    _lock,
+    _pack,
+    _Record,
+    _registry,
+    _source_map,
+    _swap_code,
+    _unpack,
+)
+from .reloading import track as _track
+
+__all__ = ("export_patches", "install_patches")
+
+
+def export_patches() -> bytes:
+    functions = []
+    classes = []
+    with _lock:
+        for real_func, record in list(_registry.items()):
+            if not _importable(real_func):
+                continue
+            history = []
+            for entry in record.history:
+                if _marshallable(entry.code):
+                    history.append(
+                        (entry.patch_text, entry.code, _unpack(entry.source))
+                    )
+                else:
+                    warnings.warn(
+                        "Could not export the globals bound in"
+                        + f" '{real_func.__module__}.{real_func.__qualname__}',"
+                        + " as they can't be marshalled. Call bind_globals()"
+                        + " again after installing.",
+                        stacklevel=2,
+                    )
+            if not history:
+                continue
+            functions.append(
+                (
+                    real_func.__module__,
+                    real_func.__qualname__,
+                    record.original_code,
+                    history,
+                )
+            )
+        for obj, stored in list(_source_map.items()):
+            if isinstance(obj, type) and _importable(obj):
+                classes.append((obj.__module__, obj.__qualname__, _unpack(stored)))
+    return marshal.dumps((MAGIC_NUMBER, functions, classes))
+
+
+def install_patches(data: bytes) -> None:
+    magic, functions, classes = marshal.loads(data)
+    if magic != MAGIC_NUMBER:
+        raise ValueError(
+            "Patches were exported from a different version of Python, so"
+            + " can't be installed."
+        )
+
+    with _lock:
+        # Find and check everything first, so nothing is installed on failure
+        to_install = []
+        for module, qualname, original_code, history in functions:
+            real_func = _get_real_func(_resolve(module, qualname))
+            name = f"{module}.{qualname}"
+            if _needs_install(real_func, name, original_code, history):
+                to_install.append((real_func, history))
+        class_sources = [
+            (_resolve(module, qualname), source) for module, qualname, source in classes
+        ]
+
+        for real_func, history in to_install:
+            _install_history(real_func, history)
+        for cls, source in class_sources:
+            _source_map[cls] = _pack(source)
+
+
+# Gritty internals
+
+
+def _importable(obj: Any) -> bool:
+    """
+    Whether an object can be found again from its module and qualified name,
+    which rules out those defined inside functions.
+    """
+    return "<locals>" not in obj.__qualname__
+
+
+def _marshallable(code: CodeType) -> bool:
+    """
+    Whether a code object can be exported, which those with objects bound by
+    bind_globals() as constants can't be.
+    """
+    try:
+        marshal.dumps(code)
+    except ValueError:
+        return False
+    return True
+
+
+def _resolve(module: str, qualname: str) -> Any:
+    target: Any = importlib.import_module(module)
+    for name in qualname.split("."):
+        target = _get_member(target, name)
+    return target
+
+
+def _needs_install(
+    real_func: Callable[..., Any],
+    name: str,
+    original_code: CodeType,
+    history: list[tuple[str | None, CodeType, str]],
+) -> bool:
+    """
+    Check whether the exported history of changes to a function should be
+    installed. Functions that already have the final code are left alone, so
+    installing the same patches twice is harmless.
+    """
+    if real_func.__code__ == history[-1][1]:
+        return False
+    if real_func.__code__ != original_code:
+        raise ValueError(
+            f"The code of '{name}' differs from when the patches were exported,"
+            + " so they can't be installed."
+        )
+    return True
+
+
+def _install_history(
+    real_func: Callable[..., Any],
+    history: list[tuple[str | None, CodeType, str]],
+) -> None:
+    """
+    Put the exported history of changes to a function in place, without
+    compiling anything.
+    """
+    final_code = history[-1][1]
+    record = _registry[real_func] = _Record(real_func.__code__)
+    for patch_text, code, source in history:
+        record.history.append(_Entry(patch_text, code, _pack(source)))
+        if patch_text is not None:
+            _track(real_func, patch_text)
+        else:
+            _track(real_func, None, new_source=source)
+    _swap_code(real_func, final_code)
+    _cache_lines(final_code, history[-1][2])
+    _source_map[real_func] = record.history[-1].source
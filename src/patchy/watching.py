@@ -0,0 +1,232 @@
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import warnings
+from collections.abc import Iterable
+from types import TracebackType
+
+from .api import _do_patch
+from .check import _read, iter_patch_files
+
+__all__ = ("PatchWatcher",)
+
+
+class PatchWatcher:
+    def __init__(
+        self,
+        patch_paths: Iterable[str],
+        *,
+        interval: float = 1.0,
+        use_inotify: bool = True,
+    ) -> None:
+        self.patch_paths = list(patch_paths)
+        self.interval = interval
+        self.use_inotify = use_inotify
+        self.backend: str | None = None
+        # Patch filename -> (target, patch text) currently applied
+        self._applied: dict[str, tuple[str, str]] = {}
+        # Patch filename -> (mtime, size) when last read
+        self._stats: dict[str, tuple[int, int]] = {}
+        self._scan_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._fd: int | None = None
+
+    def scan(self) -> list[str]:
+        with self._scan_lock:
+            return self._scan()
+
+    def start(self) -> None:
+        if self._thread is not None:
+            raise RuntimeError("PatchWatcher is already started.")
+        self.scan()
+        self._fd = _inotify_fd(self._directories()) if self.use_inotify else None
+        self.backend = "polling" if self._fd is None else "inotify"
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="patchy-watcher", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        self.backend = None
+
+    def __enter__(self) -> PatchWatcher:
+        self.start()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        self.stop()
+
+    def _directories(self) -> list[str]:
+        return sorted(
+            {
+                path if os.path.isdir(path) else os.path.dirname(path) or "."
+                for path in self.patch_paths
+            }
+        )
+
+    def _run(self) -> None:
+        import select
+
+        while not self._stop.is_set():
+            if self._fd is not None:
+                ready, _, _ = select.select([self._fd], [], [], self.interval)
+                if not ready:
+                    continue
+                _drain(self._fd)
+            elif self._stop.wait(self.interval):
+                break
+            # Keep watching, so a later fix is picked up
+            try:
+                self.scan()
+            except Exception as exc:
+                warnings.warn(f"Could not scan patch files: {exc}", stacklevel=1)
+
+    def _scan(self) -> list[str]:
+        """
+        Re-apply patch files that have changed since the last scan, and
+        unpatch those that have been deleted. Each changed patch is unpatched
+        from its target before the new version is applied, which restores the
+        stored code object when it was the target's last change. Errors with
+        one file are emitted as warnings, so the others are still handled.
+        Returns the targets that were changed.
+        """
+        files = iter_patch_files(
+            path for path in self.patch_paths if os.path.exists(path)
+        )
+        changed = []
+        for target, filename in files:
+            try:
+                if self._scan_file(target, filename):
+                    changed.append(target)
+            except Exception as exc:
+                warnings.warn(f"Could not apply '{filename}': {exc}", stacklevel=3)
+
+        current = {filename for _, filename in files}
+        for filename in sorted(set(self._applied) - current):
+            previous = self._applied[filename]
+            self._stats.pop(filename, None)
+            if self._reapply(filename, previous, None):
+                changed.append(previous[0])
+        return changed
+
+    def _scan_file(self, target: str, filename: str) -> bool:
+        """
+        Re-apply one patch file if it has changed since the last scan.
+        Returns whether its target was changed.
+        """
+        try:
+            stat = os.stat(filename)
+        except FileNotFoundError:  # pragma: no cover
+            return False
+        key = (stat.st_mtime_ns, stat.st_size)
+        if self._stats.get(filename) == key:
+            return False
+        self._stats[filename] = key
+        patch_text = _read(filename)
+        previous = self._applied.get(filename)
+        if previous == (target, patch_text):
+            return False
+        return self._reapply(filename, previous, (target, patch_text))
+
+    def _reapply(
+        self,
+        filename: str,
+        previous: tuple[str, str] | None,
+        new: tuple[str, str] | None,
+    ) -> bool:
+        """
+        Swap the previous version of a patch file for a new one, either of
+        which may be None. If the new version doesn't apply, the previous one
+        is restored and a warning is emitted. Returns whether anything changed.
+        """
+        if previous is not None:
+            try:
+                _do_patch(previous[0], previous[1], forwards=False)
+            except Exception as exc:
+                warnings.warn(
+                    f"Could not unapply old version of '{filename}': {exc}",
+                    stacklevel=3,
+                )
+                return False
+            del self._applied[filename]
+        if new is None:
+            return True
+        try:
+            _do_patch(new[0], new[1], forwards=True)
+        except Exception as exc:
+            warnings.warn(f"Could not apply '{filename}': {exc}", stacklevel=3)
+            if previous is not None:
+                _do_patch(previous[0], previous[1], forwards=True)
+                self._applied[filename] = previous
+            return False
+        self._applied[filename] = new
+        return True
+
+
+# inotify implementation, for Linux
+
+_IN_CLOEXEC = 0o2000000
+_IN_NONBLOCK = 0o4000
+_IN_MASK = (
+    0x00000008  # IN_CLOSE_WRITE
+    | 0x00000040  # IN_MOVED_FROM
+    | 0x00000080  # IN_MOVED_TO
+    | 0x00000100  # IN_CREATE
+    | 0x00000200  # IN_DELETE
+)
+
+
+def _inotify_fd(directories: list[str]) -> int | None:
+    """
+    Open an inotify instance watching the given directories, or return None
+    if inotify isn't available.
+    """
+    if not sys.platform.startswith("linux"):  # pragma: no cover
+        return None
+    # Deferred, as ctypes is slow to import
+    import ctypes
+
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        inotify_init1 = libc.inotify_init1
+        inotify_add_watch = libc.inotify_add_watch
+    except (OSError, AttributeError):  # pragma: no cover
+        return None
+
+    fd: int = inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+    if fd < 0:  # pragma: no cover
+        return None
+    for directory in directories:
+        if inotify_add_watch(fd, os.fsencode(directory), _IN_MASK) < 0:
+            os.close(fd)
+            return None
+    return fd
+
+
+def _drain(fd: int) -> None:
+    """
+    Discard pending inotify events. Their details don't matter, since scans
+    check every patch file.
+    """
+    try:
+        while os.read(fd, 4096):
+            pass
+    except BlockingIOError:
+        pass
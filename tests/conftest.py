@@ -1,10 +1,61 @@
 from __future__ import annotations
 
+import importlib
+import subprocess
+import sys
+from textwrap import dedent
+from types import ModuleType
+from typing import Any
+
 import pytest
 
 import patchy.api
+from patchy import reloading
 
 
 @pytest.fixture(autouse=True)
 def clear_cache():
     patchy.api._patching_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def unpatch_all():
+    yield
+    patchy.unpatch_all()
+
+
+@pytest.fixture
+def runs(monkeypatch):
+    calls: list[Any] = []
+    original = subprocess.run
+
+    def run(*args: Any, **kwargs: Any) -> Any:
+        calls.append(args)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(subprocess, "run", run)
+    return calls
+
+
+@pytest.fixture
+def make_module(tmp_path):
+    """
+    Write and import modules from a temporary directory, removing them, and
+    any changes tracked for reloading them, afterwards.
+    """
+    names: list[str] = []
+
+    def make_module(name: str, source: str) -> ModuleType:
+        (tmp_path / f"{name}.py").write_text(dedent(source))
+        names.append(name)
+        importlib.invalidate_caches()
+        return importlib.import_module(name)
+
+    sys.path.insert(0, str(tmp_path))
+    try:
+        yield make_module
+    finally:
+        sys.path.remove(str(tmp_path))
+        for name in names:
+            sys.modules.pop(name, None)
+            reloading._module_ops.pop(name, None)
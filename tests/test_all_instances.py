@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+from collections.abc import Callable
+from typing import Any
+
+import patchy
+
+PATCH_TEXT = """\
+    @@ -1,2 +1,2 @@
+     def sample() -> int:
+    -    return value
+    +    return value * 10
+    """
+
+
+def make_sample(value: int) -> Callable[[], int]:
+    def sample() -> int:
+        return value
+
+    return sample
+
+
+def test_patch_all_instances():
+    first = make_sample(1)
+    second = make_sample(2)
+    assert first() == 1
+    assert second() == 2
+
+    patchy.patch(first, PATCH_TEXT, all_instances=True)
+
+    assert first() == 10
+    assert second() == 20
+    assert second.__code__ is first.__code__
+    assert set(patchy.patched()) == {first, second}
+
+
+def test_patch_one_instance():
+    first = make_sample(1)
+    second = make_sample(2)
+    assert first() == 1
+    original_code = second.__code__
+
+    patchy.patch(first, PATCH_TEXT)
+
+    assert first() == 10
+    assert second() == 2
+    assert second.__code__ is original_code
+
+
+def test_patch_all_instances_compiles_once(monkeypatch):
+    first = make_sample(1)
+    second = make_sample(2)
+    assert first() == 1
+    assert second() == 2
+    calls = []
+    original = patchy.api._compile_source
+
+    def compile_source(*args: Any, **kwargs: Any) -> Any:
+        calls.append(args)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(patchy.api, "_compile_source", compile_source)
+
+    patchy.patch(first, PATCH_TEXT, all_instances=True)
+
+    assert len(calls) == 1
+    assert second() == 20
+
+
+def test_patch_all_instances_twice():
+    first = make_sample(1)
+    second = make_sample(2)
+    assert first() == 1
+    assert second() == 2
+    patchy.patch(first, PATCH_TEXT, all_instances=True)
+
+    patchy.patch(
+        second,
+        """\
+        @@ -1,2 +1,2 @@
+         def sample() -> int:
+        -    return value * 10
+        +    return value * 100
+        """,
+        all_instances=True,
+    )
+
+    assert first() == 100
+    assert second() == 200
+
+
+def test_unpatch_all_instances():
+    first = make_sample(1)
+    second = make_sample(2)
+    assert first() == 1
+    original_code = first.__code__
+    patchy.patch(first, PATCH_TEXT, all_instances=True)
+
+    patchy.unpatch(second, PATCH_TEXT, all_instances=True)
+
+    assert first() == 1
+    assert second() == 2
+    assert first.__code__ is original_code
+    assert second.__code__ is original_code
+    assert patchy.patched() == []
+
+
+def test_unpatch_all_instances_reverse_diff():
+    first = make_sample(1)
+    second = make_sample(2)
+    assert first() == 1
+    assert second() == 2
+
+    patchy.unpatch(
+        first,
+        """\
+        @@ -1,2 +1,2 @@
+         def sample() -> int:
+        -    return 7
+        +    return value
+        """,
+        all_instances=True,
+    )
+
+    assert first() == 7
+    assert second() == 7
+    assert second.__code__ is first.__code__
+
+
+def test_unpatch_one_instance():
+    first = make_sample(1)
+    second = make_sample(2)
+    assert first() == 1
+    patchy.patch(first, PATCH_TEXT, all_instances=True)
+
+    patchy.unpatch(first, PATCH_TEXT)
+
+    assert first() == 1
+    assert second() == 20
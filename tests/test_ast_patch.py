@@ -0,0 +1,408 @@
+from __future__ import annotations
+
+import functools
+from textwrap import dedent
+
+import pytest
+
+import patchy
+from patchy import Delete, Insert, Replace
+
+
+def test_replace_statement():
+    def sample(x: int) -> int:
+        y = x + 1
+        return y
+
+    assert sample(1) == 2
+
+    patchy.ast_patch(sample, [Replace("body[0]", "y = x + 2")])
+
+    assert sample(1) == 3
+
+
+def test_replace_statement_with_many():
+    def sample(x: int) -> int:
+        return x
+
+    assert sample(1) == 1
+
+    patchy.ast_patch(sample, [Replace("body[-1]", "x += 1\nreturn x")])
+
+    assert sample(1) == 2
+
+
+def test_replace_expression():
+    def sample(x: int) -> int:
+        return x + 1
+
+    assert sample(1) == 2
+
+    patchy.ast_patch(sample, [Replace("body[-1].value.right", "10")])
+
+    assert sample(1) == 11
+
+
+def test_replace_call():
+    def sample(x: int) -> int:
+        if x:
+            x = -1
+        return abs(abs(x) + 1)
+
+    assert sample(0) == 1
+    assert sample(1) == 2
+
+    patchy.ast_patch(sample, [Replace("body[-1].call(abs)", "max(abs(x) + 1, 5)")])
+
+    assert sample(1) == 5
+
+
+def test_replace_nested_call():
+    def sample(x: int) -> int:
+        return abs(abs(x) + 1)
+
+    assert sample(-3) == 4
+
+    patchy.ast_patch(sample, [Replace("body[0].value.args.call(abs)", "x")])
+
+    assert sample(-3) == 2
+
+
+def test_replace_call_at_path():
+    def sample(x: int) -> int:
+        return abs(x)
+
+    assert sample(-1) == 1
+
+    patchy.ast_patch(sample, [Replace("body[0].value.call(abs)", "x")])
+
+    assert sample(-1) == -1
+
+
+def test_replace_call_in_list():
+    def sample(x: int) -> list[int]:
+        return [abs(x), abs(x - 1)]
+
+    assert sample(-1) == [1, 2]
+
+    patchy.ast_patch(sample, [Replace("body[0].value.elts.call(abs)", "x")])
+
+    assert sample(-1) == [-1, 2]
+
+
+def test_replace_expected():
+    def sample(x: int) -> int:
+        y = x + 1
+        return y
+
+    assert sample(1) == 2
+
+    patchy.ast_patch(
+        sample,
+        [Replace("body[0]", "y = x + 2", expected="y   =   (x + 1)  # reformatted")],
+    )
+
+    assert sample(1) == 3
+
+
+def test_replace_expected_expression():
+    def sample(x: int) -> int:
+        return x + 1
+
+    assert sample(1) == 2
+
+    patchy.ast_patch(sample, [Replace("body[0].value", "x + 2", expected="x+1")])
+
+    assert sample(1) == 3
+
+
+def test_replace_expected_mismatch():
+    def sample(x: int) -> int:
+        y = x + 1
+        return y
+
+    with pytest.raises(ValueError) as excinfo:
+        patchy.ast_patch(sample, [Replace("body[0]", "y = 3", expected="y = x + 2")])
+
+    assert str(excinfo.value) == (
+        "The code at AST path 'body[0]' of 'sample' has changed from expected.\n"
+        + "The current code is:\ny = x + 1\n"
+        + "The expected code is:\ny = x + 2"
+    )
+    assert sample(1) == 2
+
+
+def test_insert():
+    def sample(x: int) -> int:
+        return x
+
+    assert sample(2) == 2
+
+    patchy.ast_patch(sample, [Insert("body[0]", "x *= 3")])
+
+    assert sample(2) == 6
+
+
+def test_insert_append():
+    def sample(x: int) -> int:
+        if x:
+            x = 1
+        return x
+
+    assert sample(0) == 0
+    assert sample(5) == 1
+
+    patchy.ast_patch(sample, [Insert("body[0].body", "x += 1")])
+
+    assert sample(5) == 2
+
+
+def test_insert_not_statement():
+    def sample(x: int) -> int:  # pragma: no cover
+        return x
+
+    with pytest.raises(ValueError) as excinfo:
+        patchy.ast_patch(sample, [Insert("body[0].value", "x = 1")])
+
+    assert "must point to a statement to insert before" in str(excinfo.value)
+
+
+def test_delete():
+    def sample(x: int) -> int:
+        x += 1
+        return x
+
+    assert sample(1) == 2
+
+    patchy.ast_patch(sample, [Delete("body[0]", expected="x += 1")])
+
+    assert sample(1) == 1
+
+
+def test_delete_last_statement_in_block():
+    def sample(x: int) -> int:
+        if x:
+            x += 1
+        return x
+
+    assert sample(0) == 0
+    assert sample(1) == 2
+
+    patchy.ast_patch(sample, [Delete("body[0].body[0]")])
+
+    assert sample(1) == 1
+
+
+def test_delete_not_statement():
+    def sample(x: int) -> int:  # pragma: no cover
+        return x
+
+    with pytest.raises(ValueError) as excinfo:
+        patchy.ast_patch(sample, [Delete("body[0].value")])
+
+    assert str(excinfo.value) == (
+        "AST path 'body[0].value' for 'sample' must point to a statement to delete."
+    )
+
+
+def test_replace_list():
+    def sample(x: int) -> int:  # pragma: no cover
+        return x
+
+    with pytest.raises(ValueError) as excinfo:
+        patchy.ast_patch(sample, [Replace("body", "pass")])
+
+    assert str(excinfo.value) == (
+        "AST path 'body' for 'sample' must point to a node, not a list."
+    )
+
+
+@pytest.mark.parametrize(
+    "path,message",
+    [
+        ("", "Invalid AST path '' for 'sample'."),
+        ("body[x]", "Invalid AST path 'body[x]' for 'sample'."),
+        ("nope", "AST path 'nope' for 'sample' has no field 'nope'."),
+        ("body[5]", "AST path 'body[5]' for 'sample' has no 'body[5]'."),
+        ("call(foo)", "AST path 'call(foo)' for 'sample' found no call to foo."),
+    ],
+)
+def test_invalid_path(path, message):
+    def sample(x: int) -> int:  # pragma: no cover
+        return x
+
+    with pytest.raises(ValueError) as excinfo:
+        patchy.ast_patch(sample, [Replace(path, "pass")])
+
+    assert str(excinfo.value) == message
+
+
+def test_formatting_change_tolerated():
+    def sample(x: int) -> int:
+        y = x + 1
+        return y
+
+    def sample_reformatted(x: int) -> int:
+        y = (
+            x
+            + 1
+        )  # fmt: skip
+        return y
+
+    assert sample(1) == 2
+    assert sample_reformatted(1) == 2
+
+    edits = [Replace("body[0].value", "x + 2", expected="x + 1")]
+    patchy.ast_patch(sample, edits)
+    patchy.ast_patch(sample_reformatted, edits)
+
+    assert sample(1) == 3
+    assert sample_reformatted(1) == 3
+
+
+def test_keeps_comments():
+    def sample(x: int) -> int:
+        # Add one
+        y = x + 1  # for the offset
+        return y
+
+    assert sample(1) == 2
+
+    patchy.ast_patch(
+        sample,
+        [Replace("body[0].value.right", "2"), Insert("body[-1]", "y += 1  # again")],
+    )
+
+    assert sample(1) == 4
+    assert patchy.api._get_source(sample) == dedent(
+        """\
+        def sample(x: int) -> int:
+            # Add one
+            y = x + 2  # for the offset
+            y += 1  # again
+            return y
+        """
+    )
+
+
+def test_blank_line_skips_patch_utility(runs):
+    def sample(x: int) -> int:
+        y = x + 1
+
+        return y
+
+    assert sample(1) == 2
+
+    patch_text = patchy.ast_patch(sample, [Replace("body[0].value.right", "2")])
+
+    assert sample(1) == 3
+    assert runs == []
+    assert "\n\n" in patch_text
+    assert patchy.api._registry[sample].history[-1].patch_text == patch_text
+
+
+def test_replace_expression_brackets():
+    def sample(x: int) -> int:
+        return x * 3
+
+    assert sample(1) == 3
+
+    patchy.ast_patch(sample, [Replace("body[0].value.left", "x + 1")])
+
+    assert sample(1) == 6
+    assert "return (x + 1) * 3\n" in patchy.api._get_source(sample)
+
+
+def test_shared_line_unparsed():
+    def sample(x: int) -> int:
+        # fmt: off
+        y = x + 1; return y  # noqa: E702
+        # fmt: on
+
+    assert sample(1) == 2
+
+    patchy.ast_patch(sample, [Replace("body[0]", "y = x + 2")])
+
+    assert sample(1) == 3
+    assert "#" not in patchy.api._get_source(sample)
+
+
+def test_insert_before_decorated():
+    def sample() -> int:
+        @functools.cache  # cached
+        def inner() -> int:
+            return 1
+
+        return inner()
+
+    assert sample() == 1
+
+    patchy.ast_patch(sample, [Insert("body[0]", "import functools")])
+
+    assert sample() == 1
+    assert patchy.api._get_source(sample).startswith(
+        dedent(
+            """\
+            def sample() -> int:
+                import functools
+                @functools.cache  # cached
+            """
+        )
+    )
+
+
+def test_insert_new_block_unparsed():
+    def sample(x: int) -> int:
+        if x:
+            x = 1  # one
+        return x
+
+    assert sample(0) == 0
+    assert sample(5) == 1
+
+    patchy.ast_patch(sample, [Insert("body[0].orelse", "x = 2")])
+
+    assert sample(0) == 2
+    assert "#" not in patchy.api._get_source(sample)
+
+
+def test_delete_block_unparsed():
+    def sample(x: int) -> int:
+        if x:
+            x = 1  # one
+        else:
+            x = 2
+        return x
+
+    assert sample(0) == 2
+    assert sample(5) == 1
+
+    patchy.ast_patch(sample, [Delete("body[0].orelse[0]")])
+
+    assert sample(0) == 0
+    assert "#" not in patchy.api._get_source(sample)
+
+
+def test_unpatch():
+    def sample(x: int) -> int:
+        return x + 1
+
+    assert sample(1) == 2
+
+    patch_text = patchy.ast_patch(sample, [Replace("body[0].value.right", "2")])
+
+    assert sample(1) == 3
+    patchy.unpatch(sample, patch_text)
+    assert sample(1) == 2
+
+
+def test_by_path():
+    assert target() == 1
+
+    patchy.ast_patch("tests.test_ast_patch.target", [Replace("body[0].value", "2")])
+
+    assert target() == 2
+
+
+def target() -> int:
+    return 1
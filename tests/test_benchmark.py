@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import linecache
+import threading
+
+import pytest
+
+import patchy
+from patchy.benchmark import Comparison, Timings
+
+PATCH_TEXT = """\
+    @@ -1,2 +1,2 @@
+     def sample(n: int) -> int:
+    -    return sum(range(n))
+    +    return n * (n - 1) // 2
+    """
+
+
+def test_compare():
+    def sample(n: int) -> int:
+        return sum(range(n))
+
+    original_code = sample.__code__
+    calls = []
+
+    def args_factory() -> tuple[int]:
+        calls.append(True)
+        return (10_000,)
+
+    result = patchy.compare(
+        sample, PATCH_TEXT, args_factory, number=5, repeat=4, warmup=2
+    )
+
+    assert sample.__code__ is original_code
+    assert sample not in patchy.api._registry
+    assert len(calls) == 2 * 2 + 5 * 4 * 2
+    assert result.speedup > 1
+    assert result.original.min <= result.original.median
+    assert result.patched.stdev >= 0
+
+
+def test_compare_restores_on_error():
+    def sample(n: int) -> int:
+        return sum(range(n))
+
+    original_code = sample.__code__
+
+    with pytest.raises(TypeError):
+        patchy.compare(sample, PATCH_TEXT, lambda: ("x",), number=1, repeat=1)
+
+    assert sample.__code__ is original_code
+
+
+def test_compare_releases_lock_while_timing():
+    def sample(n: int) -> int:
+        return sum(range(n))
+
+    acquired = []
+
+    def try_acquire() -> None:
+        acquired.append(patchy.api._lock.acquire(blocking=False))
+        patchy.api._lock.release()
+
+    def args_factory() -> tuple[int]:
+        thread = threading.Thread(target=try_acquire)
+        thread.start()
+        thread.join()
+        return (1,)
+
+    patchy.compare(sample, PATCH_TEXT, args_factory, number=1, repeat=1, warmup=0)
+
+    assert acquired == [True, True]
+
+
+def test_compare_changed_by_other_thread():
+    def sample(n: int) -> int:
+        return sum(range(n))
+
+    assert sample(3) == 3
+
+    def args_factory() -> tuple[int]:
+        thread = threading.Thread(
+            target=patchy.patch,
+            args=(
+                sample,
+                """\
+                @@ -1,2 +1,2 @@
+                 def sample(n: int) -> int:
+                -    return sum(range(n))
+                +    return -1
+                """,
+            ),
+        )
+        thread.start()
+        thread.join()
+        return (1,)
+
+    with pytest.raises(RuntimeError) as excinfo:
+        patchy.compare(sample, PATCH_TEXT, args_factory, number=1, repeat=1, warmup=1)
+
+    assert str(excinfo.value) == "'sample' was changed during the comparison."
+    assert sample(1) == -1
+
+
+def test_compare_patched():
+    def sample(n: int) -> int:
+        return sum(range(n))
+
+    sample(1)
+    patchy.patch(
+        sample,
+        """\
+        @@ -1,2 +1,2 @@
+         def sample(n: int) -> int:
+        -    return sum(range(n))
+        +    return sum(range(n + 1)) - n
+        """,
+    )
+    patched_code = sample.__code__
+
+    patchy.compare(
+        sample,
+        """\
+        @@ -1,2 +1,2 @@
+         def sample(n: int) -> int:
+        -    return sum(range(n + 1)) - n
+        +    return n * (n - 1) // 2
+        """,
+        lambda: (10,),
+        number=1,
+        repeat=2,
+        warmup=0,
+    )
+
+    assert sample.__code__ is patched_code
+    assert "return sum(range(n + 1)) - n" in "".join(
+        linecache.getlines(patched_code.co_filename)
+    )
+    assert (
+        sum(
+            "#patchy:" in filename and "test_compare_patched" in filename
+            for filename in linecache.cache
+        )
+        == 1
+    )
+    patchy.unpatch_all()
+
+
+def test_compare_by_path():
+    result = patchy.compare(
+        "tests.test_benchmark.target",
+        """\
+        @@ -2,1 +2,1 @@
+        -    return 1
+        +    return 2
+        """,
+        tuple,
+        number=1,
+        repeat=1,
+        warmup=0,
+    )
+
+    assert result.original.stdev == 0.0
+    assert target() == 1
+
+
+def target() -> int:
+    return 1
+
+
+def test_timings_from_samples():
+    timings = Timings.from_samples([1.0, 2.0, 6.0])
+
+    assert timings[:3] == (1.0, 2.0, 3.0)
+    assert timings.stdev == pytest.approx(2.6457513)
+
+
+def test_comparison_str():
+    comparison = Comparison(
+        original=Timings(min=1.5, median=2.0, mean=2.0, stdev=0.002),
+        patched=Timings(min=1e-6, median=1e-9, mean=2e-5, stdev=0.0),
+    )
+
+    assert str(comparison) == (
+        "original: median 2 s, min 1.5 s, mean 2 s ± 2 ms\n"
+        + "patched: median 1 ns, min 1 us, mean 20 us ± 0 ns\n"
+        + "speedup: 2000000000.00x"
+    )
@@ -0,0 +1,388 @@
+from __future__ import annotations
+
+import dis
+import math
+from textwrap import dedent
+from types import CodeType
+
+import pytest
+
+import patchy
+from patchy.api import _get_source
+
+SCALE = 3
+
+_counter = 0
+
+
+def helper() -> int:
+    return 1
+
+
+def global_loads(code: CodeType) -> set[str]:
+    names = {
+        instruction.argval.removesuffix(" + NULL")
+        for instruction in dis.get_instructions(code)
+        if instruction.opname == "LOAD_GLOBAL"
+    }
+    for const in code.co_consts:
+        if isinstance(const, CodeType):
+            names |= global_loads(const)
+    return names
+
+
+def test_bind_all():
+    def sample(values: list[float]) -> int:
+        total = 0
+        for value in values:
+            total += abs(math.floor(value)) * SCALE
+        return total
+
+    assert sample([1.5, -2.5]) == 12
+
+    assert patchy.bind_globals(sample) == ["abs", "math"]
+
+    assert sample([1.5, -2.5]) == 12
+    assert global_loads(sample.__code__) == {"SCALE"}
+
+
+def test_bind_names():
+    def sample(value: float) -> int:
+        return abs(math.floor(value))
+
+    assert sample(-2.5) == 3
+
+    assert patchy.bind_globals(sample, ["math"]) == ["math"]
+
+    assert sample(-2.5) == 3
+    assert global_loads(sample.__code__) == {"abs"}
+
+
+def test_bind_arguments_and_keywords():
+    def sample(values: list[int]) -> list[int]:
+        return sorted(map(abs, values), key=abs, reverse=bool(SCALE))
+
+    assert sample([-2, 1]) == [2, 1]
+
+    assert patchy.bind_globals(sample) == ["SCALE", "abs", "bool", "map", "sorted"]
+
+    assert sample([-2, 1]) == [2, 1]
+    assert global_loads(sample.__code__) == set()
+
+
+def test_bind_nested_scopes():
+    def sample(values: list[int]) -> list[str]:
+        return [str(abs(value)) for value in values]
+
+    assert sample([-1]) == ["1"]
+
+    assert patchy.bind_globals(sample) == ["abs", "str"]
+
+    assert sample([-1]) == ["1"]
+    assert global_loads(sample.__code__) == set()
+
+
+def test_bind_keeps_source():
+    def sample(value: int) -> int:
+        return abs(value)
+
+    assert sample(-1) == 1
+
+    patchy.bind_globals(sample)
+
+    assert _get_source(sample) == dedent(
+        """\
+        def sample(value: int) -> int:
+            return abs(value)
+        """
+    )
+    assert f"#patchy:{sample.__qualname__}:" in sample.__code__.co_filename
+
+
+def test_bound_objects_fixed(monkeypatch):
+    def sample() -> int:
+        return helper()
+
+    assert sample() == 1
+
+    patchy.bind_globals(sample)
+    monkeypatch.setitem(globals(), "helper", lambda: 2)
+
+    assert sample() == 1
+
+
+def test_rebind(monkeypatch):
+    def sample() -> int:
+        return helper()
+
+    assert sample() == 1
+
+    patchy.bind_globals(sample)
+    monkeypatch.setitem(globals(), "helper", lambda: 2)
+
+    assert patchy.bind_globals(sample, rebind=True) == ["helper"]
+
+    assert sample() == 2
+    patchy.unbind_globals(sample)
+    assert sample() == 2
+
+
+def test_rebind_not_bound():
+    def sample(value: int) -> int:
+        return abs(value)
+
+    assert sample(-1) == 1
+
+    assert patchy.bind_globals(sample, rebind=True) == ["abs"]
+
+    assert global_loads(sample.__code__) == set()
+
+
+def test_already_bound():
+    def sample(value: int) -> int:
+        return abs(value)
+
+    assert sample(-1) == 1
+    patchy.bind_globals(sample)
+
+    with pytest.raises(ValueError) as excinfo:
+        patchy.bind_globals(sample)
+
+    assert str(excinfo.value) == "Globals are already bound in 'sample'."
+
+
+def test_skips_assigned_names():
+    def sample(values: list[int]) -> str:
+        global _counter
+        _counter = len(values)
+        str = repr
+        return str(_counter)
+
+    assert sample([1]) == "1"
+
+    assert patchy.bind_globals(sample) == ["len"]
+
+    assert sample([1, 2]) == "2"
+    with pytest.raises(ValueError) as excinfo:
+        patchy.bind_globals(sample, ["str"], rebind=True)
+
+    assert str(excinfo.value) == "'sample' has no lookups of 'str' that can be bound."
+
+
+def test_skips_closure_variables():
+    abs = math.fabs
+
+    def sample(value: int) -> float:
+        return abs(value) + len([value])
+
+    assert sample(-1) == 2.0
+
+    assert patchy.bind_globals(sample) == ["len"]
+
+    assert sample(-1) == 2.0
+
+
+def test_skips_other_positions():
+    def sample(value: int) -> int:
+        if SCALE:
+            return value * SCALE
+        return value  # pragma: no cover
+
+    assert sample(2) == 6
+
+    with pytest.raises(ValueError) as excinfo:
+        patchy.bind_globals(sample)
+
+    assert str(excinfo.value) == "'sample' has no global lookups that can be bound."
+
+
+def test_skips_undefined_names():
+    def sample() -> int:  # pragma: no cover
+        return undefined_helper() + helper()  # type: ignore [name-defined, no-any-return] # noqa: F821
+
+    assert patchy.bind_globals(sample) == ["helper"]
+
+
+def test_undefined_name():
+    def sample() -> int:  # pragma: no cover
+        return undefined_helper()  # type: ignore [name-defined, no-any-return] # noqa: F821
+
+    with pytest.raises(ValueError) as excinfo:
+        patchy.bind_globals(sample, ["undefined_helper"])
+
+    assert str(excinfo.value) == "Could not find 'undefined_helper' from 'sample'."
+
+
+def test_method_super():
+    class Base:
+        def sample(self) -> int:
+            return 1
+
+    class Foo(Base):
+        def sample(self) -> int:
+            return abs(super().sample())
+
+    assert Foo().sample() == 1
+
+    assert patchy.bind_globals(Foo.sample) == ["abs"]
+
+    assert Foo().sample() == 1
+    assert global_loads(Foo.sample.__code__) == {"super"}
+
+
+def test_unbind():
+    def sample(value: int) -> int:
+        return abs(value)
+
+    assert sample(-1) == 1
+    original_code = sample.__code__
+    patchy.bind_globals(sample)
+
+    patchy.unbind_globals(sample)
+
+    assert sample.__code__ is original_code
+    assert patchy.patched() == []
+
+
+def test_unbind_after_patch():
+    def sample(value: int) -> int:
+        return abs(value)
+
+    assert sample(-1) == 1
+    patchy.patch(
+        sample,
+        """\
+        @@ -1,2 +1,2 @@
+         def sample(value: int) -> int:
+        -    return abs(value)
+        +    return abs(value) + 1
+        """,
+    )
+    patched_code = sample.__code__
+    patchy.bind_globals(sample)
+
+    patchy.unbind_globals(sample)
+
+    assert sample.__code__ is patched_code
+    assert sample(-1) == 2
+
+
+def test_unbind_not_bound():
+    def sample(value: int) -> int:  # pragma: no cover
+        return abs(value)
+
+    with pytest.raises(ValueError) as excinfo:
+        patchy.unbind_globals(sample)
+
+    assert str(excinfo.value) == "'sample' has no bound globals."
+
+
+def test_later_patch_refused():
+    def sample(value: int) -> int:
+        return abs(value)
+
+    assert sample(-1) == 1
+    patchy.bind_globals(sample)
+    bound_code = sample.__code__
+    patch_text = """\
+        @@ -1,2 +1,2 @@
+         def sample(value: int) -> int:
+        -    return abs(value)
+        +    return abs(value) + 1
+        """
+
+    with pytest.raises(ValueError) as excinfo:
+        patchy.patch(sample, patch_text)
+
+    assert str(excinfo.value) == (
+        "Globals are bound in 'sample', and changing its code would unbind them."
+        + " Call unbind_globals() first."
+    )
+    assert sample.__code__ is bound_code
+    patchy.unbind_globals(sample)
+    patchy.patch(sample, patch_text)
+    assert sample(-1) == 2
+
+
+def test_earlier_patch_unpatch_refused():
+    def sample(value: int) -> int:
+        return abs(value)
+
+    assert sample(-1) == 1
+    patch_text = """\
+        @@ -1,2 +1,2 @@
+         def sample(value: int) -> int:
+        -    return abs(value)
+        +    return abs(value) + 1
+        """
+    patchy.patch(sample, patch_text)
+    patchy.bind_globals(sample)
+
+    with pytest.raises(ValueError):
+        patchy.unpatch(sample, patch_text)
+
+    assert global_loads(sample.__code__) == set()
+    assert sample(-1) == 2
+
+
+def test_export_skips_binding():
+    patchy.patch(
+        "tests.test_binding.target",
+        """\
+        @@ -1,2 +1,2 @@
+         def target() -> int:
+        -    return helper()
+        +    return helper() + 1
+        """,
+    )
+    patched_code = target.__code__
+    patchy.bind_globals(target)
+    with pytest.warns(UserWarning) as record:
+        data = patchy.export_patches()
+    patchy.unpatch_all()
+
+    assert str(record[0].message) == (
+        "Could not export the globals bound in 'tests.test_binding.target', as"
+        + " they can't be marshalled. Call bind_globals() again after installing."
+    )
+    assert record[0].filename == __file__
+
+    patchy.install_patches(data)
+
+    assert target.__code__ == patched_code
+    assert target() == 2
+
+
+def test_export_skips_only_binding():
+    patchy.bind_globals(target)
+
+    with pytest.warns(UserWarning, match="Could not export the globals bound"):
+        data = patchy.export_patches()
+
+    patchy.unpatch_all()
+    patchy.install_patches(data)
+    assert patchy.patched() == []
+
+
+def test_by_path():
+    assert target() == 1
+
+    assert patchy.bind_globals("tests.test_binding.target") == ["helper"]
+    patchy.unbind_globals("tests.test_binding.target")
+
+    assert global_loads(target.__code__) == {"helper"}
+
+
+def target() -> int:
+    return helper()
+
+
+def test_bind_readme_example():
+    def distance(points: list[tuple[int, int]]) -> float:
+        return sum(math.hypot(x, y) for x, y in points)
+
+    assert distance([(3, 4)]) == 5.0
+
+    assert patchy.bind_globals(distance) == ["math", "sum"]
+
+    assert distance([(3, 4)]) == 5.0
@@ -0,0 +1,225 @@
+from __future__ import annotations
+
+import importlib
+import json
+import linecache
+import sys
+import warnings
+import zipfile
+from textwrap import dedent
+
+import pytest
+
+import patchy
+from patchy import reloading
+from patchy.__main__ import main
+from patchy.bundle import SourceBundle
+
+MODULES = ("bundle_pkg", "bundle_pkg.mod")
+
+PATCH_TEXT = """\
+    @@ -1,2 +1,2 @@
+     def sample() -> int:
+    -    return 1
+    +    return 2
+    """
+
+
+@pytest.fixture
+def package(tmp_path):
+    root = tmp_path / "src" / "bundle_pkg"
+    root.mkdir(parents=True)
+    (root / "__init__.py").write_text("")
+    (root / "mod.py").write_text(
+        dedent(
+            """\
+            def sample() -> int:
+                return 1
+
+
+            class Foo:
+                def method(self) -> int:
+                    return 1
+            """
+        )
+    )
+    sys.path.insert(0, str(tmp_path / "src"))
+    try:
+        yield root
+    finally:
+        sys.path.pop(0)
+        for module in MODULES:
+            sys.modules.pop(module, None)
+            reloading._module_ops.pop(module, None)
+        patchy.set_source_bundle(None)
+
+
+@pytest.fixture
+def sourceless(package, tmp_path):
+    bundle = tmp_path / "bundle.zip"
+    patchy.build_source_bundle(bundle, ["bundle_pkg"], [str(tmp_path / "src")])
+    module = importlib.import_module("bundle_pkg.mod")
+    (package / "mod.py").unlink()
+    linecache.clearcache()
+    return module, bundle
+
+
+def test_build(package, tmp_path):
+    bundle = tmp_path / "bundle.zip"
+
+    count = patchy.build_source_bundle(bundle, ["bundle_pkg"], [str(tmp_path / "src")])
+
+    assert count == 3
+    with zipfile.ZipFile(bundle) as zf:
+        assert sorted(zf.namelist()) == [
+            "bundle_pkg.mod:Foo.method:6",
+            "bundle_pkg.mod:Foo:5",
+            "bundle_pkg.mod:sample:1",
+        ]
+        assert zf.read("bundle_pkg.mod:Foo.method:6").decode() == dedent(
+            """\
+            def method(self) -> int:
+                return 1
+            """
+        )
+
+
+def test_build_missing(tmp_path):
+    bundle = tmp_path / "bundle.zip"
+
+    with pytest.raises(LookupError):
+        patchy.build_source_bundle(bundle, ["bundle_pkg_nope"], [str(tmp_path)])
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_sourceless_fails(sourceless):
+    module, _ = sourceless
+
+    with pytest.raises(OSError):
+        patchy.patch(module.sample, PATCH_TEXT)
+
+
+def test_patch_from_bundle(sourceless):
+    module, bundle = sourceless
+    patchy.set_source_bundle(bundle)
+
+    patchy.patch(module.sample, PATCH_TEXT)
+
+    assert module.sample() == 2
+    patchy.unpatch(module.sample, PATCH_TEXT)
+    assert module.sample() == 1
+
+
+def test_patch_class_from_bundle(sourceless):
+    module, bundle = sourceless
+    patchy.set_source_bundle(bundle)
+
+    patchy.patch_class(
+        module.Foo,
+        """\
+        @@ -1,3 +1,3 @@
+         class Foo:
+             def method(self) -> int:
+        -        return 1
+        +        return 3
+        """,
+    )
+
+    assert module.Foo().method() == 3
+
+
+def test_property_from_bundle(package, tmp_path):
+    (package / "props.py").write_text(
+        dedent(
+            """\
+            class Foo:
+                @property
+                def value(self) -> int:
+                    return 1
+
+                @value.setter
+                def value(self, value: int) -> None:
+                    pass
+            """
+        )
+    )
+    bundle = tmp_path / "bundle.zip"
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        patchy.build_source_bundle(bundle, ["bundle_pkg"], [str(tmp_path / "src")])
+    module = importlib.import_module("bundle_pkg.props")
+    (package / "props.py").unlink()
+    linecache.clearcache()
+    patchy.set_source_bundle(bundle)
+
+    try:
+        getter = patchy.api._get_source(module.Foo.value.fget)
+        setter = patchy.api._get_source(module.Foo.value.fset)
+    finally:
+        sys.modules.pop("bundle_pkg.props", None)
+
+    assert "return 1" in getter
+    assert "pass" in setter
+
+
+def test_ambiguous_class_in_bundle(tmp_path):
+    bundle = tmp_path / "bundle.zip"
+    with zipfile.ZipFile(bundle, "w") as zf:
+        zf.writestr("mod:Foo:1", "class Foo:\n    pass\n")
+        zf.writestr("mod:Foo:4", "class Foo:\n    x = 1\n")
+        zf.writestr("mod:Bar:7", "class Bar:\n    pass\n")
+    source_bundle = SourceBundle(str(bundle))
+
+    try:
+        assert source_bundle.get("mod", "Foo") is None
+        assert source_bundle.get("mod", "Foo", 4) == "class Foo:\n    x = 1\n"
+        assert source_bundle.get("mod", "Bar") == "class Bar:\n    pass\n"
+        assert source_bundle.get("mod", "Baz") is None
+    finally:
+        source_bundle.close()
+
+
+def test_missing_from_bundle(sourceless, tmp_path):
+    module, _ = sourceless
+    empty = tmp_path / "empty.zip"
+    zipfile.ZipFile(empty, "w").close()
+    patchy.set_source_bundle(empty)
+
+    with pytest.raises(OSError):
+        patchy.patch(module.sample, PATCH_TEXT)
+
+
+def test_set_source_bundle_replaces(sourceless, tmp_path):
+    module, bundle = sourceless
+    empty = tmp_path / "empty.zip"
+    zipfile.ZipFile(empty, "w").close()
+    patchy.set_source_bundle(empty)
+
+    patchy.set_source_bundle(bundle)
+
+    patchy.patch(module.sample, PATCH_TEXT)
+    assert module.sample() == 2
+
+
+def test_source_files_preferred(package, tmp_path):
+    bundle = tmp_path / "bundle.zip"
+    with zipfile.ZipFile(bundle, "w") as zf:
+        zf.writestr("bundle_pkg.mod:sample:1", "def sample() -> int:\n    return 5\n")
+    patchy.set_source_bundle(bundle)
+    module = importlib.import_module("bundle_pkg.mod")
+
+    patchy.patch(module.sample, PATCH_TEXT)
+
+    assert module.sample() == 2
+
+
+def test_main_bundle(package, tmp_path, capsys):
+    bundle = tmp_path / "bundle.zip"
+
+    ret = main(["bundle", str(bundle), "bundle_pkg", "--path", str(tmp_path / "src")])
+
+    assert ret == 0
+    out = json.loads(capsys.readouterr().out)
+    assert out == {"bundle": str(bundle), "definitions": 3}
+    assert bundle.exists()
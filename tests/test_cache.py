@@ -2,7 +2,7 @@ from __future__ import annotations
 
 import pytest
 
-from patchy.cache import PatchingCache
+from patchy.cache import DiskCache, PatchingCache
 
 
 def test_store_retrieve():
@@ -26,6 +26,26 @@ def test_clear():
         cache.retrieve("a", "b", True)
 
 
+def test_lean_store_retrieve():
+    cache = PatchingCache(maxsize=100)
+    cache.set_lean(True)
+    cache.store("a", "b", True, "c")
+    assert cache.retrieve("a", "b", True) == "c"
+    assert cache.retrieve("c", "b", False) == "a"
+    assert all(isinstance(value, bytes) for value in cache._cache.values())
+
+
+def test_set_lean_clears():
+    cache = PatchingCache(maxsize=100)
+    cache.store("a", "b", True, "c")
+    cache.set_lean(True)
+    with pytest.raises(KeyError):
+        cache.retrieve("a", "b", True)
+    cache.store("a", "b", True, "c")
+    cache.set_lean(True)
+    assert cache.retrieve("a", "b", True) == "c"
+
+
 def test_culling():
     cache = PatchingCache(maxsize=4)
     cache.store("a", "b", True, "c")
@@ -34,3 +54,56 @@ def test_culling():
     assert len(cache._cache) == 4
     cache.store("a", "f", True, "g")
     assert len(cache._cache) <= 4
+
+
+def test_disk_store_retrieve(tmp_path):
+    cache = DiskCache(str(tmp_path / "cache"))
+    cache.store("a", {"b": "c"})
+    assert cache.retrieve("a") == {"b": "c"}
+
+
+def test_disk_missing_key_error(tmp_path):
+    cache = DiskCache(str(tmp_path))
+    with pytest.raises(KeyError):
+        cache.retrieve("a")
+
+
+def test_disk_corrupt_key_error(tmp_path):
+    cache = DiskCache(str(tmp_path))
+    cache.store("a", {"b": "c"})
+    for path in tmp_path.iterdir():
+        path.write_text("{")
+    with pytest.raises(KeyError):
+        cache.retrieve("a")
+
+
+def test_disk_mismatched_key_error(tmp_path):
+    cache = DiskCache(str(tmp_path))
+    cache.store("a", {"b": "c"})
+    for path in tmp_path.iterdir():
+        path.write_text('{"key": "other", "value": {}}')
+    with pytest.raises(KeyError):
+        cache.retrieve("a")
+
+
+def test_disk_store_failure_cleans_up(tmp_path):
+    cache = DiskCache(str(tmp_path))
+    with pytest.raises(TypeError):
+        cache.store("a", {"b": object()})
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_disk_store_unwritable_ignored(tmp_path):
+    (tmp_path / "notadir").write_text("")
+    cache = DiskCache(str(tmp_path / "notadir" / "cache"))
+    cache.store("a", {"b": "c"})
+    with pytest.raises(KeyError):
+        cache.retrieve("a")
+
+
+def test_sizeof():
+    cache = PatchingCache(maxsize=100)
+    cache.store("a", "b", True, "c")
+    seen: set[int] = set()
+    assert cache.sizeof(seen) > 0
+    assert cache.sizeof(seen) == 0
@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from textwrap import dedent
+
+import pytest
+
+from patchy.__main__ import main
+from patchy.check import check, iter_patch_files
+from patchy.static import get_static_source
+
+
+@pytest.fixture
+def source_tree(tmp_path):
+    package = tmp_path / "src" / "check_pkg"
+    package.mkdir(parents=True)
+    (package / "__init__.py").write_text(
+        dedent(
+            """\
+            def top() -> int:
+                return 1
+            """
+        )
+    )
+    (package / "mod.py").write_text(
+        dedent(
+            """\
+            import functools
+
+
+            class Foo:
+                @functools.lru_cache
+                def sample(self) -> int:
+                    return 1
+
+                def other(self) -> int:
+                    return 2
+            """
+        )
+    )
+    return tmp_path
+
+
+def write_patch(directory: Path, name: str, text: str) -> str:
+    directory.mkdir(exist_ok=True)
+    path = directory / name
+    path.write_text(dedent(text))
+    return str(path)
+
+
+def test_get_static_source(source_tree):
+    source = get_static_source("check_pkg.mod.Foo.sample", [str(source_tree / "src")])
+    assert source == dedent(
+        """\
+        @functools.lru_cache
+        def sample(self) -> int:
+            return 1
+        """
+    )
+
+
+def test_get_static_source_package(source_tree):
+    source = get_static_source("check_pkg.top", [str(source_tree / "src")])
+    assert source == "def top() -> int:\n    return 1\n"
+
+
+def test_get_static_source_no_module(source_tree):
+    with pytest.raises(LookupError) as excinfo:
+        get_static_source("nope.func", [str(source_tree / "src")])
+    assert str(excinfo.value) == "Could not find a module for 'nope.func'."
+
+
+def test_get_static_source_no_function(source_tree):
+    with pytest.raises(LookupError) as excinfo:
+        get_static_source("check_pkg.mod.Foo.missing", [str(source_tree / "src")])
+    assert "Could not find 'Foo.missing'" in str(excinfo.value)
+
+
+def test_iter_patch_files_bad_name(tmp_path):
+    path = tmp_path / "thing.diff"
+    path.write_text("")
+    with pytest.raises(ValueError) as excinfo:
+        iter_patch_files([str(path)])
+    assert str(excinfo.value).endswith("must end with .patch.")
+
+
+def test_check(source_tree):
+    patches = source_tree / "patches"
+    write_patch(
+        patches,
+        "check_pkg.mod.Foo.other.patch",
+        """\
+        @@ -1,2 +1,2 @@
+         def other(self) -> int:
+        -    return 2
+        +    return 3
+        """,
+    )
+    write_patch(
+        patches,
+        "check_pkg.top.patch",
+        """\
+        @@ -1,2 +1,2 @@
+         def top() -> int:
+        -    return 5
+        +    return 6
+        """,
+    )
+    write_patch(
+        patches,
+        "check_pkg.mod.Foo.sample.patch",
+        """\
+        @@ -2,2 +2,2 @@
+         def sample(self) -> int:
+        -    return 1
+        +    return (
+        """,
+    )
+    write_patch(patches, "check_pkg.gone.patch", "")
+
+    results = check([str(patches)], [str(source_tree / "src")], jobs=1)
+
+    assert [(r["target"], r["status"]) for r in results] == [
+        ("check_pkg.gone", "missing"),
+        ("check_pkg.mod.Foo.other", "ok"),
+        ("check_pkg.mod.Foo.sample", "invalid"),
+        ("check_pkg.top", "failed"),
+    ]
+
+
+def test_check_offset_warning_points_at_caller(source_tree):
+    patches = source_tree / "patches"
+    write_patch(
+        patches,
+        "check_pkg.top.patch",
+        """\
+        @@ -1,1 +1,1 @@
+        -    return 1
+        +    return 2
+        """,
+    )
+
+    with pytest.warns(UserWarning, match="offset or fuzz") as record:
+        results = check([str(patches)], [str(source_tree / "src")], jobs=1)
+
+    assert record[0].filename == __file__
+    assert [r["status"] for r in results] == ["ok"]
+
+
+def test_check_process_pool(source_tree):
+    patches = source_tree / "patches"
+    for name in ("check_pkg.top.patch", "check_pkg.mod.Foo.other.patch"):
+        write_patch(
+            patches,
+            name,
+            """\
+            @@ -2,1 +2,1 @@
+            -    return 1
+            +    return 2
+            """,
+        )
+
+    results = check([str(patches)], [str(source_tree / "src")], jobs=2)
+
+    assert [(r["target"], r["status"]) for r in results] == [
+        ("check_pkg.mod.Foo.other", "failed"),
+        ("check_pkg.top", "ok"),
+    ]
+
+
+def test_main(source_tree, capsys):
+    patch_file = write_patch(
+        source_tree / "patches",
+        "check_pkg.top.patch",
+        """\
+        @@ -2,1 +2,1 @@
+        -    return 1
+        +    return 2
+        """,
+    )
+
+    ret = main(["check", "--path", str(source_tree / "src"), patch_file])
+
+    assert ret == 0
+    report = json.loads(capsys.readouterr().out)
+    assert report["summary"] == {"total": 1, "ok": 1, "failed": 0}
+    assert report["results"] == [
+        {
+            "target": "check_pkg.top",
+            "patch_file": patch_file,
+            "status": "ok",
+            "message": "",
+        }
+    ]
+
+
+def test_main_failure(source_tree, capsys):
+    patch_file = write_patch(source_tree / "patches", "check_pkg.nope.patch", "")
+
+    ret = main(["check", "--path", str(source_tree / "src"), patch_file])
+
+    assert ret == 1
+    report = json.loads(capsys.readouterr().out)
+    assert report["summary"] == {"total": 1, "ok": 0, "failed": 1}
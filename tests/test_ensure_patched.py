@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import pytest
+
+import patchy
+
+PATCH_TEXT = """\
+    @@ -1,2 +1,2 @@
+     def sample() -> int:
+    -    return 1
+    +    return 2
+    """
+
+
+def test_applies():
+    def sample() -> int:
+        return 1
+
+    assert sample() == 1
+
+    assert patchy.ensure_patched(sample, PATCH_TEXT) is True
+
+    assert sample() == 2
+
+
+def test_already_applied(runs):
+    def sample() -> int:
+        return 1
+
+    assert sample() == 1
+
+    patchy.ensure_patched(sample, PATCH_TEXT)
+    code = sample.__code__
+
+    assert patchy.ensure_patched(sample, PATCH_TEXT) is False
+
+    assert sample() == 2
+    assert sample.__code__ is code
+    assert len(runs) == 1
+
+
+def test_after_patch():
+    def sample() -> int:
+        return 1
+
+    assert sample() == 1
+
+    patchy.patch(sample, PATCH_TEXT)
+
+    assert patchy.ensure_patched(sample, PATCH_TEXT) is False
+    assert sample() == 2
+
+
+def test_under_later_patch():
+    def sample() -> int:
+        return 1
+
+    assert sample() == 1
+
+    patchy.patch(sample, PATCH_TEXT)
+    patchy.patch(
+        sample,
+        """\
+        @@ -1,2 +1,3 @@
+         def sample() -> int:
+        +    print("hi")
+             return 2
+        """,
+    )
+
+    assert patchy.ensure_patched(sample, PATCH_TEXT) is False
+
+
+def test_after_unpatch():
+    def sample() -> int:
+        return 1
+
+    assert sample() == 1
+
+    patchy.patch(sample, PATCH_TEXT)
+    patchy.unpatch(sample, PATCH_TEXT)
+
+    assert patchy.ensure_patched(sample, PATCH_TEXT) is True
+    assert sample() == 2
+
+
+def test_other_patch_applied():
+    def sample() -> int:
+        return 1
+
+    assert sample() == 1
+
+    patchy.patch(
+        sample,
+        """\
+        @@ -1,2 +1,3 @@
+         def sample() -> int:
+        +    print("hi")
+             return 1
+        """,
+    )
+
+    with pytest.warns(
+        UserWarning, match="only applied with an offset or fuzz"
+    ) as record:
+        assert patchy.ensure_patched(sample, PATCH_TEXT) is True
+    assert record[0].filename == __file__
+    assert sample() == 2
+
+
+def test_after_replace_applied():
+    def sample() -> int:
+        return 1
+
+    assert sample() == 1
+
+    patchy.patch(sample, PATCH_TEXT)
+    patchy.replace(
+        sample,
+        None,
+        """\
+        def sample() -> int:
+            return 2
+        """,
+    )
+
+    assert patchy.ensure_patched(sample, PATCH_TEXT) is False
+
+
+def test_after_replace_not_applied():
+    def sample() -> int:
+        return 1
+
+    assert sample() == 1
+
+    patchy.patch(sample, PATCH_TEXT)
+    patchy.replace(
+        sample,
+        None,
+        """\
+        def sample() -> int:
+            return 1
+        """,
+    )
+
+    assert patchy.ensure_patched(sample, PATCH_TEXT) is True
+    assert sample() == 2
+
+
+def test_after_replace_neither():
+    def sample() -> int:
+        return 1
+
+    assert sample() == 1
+
+    patchy.replace(
+        sample,
+        None,
+        """\
+        def sample() -> int:
+            return 3
+        """,
+    )
+
+    with pytest.raises(ValueError) as excinfo:
+        patchy.ensure_patched(sample, PATCH_TEXT)
+
+    assert "Could not apply the patch to 'sample'." in str(excinfo.value)
+
+
+def test_by_path():
+    assert module_sample() == 1
+
+    assert patchy.ensure_patched(
+        "tests.test_ensure_patched.module_sample",
+        """\
+        @@ -1,2 +1,2 @@
+         def module_sample() -> int:
+        -    return 1
+        +    return 5
+        """,
+    )
+
+    assert module_sample() == 5
+
+
+def module_sample() -> int:
+    return 1
@@ -0,0 +1,697 @@
+from __future__ import annotations
+
+import functools
+import warnings
+from collections.abc import Callable, Iterator
+from textwrap import dedent
+from typing import Any
+
+import pytest
+
+import patchy
+from patchy.api import _get_source
+
+LIMIT = 10
+
+
+def double(value: int) -> int:
+    "Double a value."
+    return value * 2
+
+
+def scale(value: int, factor: int = 2) -> int:
+    result = value * factor
+    if result > LIMIT:
+        result = LIMIT
+    return result
+
+
+def record(items: list[int], value: int) -> int:
+    items.append(value)
+    return len(items)
+
+
+def add(items: list[int], value: int) -> None:
+    items.append(value)
+
+
+class Helpers:
+    @staticmethod
+    def triple(value: int) -> int:
+        return value * 3
+
+
+# Callees that can't be inlined, which are only inspected
+
+
+def early(value: int) -> int:  # pragma: no cover
+    if value:
+        return 1
+    return 2
+
+
+def generator(value: int) -> Iterator[int]:  # pragma: no cover
+    yield value
+
+
+def star(*values: int) -> int:  # pragma: no cover
+    return sum(values)
+
+
+def uses_locals(value: int) -> dict[str, Any]:  # pragma: no cover
+    return locals()
+
+
+def with_default(value: int, items: tuple[int, ...] = (1,)) -> int:  # pragma: no cover
+    return value + len(items)
+
+
+def nested(value: int) -> int:  # pragma: no cover
+    def inner() -> int:
+        return value
+
+    return inner()
+
+
+def uses_global(value: int) -> int:  # pragma: no cover
+    global LIMIT
+    LIMIT = value
+    return value
+
+
+def make_adder(amount: int) -> Callable[[int], int]:
+    def adder(value: int) -> int:  # pragma: no cover
+        return value + amount
+
+    return adder
+
+
+add_one = make_adder(1)
+
+
+@functools.wraps(double)
+def wrapped(value: int) -> int:  # pragma: no cover
+    return double(value)
+
+
+def test_inline_expression():
+    def sample(x: int) -> int:
+        return double(x) + 1
+
+    assert sample(3) == 7
+
+    assert patchy.inline(sample, "double") == 1
+
+    assert sample(3) == 7
+    assert _get_source(sample) == dedent(
+        """\
+        def sample(x: int) -> int:
+            return x * 2 + 1
+        """
+    )
+
+
+def test_inline_statements():
+    def sample(x: int) -> int:
+        result = 1
+        y = scale(x)
+        return result + y
+
+    assert sample(3) == 7
+    assert sample(30) == 11
+
+    assert patchy.inline(sample, "scale") == 1
+
+    assert sample(3) == 7
+    assert sample(30) == 11
+    assert _get_source(sample) == dedent(
+        """\
+        def sample(x: int) -> int:
+            result = 1
+            _scale_result = x * 2
+            if _scale_result > LIMIT:
+                _scale_result = LIMIT
+            y = _scale_result
+            return result + y
+        """
+    )
+
+
+def test_inline_keeps_comments():
+    def sample(x: int) -> int:
+        # Scale it
+        y = scale(x)  # scaled
+        return double(y) ** 2  # squared, 'quoted'
+
+    assert sample(3) == 144
+
+    patchy.inline(sample, "scale")
+    patchy.inline(sample, "double")
+
+    assert sample(3) == 144
+    assert _get_source(sample) == dedent(
+        """\
+        def sample(x: int) -> int:
+            # Scale it
+            _scale_result = x * 2
+            if _scale_result > LIMIT:
+                _scale_result = LIMIT
+            y = _scale_result  # scaled
+            return (y * 2) ** 2  # squared, 'quoted'
+        """
+    )
+
+
+def test_inline_nested_calls():
+    def sample(x: int) -> int:
+        # Quadruple
+        y = double(double(x))
+        return double(double(y))  # again
+
+    assert sample(1) == 16
+
+    assert patchy.inline(sample, "double") == 4
+
+    assert sample(1) == 16
+    assert _get_source(sample) == dedent(
+        """\
+        def sample(x: int) -> int:
+            # Quadruple
+            _double_value = x * 2
+            y = _double_value * 2
+            _double_value_2 = y * 2
+            return _double_value_2 * 2  # again
+        """
+    )
+
+
+def test_inline_shared_line_unparsed():
+    def sample(x: int) -> int:
+        # fmt: off
+        y = double(x); return y  # noqa: E702
+        # fmt: on
+
+    assert sample(1) == 2
+
+    patchy.inline(sample, "double")
+
+    assert sample(1) == 2
+    assert "#" not in _get_source(sample)
+
+
+def test_inline_fresh_names():
+    def sample(x: int) -> int:
+        _scale_result = 1
+        y = scale(x)
+        z = scale(y)
+        return _scale_result + y + z
+
+    assert sample(1) == 7
+
+    assert patchy.inline(sample, "scale") == 2
+
+    assert sample(1) == 7
+    source = _get_source(sample)
+    assert "_scale_result_2 = x * 2" in source
+    assert "_scale_result_3 = y * 2" in source
+
+
+def test_inline_expression_statement():
+    def sample(items: list[int]) -> list[int]:
+        record(items, 1)
+        return items
+
+    assert sample([]) == [1]
+
+    patchy.inline(sample, "record")
+
+    assert sample([]) == [1]
+    assert _get_source(sample) == dedent(
+        """\
+        def sample(items: list[int]) -> list[int]:
+            items.append(1)
+            len(items)
+            return items
+        """
+    )
+
+
+def test_inline_no_return():
+    def sample(items: list[int]) -> list[int | None]:
+        add(items, 1)
+        x = add(items, 2)  # type: ignore [func-returns-value]
+        return [*items, x]
+
+    assert sample([]) == [1, 2, None]
+
+    patchy.inline(sample, "add")
+
+    assert sample([]) == [1, 2, None]
+
+
+def test_inline_expression_statement_drops_name():
+    def sample(x: int) -> int:
+        double(x)
+        return x
+
+    assert sample(1) == 1
+
+    patchy.inline(sample, "double")
+
+    assert sample(1) == 1
+    assert "double" not in _get_source(sample)
+
+
+def test_inline_return_and_augmented():
+    def sample(x: int) -> int:
+        x += scale(x, 3)
+        y: int = scale(x, factor=1)
+        return scale(y, factor=1)
+
+    assert sample(1) == 4
+
+    assert patchy.inline(sample, "scale") == 3
+
+    assert sample(1) == 4
+    assert sample(4) == 10
+
+
+def test_inline_augmented_attribute():
+    def sample(x: int) -> int:
+        box = [1]
+        box[0] += double(x)
+        y: int = 1
+        return box[0] + y
+
+    assert sample(1) == 4
+
+    patchy.inline(sample, "double")
+
+    assert sample(1) == 4
+    assert "box[0] += x * 2" in _get_source(sample)
+
+
+def test_inline_evaluates_arguments_once():
+    calls = []
+
+    def sample(x: int) -> int:
+        calls.append(x)
+        y = double(len(calls))
+        return y
+
+    assert sample(1) == 2
+    calls.clear()
+
+    patchy.inline(sample, "double")
+
+    assert sample(1) == 2
+    assert calls == [1]
+
+
+def test_inline_in_comprehension():
+    def sample(xs: list[int]) -> list[int]:
+        return [double(x) for x in xs]
+
+    assert sample([1, 2]) == [2, 4]
+
+    patchy.inline(sample, "double")
+
+    assert sample([1, 2]) == [2, 4]
+    assert "double" not in _get_source(sample)
+
+
+def test_inline_defaults():
+    def sample(x: int) -> int:
+        return scale(x)
+
+    assert sample(2) == 4
+
+    patchy.inline(sample, "scale")
+
+    assert sample(2) == 4
+
+
+def test_inline_caller_scopes():
+    def sample(x: int) -> int:
+        import math
+
+        try:
+            x = 12 // double(x)
+        except ZeroDivisionError:
+            pass
+        return math.floor(x)
+
+    assert sample(2) == 3
+    assert sample(0) == 0
+
+    patchy.inline(sample, "double")
+
+    assert sample(2) == 3
+    assert sample(0) == 0
+
+
+def test_inline_dotted_name():
+    def sample(x: int) -> int:
+        return Helpers.triple(x)
+
+    assert sample(2) == 6
+
+    patchy.inline(sample, "Helpers.triple")
+
+    assert sample(2) == 6
+    assert "triple" not in _get_source(sample)
+
+
+def test_inline_by_path():
+    assert module_sample(2) == 4
+
+    assert patchy.inline("tests.test_inline.module_sample", "double") == 1
+
+    assert module_sample(2) == 4
+    patchy.uninline("tests.test_inline.module_sample", "double")
+    assert "double" in _get_source(module_sample)
+
+
+def module_sample(x: int) -> int:
+    return double(x)
+
+
+def test_uninline():
+    def sample(x: int) -> int:
+        return double(x)
+
+    original = sample.__code__
+    patchy.inline(sample, "double")
+
+    patchy.uninline(sample, "double")
+
+    assert sample.__code__ is original
+    assert sample(2) == 4
+
+
+def test_uninline_under_later_patch():
+    def sample(x: int) -> int:
+        y = 1
+        return double(x) + y
+
+    assert sample(1) == 3
+
+    patchy.inline(sample, "double")
+    patchy.patch(
+        sample,
+        """\
+        @@ -1,3 +1,3 @@
+         def sample(x: int) -> int:
+        -    y = 1
+        +    y = 2
+             return x * 2 + y
+        """,
+    )
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        patchy.uninline(sample, "double")
+
+    assert sample(1) == 4
+    assert "double(x)" in _get_source(sample)
+
+
+def test_uninline_not_inlined():
+    def sample(x: int) -> int:
+        return double(x)
+
+    with pytest.raises(ValueError) as excinfo:
+        patchy.uninline(sample, "double")
+
+    assert str(excinfo.value) == "'double' is not inlined into 'sample'."
+    assert sample(1) == 2
+
+
+def test_uninline_other_callee():
+    def sample(x: int) -> int:
+        return double(x)
+
+    assert sample(1) == 2
+
+    patchy.inline(sample, "double")
+
+    with pytest.raises(ValueError) as excinfo:
+        patchy.uninline(sample, "scale")
+
+    assert str(excinfo.value) == "'scale' is not inlined into 'sample'."
+
+
+def test_uninline_after_unpatch_all():
+    def sample(x: int) -> int:
+        return double(x)
+
+    patchy.inline(sample, "double")
+    patchy.unpatch_all()
+
+    assert sample(1) == 2
+    with pytest.raises(ValueError):
+        patchy.uninline(sample, "double")
+    assert patchy.inline(sample, "double") == 1
+
+
+def test_uninline_after_replace():
+    def sample(x: int) -> int:
+        return double(x)
+
+    assert sample(1) == 2
+
+    patchy.inline(sample, "double")
+    patchy.replace(
+        sample,
+        None,
+        """\
+        def sample(x: int) -> int:
+            return x
+        """,
+    )
+
+    with pytest.raises(ValueError) as excinfo:
+        patchy.uninline(sample, "double")
+
+    assert str(excinfo.value) == "'double' is not inlined into 'sample'."
+
+
+def test_already_inlined():
+    def sample(x: int) -> int:
+        return double(x)
+
+    assert sample(1) == 2
+    patchy.inline(sample, "double")
+
+    with pytest.raises(ValueError) as excinfo:
+        patchy.inline(sample, "double")
+
+    assert str(excinfo.value) == "'double' is already inlined into 'sample'."
+
+
+def test_no_calls():
+    def sample(x: int) -> int:
+        return x
+
+    with pytest.raises(ValueError) as excinfo:
+        patchy.inline(sample, "double")
+
+    assert str(excinfo.value) == "'sample' has no calls to 'double'."
+    assert sample(1) == 1
+
+
+def test_not_found():
+    def sample(x: int) -> int:
+        return x
+
+    with pytest.raises(ValueError) as excinfo:
+        patchy.inline(sample, "nope")
+
+    assert str(excinfo.value) == "Could not find 'nope' from 'sample'."
+    assert sample(1) == 1
+
+
+def test_not_python_function():
+    def sample(x: int) -> int:
+        return abs(x)
+
+    with pytest.raises(ValueError) as excinfo:
+        patchy.inline(sample, "LIMIT")
+
+    assert str(excinfo.value) == "'LIMIT' is not a Python function."
+    assert sample(1) == 1
+
+
+# Callers for unsafe cases, which are only inspected
+
+
+def call_add_one(x: int) -> int:  # pragma: no cover
+    return add_one(x)
+
+
+def call_early(x: int) -> int:  # pragma: no cover
+    return early(x)
+
+
+def call_generator(x: int) -> Iterator[int]:  # pragma: no cover
+    return generator(x)
+
+
+def call_star(x: int) -> int:  # pragma: no cover
+    return star(x)
+
+
+def call_uses_locals(x: int) -> dict[str, Any]:  # pragma: no cover
+    return uses_locals(x)
+
+
+def call_nested(x: int) -> int:  # pragma: no cover
+    return nested(x)
+
+
+def call_uses_global(x: int) -> int:  # pragma: no cover
+    return uses_global(x)
+
+
+def call_wrapped(x: int) -> int:  # pragma: no cover
+    return wrapped(x)
+
+
+def call_missing(x: int) -> int:  # pragma: no cover
+    return double()  # type: ignore [call-arg]
+
+
+def call_too_many(x: int) -> int:  # pragma: no cover
+    return double(x, x)  # type: ignore [call-arg]
+
+
+def call_starred(x: int) -> int:  # pragma: no cover
+    return double(*[x])
+
+
+def call_unexpected(x: int) -> int:  # pragma: no cover
+    return double(x, value=x)  # type: ignore [misc]
+
+
+def call_unexpected_in_expression(x: int) -> int:  # pragma: no cover
+    return double(x, value=x) + 1  # type: ignore [misc]
+
+
+def call_with_default(x: int) -> int:  # pragma: no cover
+    return with_default(x)
+
+
+class Private:
+    __factor = 2
+
+    def double(self, value: int) -> int:  # pragma: no cover
+        return value * self.__factor
+
+
+def call_private(x: int) -> int:  # pragma: no cover
+    return Private.double(Private(), x)
+
+
+@pytest.mark.parametrize(
+    "caller,callee,problem",
+    [
+        (call_add_one, "add_one", "it uses closure variables"),
+        (call_early, "early", "it returns before its end"),
+        (call_generator, "generator", "it is a generator or coroutine"),
+        (call_star, "star", "it takes *args or **kwargs"),
+        (call_uses_locals, "uses_locals", "it uses 'locals'"),
+        (call_nested, "nested", "it defines functions or classes"),
+        (call_uses_global, "uses_global", "it has global or nonlocal statements"),
+        (call_wrapped, "wrapped", "it is wrapped by a decorator"),
+        (
+            call_private,
+            "Private.double",
+            "it uses private names, which are mangled differently",
+        ),
+        (call_missing, "double", "the call on line 2 is missing argument 'value'"),
+        (call_too_many, "double", "the call on line 2 passes too many arguments"),
+        (call_starred, "double", "the call on line 2 passes * or ** arguments"),
+        (
+            call_unexpected,
+            "double",
+            "the call on line 2 passes unexpected argument 'value'",
+        ),
+        (
+            call_unexpected_in_expression,
+            "double",
+            "the call on line 2 passes unexpected argument 'value'",
+        ),
+        (
+            call_with_default,
+            "with_default",
+            "the call on line 2 uses the default for 'items', which isn't a"
+            + " constant",
+        ),
+    ],
+)
+def test_unsafe(caller, callee, problem):
+    with pytest.raises(ValueError) as excinfo:
+        patchy.inline(caller, callee)
+
+    assert str(excinfo.value) == (
+        f"Cannot inline '{callee}' into '{caller.__name__}': {problem}."
+    )
+
+
+def test_unsafe_shadowed_global():
+    def sample(x: int) -> int:
+        LIMIT = 5
+        return scale(x) + LIMIT
+
+    with pytest.raises(ValueError) as excinfo:
+        patchy.inline(sample, "scale")
+
+    assert str(excinfo.value) == (
+        "Cannot inline 'scale' into 'sample': it uses 'LIMIT', which refers to"
+        + " something else in 'sample'."
+    )
+    assert sample(1) == 7
+
+
+def test_unsafe_shadowed_callee():
+    def sample(x: int) -> int:
+        double = abs
+        return double(x)
+
+    with pytest.raises(ValueError) as excinfo:
+        patchy.inline(sample, "double")
+
+    assert str(excinfo.value) == (
+        "Cannot inline 'double' into 'sample': 'sample' has a local named 'double'."
+    )
+    assert sample(-1) == 1
+
+
+def test_unsafe_statements_in_expression():
+    def sample(x: int) -> int:
+        return scale(x) + 1
+
+    with pytest.raises(ValueError) as excinfo:
+        patchy.inline(sample, "scale")
+
+    assert str(excinfo.value) == (
+        "Cannot inline 'scale' into 'sample': the call on line 2 isn't a whole"
+        + " statement, which it must be for a function with more than a return"
+        + " statement."
+    )
+    assert sample(1) == 3
+
+
+def test_unsafe_argument_in_expression():
+    def sample(x: int) -> int:
+        return double(x + 1) + 1
+
+    with pytest.raises(ValueError) as excinfo:
+        patchy.inline(sample, "double")
+
+    assert str(excinfo.value) == (
+        "Cannot inline 'double' into 'sample': the call on line 2 isn't a whole"
+        + " statement, which it must be to pass values other than local names or"
+        + " constants."
+    )
+    assert sample(1) == 5
@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+import sys
+from collections.abc import Iterator
+
+import pytest
+
+import patchy
+import patchy.instrumentation
+
+PATCH_TEXT = """\
+    @@ -1,2 +1,2 @@
+     def sample() -> int:
+    -    return 1
+    +    return 2
+    """
+
+
+@pytest.fixture(autouse=True)
+def disable():
+    yield
+    patchy.disable_instrumentation()
+    patchy.instrumentation_snapshot(reset=True)
+
+
+def sample_name(func: object) -> str:
+    return f"{__name__}.{func.__qualname__}"  # type: ignore [attr-defined]
+
+
+def test_disabled():
+    def sample() -> int:
+        return 1
+
+    assert sample() == 1
+    patchy.patch(sample, PATCH_TEXT)
+    sample()
+
+    assert patchy.instrumentation_snapshot() == {}
+
+
+def test_enabled():
+    def sample() -> int:
+        return 1
+
+    def unpatched() -> int:
+        return 1
+
+    assert sample() == 1
+    patchy.patch(sample, PATCH_TEXT)
+    patchy.enable_instrumentation()
+    patchy.enable_instrumentation()
+
+    assert sample() == 2
+    assert sample() == 2
+    unpatched()
+
+    snapshot = patchy.instrumentation_snapshot()
+    assert list(snapshot) == [sample_name(sample)]
+    assert snapshot[sample_name(sample)]["calls"] == 2
+    assert snapshot[sample_name(sample)]["total_time"] > 0
+
+
+def test_patched_while_enabled():
+    def sample() -> int:
+        return 1
+
+    patchy.enable_instrumentation()
+    sample()
+    patchy.patch(sample, PATCH_TEXT)
+    sample()
+    patchy.unpatch(sample, PATCH_TEXT)
+    sample()
+
+    snapshot = patchy.instrumentation_snapshot()
+    assert snapshot[sample_name(sample)]["calls"] == 1
+
+
+def test_exception():
+    def sample() -> int:
+        raise ValueError(1)
+
+    with pytest.raises(ValueError):
+        sample()
+    patchy.patch(
+        sample,
+        """\
+        @@ -2,1 +2,1 @@
+        -    raise ValueError(1)
+        +    raise ValueError(2)
+        """,
+    )
+    patchy.enable_instrumentation()
+    with pytest.raises(ValueError):
+        sample()
+
+    snapshot = patchy.instrumentation_snapshot()
+    assert snapshot[sample_name(sample)]["calls"] == 1
+    assert patchy.instrumentation._stack() == []
+
+
+def test_generator():
+    def sample() -> Iterator[int]:
+        yield 1
+        yield 2
+
+    assert list(sample()) == [1, 2]
+    patchy.patch(
+        sample,
+        """\
+        @@ -3,1 +3,1 @@
+        -    yield 2
+        +    yield 3
+        """,
+    )
+    patchy.enable_instrumentation()
+    assert list(sample()) == [1, 3]
+
+    snapshot = patchy.instrumentation_snapshot()
+    assert snapshot[sample_name(sample)]["calls"] == 1
+    assert patchy.instrumentation._stack() == []
+
+
+def test_call_racing_untrack():
+    def sample() -> int:
+        return 1
+
+    # As if the code was untracked between its event firing and the callback
+    patchy.instrumentation._enter(sample.__code__, True)
+    patchy.instrumentation._exit(sample.__code__)
+
+    assert patchy.instrumentation_snapshot() == {}
+    assert patchy.instrumentation._stack() == []
+
+
+def test_snapshot_reset():
+    def sample() -> int:
+        return 1
+
+    assert sample() == 1
+    patchy.patch(sample, PATCH_TEXT)
+    patchy.enable_instrumentation()
+    sample()
+
+    assert len(patchy.instrumentation_snapshot(reset=True)) == 1
+    assert patchy.instrumentation_snapshot() == {}
+
+
+def test_disable():
+    def sample() -> int:
+        return 1
+
+    assert sample() == 1
+    patchy.patch(sample, PATCH_TEXT)
+    patchy.enable_instrumentation()
+    patchy.disable_instrumentation()
+    patchy.disable_instrumentation()
+    sample()
+
+    assert patchy.instrumentation_snapshot() == {}
+    assert patchy.instrumentation._names == {}
+
+
+def test_enable_skips_code_restored_elsewhere():
+    def sample() -> int:
+        return 1
+
+    original = sample.__code__
+    patchy.patch(sample, PATCH_TEXT)
+    sample.__code__ = original
+    patchy.enable_instrumentation()
+
+    assert sample() == 1
+    assert patchy.instrumentation_snapshot() == {}
+
+
+def test_unpatch_all_while_enabled():
+    def sample() -> int:
+        return 1
+
+    assert sample() == 1
+    patchy.patch(sample, PATCH_TEXT)
+    patchy.enable_instrumentation()
+    patchy.unpatch_all()
+    sample()
+
+    assert patchy.instrumentation_snapshot() == {}
+
+
+@pytest.mark.skipif(sys.version_info >= (3, 12), reason="uses sys.monitoring")
+def test_profile_fallback_chains_previous():
+    events = []
+
+    def previous(frame, event, arg):  # pragma: no cover
+        events.append(event)
+
+    def sample() -> int:
+        return 1
+
+    assert sample() == 1
+    patchy.patch(sample, PATCH_TEXT)
+    sys.setprofile(previous)
+    try:
+        patchy.enable_instrumentation()
+        sample()
+        patchy.disable_instrumentation()
+        assert sys.getprofile() is previous
+    finally:
+        sys.setprofile(None)
+
+    assert "call" in events
+    assert patchy.instrumentation_snapshot()[sample_name(sample)]["calls"] == 1
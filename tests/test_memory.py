@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import inspect
+import linecache
+from collections.abc import Callable
+from textwrap import dedent
+from typing import Any
+
+import pytest
+
+import patchy.api
+
+PATCH_TEXT = """\
+    @@ -1,2 +1,2 @@
+     def sample() -> int:
+    -    return 1
+    +    return 2
+    """
+
+
+@pytest.fixture
+def lean_mode():
+    patchy.set_lean_mode(True)
+    yield
+    patchy.set_lean_mode(False)
+
+
+def make_big_function() -> Callable[..., Any]:
+    lines = ["def sample() -> int:", "    return 1"]
+    lines += [f"    x{i} = {i}  # some padding to compress" for i in range(200)]
+    namespace: dict[str, Any] = {}
+    source = "\n".join(lines) + "\n"
+    exec(source, namespace)
+    sample: Callable[..., Any] = namespace["sample"]
+    patchy.replace(sample, None, source)
+    return sample
+
+
+def test_lean_mode_round_trip(lean_mode):
+    def sample() -> int:
+        return 1
+
+    patchy.patch(sample, PATCH_TEXT)
+
+    assert isinstance(patchy.api._source_map[sample], bytes)
+    assert patchy.api._get_source(sample) == dedent(
+        """\
+        def sample() -> int:
+            return 2
+        """
+    )
+    patchy.unpatch(sample, PATCH_TEXT)
+    assert sample() == 1
+
+
+def test_lean_mode_toggle_converts_existing():
+    def sample() -> int:
+        return 1
+
+    assert sample() == 1
+
+    patchy.patch(sample, PATCH_TEXT)
+    patchy.set_lean_mode(True)
+    try:
+        assert isinstance(patchy.api._source_map[sample], bytes)
+        assert isinstance(patchy.api._registry[sample].history[0].source, bytes)
+    finally:
+        patchy.set_lean_mode(False)
+
+    assert isinstance(patchy.api._source_map[sample], str)
+    assert isinstance(patchy.api._registry[sample].history[0].source, str)
+
+
+def test_memory_report_empty():
+    assert patchy.memory_report() == {
+        "functions": 0,
+        "source_map_bytes": 0,
+        "history_bytes": 0,
+        "patching_cache_bytes": 0,
+        "linecache_bytes": 0,
+        "total_bytes": 0,
+    }
+
+
+def test_memory_report():
+    def sample() -> int:
+        return 1
+
+    assert sample() == 1
+
+    patchy.patch(sample, PATCH_TEXT)
+
+    report = patchy.memory_report()
+    assert report["functions"] == 1
+    assert report["source_map_bytes"] > 0
+    assert report["history_bytes"] > 0
+    assert report["patching_cache_bytes"] > 0
+    assert report["linecache_bytes"] > 0
+    assert report["total_bytes"] == (
+        report["source_map_bytes"]
+        + report["history_bytes"]
+        + report["patching_cache_bytes"]
+        + report["linecache_bytes"]
+    )
+
+
+def test_lean_mode_toggle_recaches_lines():
+    sample = make_big_function()
+    patchy.set_lean_mode(True)
+    try:
+        lines = linecache.getlines(sample.__code__.co_filename)
+        assert isinstance(lines, patchy.api._PatchedLines)
+        assert isinstance(lines.stored, bytes)
+    finally:
+        patchy.set_lean_mode(False)
+
+
+def test_lean_mode_toggle_skips_code_changed_elsewhere():
+    def sample() -> int:
+        return 1
+
+    assert sample() == 1
+    original_code = sample.__code__
+    patchy.patch(sample, PATCH_TEXT)
+    filename = sample.__code__.co_filename
+    sample.__code__ = original_code
+    linecache.cache.pop(filename)
+
+    patchy.set_lean_mode(True)
+    patchy.set_lean_mode(False)
+
+    assert filename not in linecache.cache
+
+
+def test_memory_report_lines_cleared():
+    make_big_function()
+    linecache.clearcache()
+
+    assert patchy.memory_report()["linecache_bytes"] == 0
+
+
+def test_memory_report_lines_read():
+    sample = make_big_function()
+    unread = patchy.memory_report()["linecache_bytes"]
+
+    inspect.getsource(sample)
+
+    assert patchy.memory_report()["linecache_bytes"] > unread
+
+
+def test_line_cache_unpacked_when_read(lean_mode):
+    sample = make_big_function()
+    code = sample.__code__
+    lines = linecache.getlines(code.co_filename)
+    assert isinstance(lines, patchy.api._PatchedLines)
+    assert lines.lines is None
+
+    assert linecache.getline(code.co_filename, code.co_firstlineno + 1) == (
+        "    return 1\n"
+    )
+    assert len(lines) == code.co_firstlineno + 201
+
+
+def test_memory_report_lean_smaller():
+    make_big_function()
+    normal = patchy.memory_report()["source_map_bytes"]
+    patchy.set_lean_mode(True)
+    try:
+        lean = patchy.memory_report()["source_map_bytes"]
+    finally:
+        patchy.set_lean_mode(False)
+
+    assert lean < normal / 2
+
+
+def test_memory_report_lean_patching_cache_smaller(lean_mode):
+    sample = make_big_function()
+    patchy.patch(
+        sample,
+        """\
+        @@ -1,3 +1,3 @@
+         def sample() -> int:
+        -    return 1
+        +    return 2
+             x0 = 0  # some padding to compress
+        """,
+    )
+    assert sample() == 2
+
+    size = patchy.memory_report()["patching_cache_bytes"]
+
+    assert 0 < size < len(patchy.api._get_source(sample)) / 2
@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+import sys
+from collections.abc import Callable
+
+import pytest
+
+import patchy
+
+PATCH_TEXT = """\
+    @@ -1,5 +1,5 @@
+     def sample() -> int:
+         "Docstring."
+         value = 1
+         assert value == 2
+    -    return value  # pragma: no cover
+    +    return value + 1
+    """
+
+
+@pytest.fixture(autouse=True)
+def reset_level():
+    yield
+    patchy.set_optimize_level(-1)
+
+
+def make_sample() -> Callable[[], int]:
+    def sample() -> int:
+        "Docstring."
+        value = 1
+        assert value == 2
+        return value  # pragma: no cover
+
+    return sample
+
+
+@pytest.mark.skipif(sys.flags.optimize != 0, reason="Needs asserts enabled")
+def test_default_inherits_interpreter():
+    sample = make_sample()
+    with pytest.raises(AssertionError):
+        sample()
+
+    patchy.patch(sample, PATCH_TEXT)
+
+    with pytest.raises(AssertionError):
+        sample()
+    assert "Docstring." in sample.__code__.co_consts
+
+
+def test_patch_optimize_0():
+    sample = make_sample()
+
+    patchy.patch(sample, PATCH_TEXT, optimize=0)
+
+    with pytest.raises(AssertionError):
+        sample()
+
+
+def test_patch_optimize_1():
+    sample = make_sample()
+
+    patchy.patch(sample, PATCH_TEXT, optimize=1)
+
+    assert sample() == 2
+    assert "Docstring." in sample.__code__.co_consts
+
+
+def test_patch_optimize_2():
+    sample = make_sample()
+
+    patchy.patch(sample, PATCH_TEXT, optimize=2)
+
+    assert sample() == 2
+    assert "Docstring." not in sample.__code__.co_consts
+
+
+def test_set_optimize_level():
+    sample = make_sample()
+    patchy.set_optimize_level(2)
+
+    patchy.patch(sample, PATCH_TEXT)
+
+    assert sample() == 2
+    assert "Docstring." not in sample.__code__.co_consts
+
+
+def test_patch_overrides_level():
+    sample = make_sample()
+    patchy.set_optimize_level(2)
+
+    patchy.patch(sample, PATCH_TEXT, optimize=0)
+
+    with pytest.raises(AssertionError):
+        sample()
+
+
+def test_unpatch_optimize():
+    sample = make_sample()
+    # Replace the patched source so unpatching has to apply the patch in
+    # reverse, rather than restoring from history
+    patchy.replace(
+        sample,
+        None,
+        """\
+        def sample() -> int:
+            "Docstring."
+            value = 1
+            assert value == 2
+            return value + 1
+        """,
+    )
+
+    patchy.unpatch(sample, PATCH_TEXT, optimize=1)
+
+    assert sample() == 1
+
+
+def test_replace_optimize():
+    def sample() -> int:
+        return 1
+
+    assert sample() == 1
+
+    patchy.replace(
+        sample,
+        None,
+        """\
+        def sample() -> int:
+            value = 2
+            assert value == 1
+            return value
+        """,
+        optimize=1,
+    )
+
+    assert sample() == 2
+
+
+def test_patch_class_uses_level():
+    class Foo:
+        def method(self) -> int:
+            return 1
+
+    assert Foo().method() == 1
+
+    patchy.set_optimize_level(1)
+
+    patchy.patch_class(
+        Foo,
+        """\
+        @@ -1,3 +1,4 @@
+         class Foo:
+             def method(self) -> int:
+        +        assert self is None
+                 return 1
+        """,
+    )
+
+    assert Foo().method() == 1
+
+
+def test_patch_class_optimize():
+    class Foo:
+        def method(self) -> int:
+            return 1
+
+    assert Foo().method() == 1
+    patch_text = """\
+        @@ -1,3 +1,4 @@
+         class Foo:
+             def method(self) -> int:
+        +        assert self is None
+                 return 1
+        """
+
+    patchy.patch_class(Foo, patch_text, optimize=1)
+
+    assert Foo().method() == 1
+    patchy.unpatch_class(Foo, patch_text, optimize=1)
+    assert Foo().method() == 1
+
+
+def test_patch_variants_optimize():
+    sample = make_sample()
+
+    patchy.patch_variants(sample, {">=0": PATCH_TEXT}, optimize=1)
+
+    assert sample() == 2
+
+
+def test_ensure_patched_optimize():
+    sample = make_sample()
+
+    assert patchy.ensure_patched(sample, PATCH_TEXT, optimize=1)
+
+    assert sample() == 2
+
+
+@pytest.mark.parametrize("level", [-2, 3])
+def test_set_optimize_level_invalid(level):
+    with pytest.raises(ValueError) as excinfo:
+        patchy.set_optimize_level(level)
+
+    assert str(excinfo.value) == (
+        f"Invalid optimize level {level}, must be -1, 0, 1, or 2."
+    )
+
+
+def test_patch_optimize_invalid():
+    sample = make_sample()
+
+    code = sample.__code__
+
+    with pytest.raises(ValueError):
+        patchy.patch(sample, PATCH_TEXT, optimize=5)
+
+    assert sample.__code__ is code
@@ -1,6 +1,9 @@
 from __future__ import annotations
 
+import inspect
+import linecache
 import sys
+import warnings
 from collections.abc import Callable
 from textwrap import dedent
 
@@ -165,6 +168,60 @@ def test_patch_invalid_hunk_2():
     assert sample(0) == 1
 
 
+def test_patch_offset_warns():
+    def sample() -> int:
+        x = 1
+        return x
+
+    assert sample() == 1
+
+    with pytest.warns(UserWarning) as record:
+        patchy.patch(
+            sample,
+            """\
+            @@ -1,1 +1,1 @@
+            -    return x
+            +    return x * 2
+            """,
+        )
+
+    assert sample() == 2
+    assert str(record[0].message) == (
+        "The patch for 'sample' only applied with an offset or fuzz. It can be"
+        + " rebased to apply exactly as:\n"
+        + dedent(
+            """\
+            @@ -1,3 +1,3 @@
+             def sample() -> int:
+                 x = 1
+            -    return x
+            +    return x * 2
+            """
+        )
+    )
+    assert record[0].filename == __file__
+
+
+def test_patch_exact_does_not_warn():
+    def sample() -> int:
+        return 1
+
+    assert sample() == 1
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        patchy.patch(
+            sample,
+            """\
+            @@ -2,1 +2,1 @@
+            -    return 1
+            +    return 2
+            """,
+        )
+
+    assert sample() == 2
+
+
 def test_patch_twice():
     def sample() -> int:
         return 1
@@ -474,17 +531,18 @@ def test_patch_freevars_nested():
 
     assert sample()() == "Chalk on toast"
 
-    patchy.patch(
-        sample,
-        """\
-        @@ -1,4 +1,4 @@
-         def sample() -> Callable[[], str]:
-        -    filling = "Chalk"
-        +    filling = "Cheese"
+    with pytest.warns(UserWarning, match="offset or fuzz"):
+        patchy.patch(
+            sample,
+            """\
+            @@ -1,4 +1,4 @@
+             def sample() -> Callable[[], str]:
+            -    filling = "Chalk"
+            +    filling = "Cheese"
 
-             def _inner_func():
-        """,
-    )
+                 def _inner_func():
+            """,
+        )
 
     assert sample()() == "Cheese on toast"
 
@@ -505,16 +563,17 @@ def test_patch_freevars_re_close():
     assert nice_filling() == "Cheese"
     assert sample() == "Chalk on toast"
 
-    patchy.patch(
-        sample,
-        """\
-        @@ -1,3 +1,3 @@
-         def sample() -> str:
-        -    filling = nasty_filling()
-        +    filling = nice_filling()
-             return filling + ' on toast'
-        """,
-    )
+    with pytest.warns(UserWarning, match="offset or fuzz"):
+        patchy.patch(
+            sample,
+            """\
+            @@ -1,3 +1,3 @@
+             def sample() -> str:
+            -    filling = nasty_filling()
+            +    filling = nice_filling()
+                 return filling + ' on toast'
+            """,
+        )
 
     assert sample() == "Cheese on toast"
 
@@ -574,6 +633,29 @@ def test_patch_instancemethod_mangled():
     assert Artist().method() == "Cheese on toast"
 
 
+def test_patch_instancemethod_private():
+    class Artist:
+        def __private(self) -> str:
+            return "Chalk"
+
+        def method(self) -> str:
+            return self.__private()
+
+    assert Artist().method() == "Chalk"
+
+    patchy.patch(
+        Artist._Artist__private,  # type: ignore [attr-defined]
+        """\
+        @@ -1,2 +1,2 @@
+         def __private(self) -> str:
+        -    return "Chalk"
+        +    return "Cheese"
+        """,
+    )
+
+    assert Artist().method() == "Cheese"
+
+
 def test_patch_instancemethod_mangled_freevars():
     def _Artist__mangled_name(v: str) -> str:
         return v + " on "
@@ -590,16 +672,17 @@ def test_patch_instancemethod_mangled_freevars():
 
     assert Artist().method() == "Chalk on toast"
 
-    patchy.patch(
-        Artist.method,
-        """\
-        @@ -1,3 +1,3 @@
-         def method(self) -> str:
-        -    filling = "Chalk"
-        +    filling = "Cheese"
-             return plain_name(__mangled_name(filling))  # noqa: F821
-        """,
-    )
+    with pytest.warns(UserWarning, match="offset or fuzz"):
+        patchy.patch(
+            Artist.method,
+            """\
+            @@ -1,3 +1,3 @@
+             def method(self) -> str:
+            -    filling = "Chalk"
+            +    filling = "Cheese"
+                 return plain_name(__mangled_name(filling))  # noqa: F821
+            """,
+        )
 
     assert Artist().method() == "Cheese on toast"
 
@@ -624,16 +707,17 @@ def test_patch_instancemethod_mangled_tabs(tmp_path):
     finally:
         sys.path.pop(0)
 
-    patchy.patch(
-        Artist.method,
-        """\
-        @@ -1,3 +1,3 @@
-         def method(self) -> str:
-        -\tfilling = 'Chalk'
-        +\tfilling = 'Cheese'
-        \treturn __mangled_name(filling)
-        """,
-    )
+    with pytest.warns(UserWarning, match="offset or fuzz"):
+        patchy.patch(
+            Artist.method,
+            """\
+            @@ -1,3 +1,3 @@
+             def method(self) -> str:
+            -\tfilling = 'Chalk'
+            +\tfilling = 'Cheese'
+            \treturn __mangled_name(filling)
+            """,
+        )
 
     assert Artist().method() == "Cheese on toast"
 
@@ -878,15 +962,16 @@ def test_patch_nonlocal_fails():
 
     assert sample() == 15 * 3
 
-    patchy.patch(
-        sample,
-        """\
-        @@ -2,3 +2,3 @@
-             nonlocal variab  # noqa: F824
-        -    multiple = 3
-        +    multiple = 4
-        """,
-    )
+    with pytest.warns(UserWarning, match="offset or fuzz"):
+        patchy.patch(
+            sample,
+            """\
+            @@ -2,3 +2,3 @@
+                 nonlocal variab  # noqa: F824
+            -    multiple = 3
+            +    multiple = 4
+            """,
+        )
 
     assert sample() == 15 * 4
 
@@ -951,3 +1036,218 @@ def test_patch_by_path_already_imported(tmp_path):
         sys.path.pop(0)
 
     assert Foo().sample() == 2
+
+
+def test_patch_filename_and_line_numbers():
+    def sample() -> int:
+        x = 1
+        raise ValueError(x)
+
+    with pytest.raises(ValueError):
+        sample()
+
+    original_code = sample.__code__
+
+    patchy.patch(
+        sample,
+        """\
+        @@ -1,3 +1,4 @@
+         def sample() -> int:
+        -    x = 1
+        +    x = 2
+        +    x += 1
+             raise ValueError(x)
+        """,
+    )
+
+    code = sample.__code__
+    assert code.co_filename.rpartition(":")[0] == (
+        f"{original_code.co_filename}#patchy:{sample.__qualname__}"
+    )
+    assert code.co_firstlineno == original_code.co_firstlineno
+    with pytest.raises(ValueError) as excinfo:
+        sample()
+    tb = excinfo.tb
+    while tb.tb_next is not None:
+        tb = tb.tb_next
+    assert tb.tb_lineno == original_code.co_firstlineno + 3
+    assert linecache.getline(code.co_filename, code.co_firstlineno + 3) == (
+        "    raise ValueError(x)\n"
+    )
+    assert inspect.getsource(sample) == dedent(
+        """\
+        def sample() -> int:
+            x = 2
+            x += 1
+            raise ValueError(x)
+        """
+    )
+
+
+def test_patch_line_cache_follows_history():
+    def sample() -> int:
+        return 1
+
+    assert sample() == 1
+
+    first_patch = """\
+        @@ -1,2 +1,2 @@
+         def sample() -> int:
+        -    return 1
+        +    return 2
+        """
+    second_patch = """\
+        @@ -1,2 +1,2 @@
+         def sample() -> int:
+        -    return 2
+        +    return 3
+        """
+    line = sample.__code__.co_firstlineno + 1
+    patchy.patch(sample, first_patch)
+    first_filename = sample.__code__.co_filename
+    patchy.patch(sample, second_patch)
+    second_filename = sample.__code__.co_filename
+    assert first_filename != second_filename
+    assert linecache.getline(second_filename, line) == "    return 3\n"
+    assert first_filename not in linecache.cache
+
+    patchy.unpatch(sample, second_patch)
+    assert linecache.getline(first_filename, line) == "    return 2\n"
+    assert second_filename not in linecache.cache
+
+    patchy.unpatch(sample, first_patch)
+    assert first_filename not in linecache.cache
+
+
+def make_sample(value: int) -> Callable[[], int]:
+    def sample() -> int:
+        return value
+
+    return sample
+
+
+def test_patch_line_cache_shared_qualname():
+    first = make_sample(1)
+    second = make_sample(2)
+    assert first() == 1
+    assert second() == 2
+    patch_text = """\
+        @@ -1,2 +1,2 @@
+         def sample() -> int:
+        -    return value
+        +    return value * {}
+        """
+    patchy.patch(first, patch_text.format(10))
+    patchy.patch(second, patch_text.format(20))
+    third = make_sample(3)
+    assert third() == 3
+    patchy.patch(third, patch_text.format(10))
+    assert first.__code__.co_filename != second.__code__.co_filename
+    assert first.__code__.co_filename == third.__code__.co_filename
+    line = first.__code__.co_firstlineno + 1
+
+    patchy.unpatch(first, patch_text.format(10))
+
+    assert linecache.getline(second.__code__.co_filename, line) == (
+        "    return value * 20\n"
+    )
+    assert linecache.getline(third.__code__.co_filename, line) == (
+        "    return value * 10\n"
+    )
+
+
+def test_patched_lines():
+    lines = patchy.api._PatchedLines("a\nb", 3)
+
+    assert len(lines) == 4
+    assert lines[0] == "\n"
+    assert lines[-1] == "b\n"
+    assert lines[2:] == ["a\n", "b\n"]
+    with pytest.raises(IndexError):
+        lines[4]
+
+
+def test_unpatch_all_keeps_line_cache_of_real_files():
+    def sample() -> int:
+        return 1
+
+    assert sample() == 1
+
+    original_code = sample.__code__
+    patchy.patch(
+        sample,
+        """\
+        @@ -1,2 +1,2 @@
+         def sample() -> int:
+        -    return 1
+        +    return 2
+        """,
+    )
+    # Code swapped back outside of patchy
+    sample.__code__ = original_code
+    filename = original_code.co_filename
+    assert linecache.getline(filename, original_code.co_firstlineno) != ""
+
+    patchy.unpatch_all()
+
+    assert filename in linecache.cache
+
+
+def test_patch_method_filename_and_line_numbers():
+    class Foo:
+        @staticmethod
+        def sample() -> int:
+            return 1
+
+    assert Foo.sample() == 1
+
+    original_code = Foo.sample.__code__
+
+    patchy.patch(
+        Foo.sample,
+        """\
+        @@ -2,2 +2,2 @@
+         def sample() -> int:
+        -    return 1
+        +    return 2
+        """,
+    )
+
+    code = Foo.sample.__code__
+    assert f"#patchy:{Foo.sample.__qualname__}:" in code.co_filename
+    assert code.co_firstlineno == original_code.co_firstlineno
+
+
+def test_patch_class_filename_and_line_numbers():
+    class Foo:
+        def first(self) -> int:
+            return 1
+
+        @staticmethod
+        def sample() -> int:
+            return 1
+
+    assert Foo().first() == 1
+    assert Foo.sample() == 1
+
+    original_code = Foo.sample.__code__
+
+    patchy.patch_class(
+        Foo,
+        """\
+        @@ -4,4 +4,5 @@
+
+             @staticmethod
+             def sample() -> int:
+        -        return 1
+        +        x = 2
+        +        return x
+        """,
+    )
+
+    code = Foo.sample.__code__
+    assert f"#patchy:{Foo.sample.__qualname__}:" in code.co_filename
+    assert code.co_firstlineno == original_code.co_firstlineno
+    assert linecache.getline(code.co_filename, code.co_firstlineno + 3) == (
+        "    return x\n"
+    )
@@ -0,0 +1,469 @@
+from __future__ import annotations
+
+import inspect
+import sys
+from textwrap import dedent
+
+import pytest
+
+import patchy.api
+
+
+def test_patch_class():
+    class Foo:
+        def __init__(self) -> None:
+            self.__value = 1
+
+        def sample(self) -> int:
+            return self.__value
+
+        @classmethod
+        def clsmethod(cls) -> int:
+            return 1
+
+        @staticmethod
+        def static() -> int:
+            return 1
+
+        def unchanged(self) -> int:
+            return 1
+
+    assert Foo().sample() == 1
+    assert Foo.clsmethod() == 1
+    assert Foo.static() == 1
+
+    unchanged_code = Foo.unchanged.__code__
+
+    patchy.patch_class(
+        Foo,
+        """\
+        @@ -3,15 +3,15 @@
+                 self.__value = 1
+
+             def sample(self) -> int:
+        -        return self.__value
+        +        return self.__value + 1
+
+             @classmethod
+             def clsmethod(cls) -> int:
+        -        return 1
+        +        return 2
+
+             @staticmethod
+             def static() -> int:
+        -        return 1
+        +        return 3
+
+             def unchanged(self) -> int:
+                 return 1
+        """,
+    )
+
+    assert Foo().sample() == 2
+    assert Foo.clsmethod() == 2
+    assert Foo.static() == 3
+    assert Foo().unchanged() == 1
+    assert Foo.unchanged.__code__ is unchanged_code
+    assert patchy.api._get_source(Foo.static) == dedent(
+        """\
+        @staticmethod
+        def static() -> int:
+            return 3
+        """
+    )
+
+
+def test_patch_class_offset_warning_points_at_caller():
+    class Foo:
+        def sample(self) -> int:
+            return 1
+
+    assert Foo().sample() == 1
+
+    with pytest.warns(UserWarning, match="offset or fuzz") as record:
+        patchy.patch_class(
+            Foo,
+            """\
+            @@ -1,1 +1,1 @@
+            -        return 1
+            +        return 2
+            """,
+        )
+
+    assert record[0].filename == __file__
+    assert Foo().sample() == 2
+
+
+def test_patch_class_super_and_freevars():
+    offset = 10
+
+    class Base:
+        def sample(self) -> int:
+            return 1
+
+    class Foo(Base):
+        def sample(self) -> int:
+            return super().sample() + offset
+
+    assert Foo().sample() == 11
+
+    patchy.patch_class(
+        Foo,
+        """\
+        @@ -1,3 +1,3 @@
+         class Foo(Base):
+             def sample(self) -> int:
+        -        return super().sample() + offset
+        +        return super().sample() + offset * 2
+        """,
+    )
+
+    assert Foo().sample() == 21
+
+
+def test_patch_class_dropped_freevar():
+    offset = 10
+
+    class Foo:
+        def sample(self) -> int:
+            return offset
+
+    assert Foo().sample() == 10
+
+    patchy.patch_class(
+        Foo,
+        """\
+        @@ -1,3 +1,3 @@
+         class Foo:
+             def sample(self) -> int:
+        -        return offset
+        +        return 5
+        """,
+    )
+
+    assert Foo().sample() == 5
+
+
+def test_patch_class_freevar_from_other_method():
+    offset = 10
+
+    class Foo:
+        def uses_offset(self) -> int:
+            return offset
+
+        def sample(self) -> int:
+            return 1
+
+    assert Foo().uses_offset() == 10
+    assert Foo().sample() == 1
+
+    patchy.patch_class(
+        Foo,
+        """\
+        @@ -2,5 +2,5 @@
+             def uses_offset(self) -> int:
+        -        return offset
+        +        return offset + 1
+
+             def sample(self) -> int:
+        -        return 1
+        +        return offset
+        """,
+    )
+
+    assert Foo().uses_offset() == 11
+    # Like patch(), closures can't gain new free variables
+    assert Foo.sample.__code__.co_freevars == ()
+    with pytest.raises(NameError):
+        Foo().sample()
+
+
+def test_patch_class_after_method_patch():
+    class Foo:
+        def first(self) -> int:
+            value = 10
+            return value
+
+        def second(self) -> int:
+            return 1
+
+    assert Foo().first() == 10
+    assert Foo().second() == 1
+    patchy.patch(
+        Foo.first,
+        """\
+        @@ -1,3 +1,3 @@
+         def first(self) -> int:
+             value = 10
+        -    return value
+        +    return 100
+        """,
+    )
+
+    with pytest.raises(ValueError) as excinfo:
+        patchy.patch_class(
+            Foo,
+            """\
+            @@ -1,7 +1,7 @@
+             class Foo:
+                 def first(self) -> int:
+            -        value = 10
+            +        value = 20
+                     return value
+
+                 def second(self) -> int:
+            -        return 1
+            +        return 2
+            """,
+        )
+
+    assert str(excinfo.value) == (
+        "Can't patch 'Foo.first' through its class, as it has been changed by"
+        + " other means, such as patch(). Undo those changes first."
+    )
+    assert Foo().first() == 100
+    assert Foo().second() == 1
+    assert Foo not in patchy.api._source_map
+
+
+def test_patch_class_twice():
+    class Foo:
+        def sample(self) -> int:
+            return 1
+
+    assert Foo().sample() == 1
+
+    patchy.patch_class(
+        Foo,
+        """\
+        @@ -2,2 +2,2 @@
+             def sample(self) -> int:
+        -        return 1
+        +        return 2
+        """,
+    )
+    patchy.patch_class(
+        Foo,
+        """\
+        @@ -2,2 +2,2 @@
+             def sample(self) -> int:
+        -        return 2
+        +        return 3
+        """,
+    )
+
+    assert Foo().sample() == 3
+
+
+def test_unpatch_class():
+    class Foo:
+        def sample(self) -> int:
+            return 1
+
+    original_code = Foo.sample.__code__
+    patch_text = """\
+        @@ -2,2 +2,2 @@
+             def sample(self) -> int:
+        -        return 1
+        +        return 2
+        """
+    patchy.patch_class(Foo, patch_text)
+    assert Foo().sample() == 2
+
+    patchy.unpatch_class(Foo, patch_text)
+
+    assert Foo().sample() == 1
+    assert Foo.sample.__code__ is original_code
+    assert Foo not in patchy.api._source_map
+
+
+def test_unpatch_class_reverse_diff():
+    class Foo:
+        def sample(self) -> int:
+            return 2
+
+    assert Foo().sample() == 2
+
+    patchy.unpatch_class(
+        Foo,
+        """\
+        @@ -2,2 +2,2 @@
+             def sample(self) -> int:
+        -        return 1
+        +        return 2
+        """,
+    )
+
+    assert Foo().sample() == 1
+    assert Foo in patchy.api._source_map
+
+
+def test_patch_class_non_method_change():
+    class Foo:
+        x = 1
+
+        def sample(self) -> int:  # pragma: no cover
+            return 1
+
+    with pytest.raises(ValueError) as excinfo:
+        patchy.patch_class(
+            Foo,
+            """\
+            @@ -1,4 +1,4 @@
+             class Foo:
+            -    x = 1
+            +    x = 2
+
+                 def sample(self) -> int:  # pragma: no cover
+            """,
+        )
+
+    assert str(excinfo.value) == (
+        "Patches to the class 'Foo' may only change the bodies of existing methods."
+    )
+
+
+def test_patch_class_decorator_change():
+    class Foo:
+        @staticmethod
+        def sample() -> int:  # pragma: no cover
+            return 1
+
+    with pytest.raises(ValueError) as excinfo:
+        patchy.patch_class(
+            Foo,
+            """\
+            @@ -1,3 +1,3 @@
+             class Foo:
+            -    @staticmethod
+            +    @classmethod
+                 def sample() -> int:  # pragma: no cover
+            """,
+        )
+
+    assert str(excinfo.value) == (
+        "Patches to the class 'Foo' may not change the decorators of 'sample'."
+    )
+
+
+def test_patch_class_property():
+    class Foo:
+        @property
+        def sample(self) -> int:  # pragma: no cover
+            return 1
+
+    with pytest.raises(ValueError) as excinfo:
+        patchy.patch_class(
+            Foo,
+            """\
+            @@ -3,2 +3,2 @@
+                 def sample(self) -> int:  # pragma: no cover
+            -        return 1
+            +        return 2
+            """,
+        )
+
+    assert str(excinfo.value) == "Can't patch 'Foo.sample', it's not a function."
+
+
+def test_patch_class_property_getter_with_setter():
+    class Foo:
+        @property
+        def sample(self) -> int:  # pragma: no cover
+            return 1
+
+        @sample.setter
+        def sample(self, value: int) -> None:  # pragma: no cover
+            pass
+
+    with pytest.raises(ValueError) as excinfo:
+        patchy.patch_class(
+            Foo,
+            """\
+            @@ -3,3 +3,3 @@
+                 def sample(self) -> int:  # pragma: no cover
+            -        return 1
+            +        return 2
+
+            """,
+        )
+
+    assert str(excinfo.value) == (
+        "Can't patch 'Foo.sample', it's defined more than once in the class."
+    )
+    assert Foo not in patchy.api._source_map
+
+
+def test_patch_class_redefined_method():
+    class Foo:
+        def sample(self) -> int:  # pragma: no cover
+            return 1
+
+        def sample(self) -> int:  # type: ignore [no-redef]  # noqa: F811
+            return 2
+
+    patchy.patch_class(
+        Foo,
+        """\
+        @@ -5,2 +5,2 @@
+             def sample(self) -> int:  # type: ignore [no-redef]  # noqa: F811
+        -        return 2
+        +        return 3
+        """,
+    )
+
+    assert Foo().sample() == 3
+
+
+def test_patch_class_not_class(monkeypatch):
+    class Foo:
+        pass
+
+    monkeypatch.setattr(inspect, "getsource", lambda obj: "x = 1\n")
+
+    with pytest.raises(ValueError) as excinfo:
+        patchy.patch_class(
+            Foo,
+            """\
+            @@ -1,1 +1,1 @@
+            -x = 1
+            +x = 2
+            """,
+        )
+
+    assert str(excinfo.value) == "The source of 'Foo' is not a class definition."
+
+
+def test_patch_class_by_path(tmp_path):
+    (tmp_path / "patch_class_mod.py").write_text(
+        dedent(
+            """\
+            class Foo:
+                def __sample(self) -> int:
+                    return 1
+
+                def sample(self) -> int:
+                    return self.__sample()
+            """
+        )
+    )
+    sys.path.insert(0, str(tmp_path))
+    try:
+        patchy.patch_class(
+            "patch_class_mod.Foo",
+            """\
+            @@ -1,5 +1,5 @@
+             class Foo:
+                 def __sample(self) -> int:
+            -        return 1
+            +        return 2
+
+                 def sample(self) -> int:
+            """,
+        )
+        from patch_class_mod import Foo  # type: ignore [import-not-found]
+    finally:
+        sys.path.pop(0)
+        sys.modules.pop("patch_class_mod", None)
+
+    assert Foo().sample() == 2
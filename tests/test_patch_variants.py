@@ -0,0 +1,281 @@
+from __future__ import annotations
+
+import hashlib
+from textwrap import dedent
+
+import pytest
+
+import patchy
+import patchy.api
+from patchy.fingerprint import version_matches
+
+V1 = """\
+    @@ -1,2 +1,2 @@
+     def sample() -> int:
+    -    return 1
+    +    return 10
+    """
+
+V2 = """\
+    @@ -1,2 +1,2 @@
+     def sample() -> int:
+    -    return 2
+    +    return 20
+    """
+
+
+def source_key(source: str) -> str:
+    return "sha256:" + hashlib.sha256(dedent(source).encode()).hexdigest()
+
+
+def test_select_by_source_hash(runs):
+    def sample() -> int:
+        return 1
+
+    assert sample() == 1
+
+    key = source_key(
+        """\
+        def sample() -> int:
+            return 1
+        """
+    )
+
+    result = patchy.patch_variants(sample, {">=0": V2, key: V1})
+
+    assert result == key
+    assert sample() == 10
+    assert len(runs) == 1
+
+
+def test_select_by_source_hash_skips_distribution(monkeypatch):
+    def sample() -> int:
+        return 1
+
+    assert sample() == 1
+
+    def fail(module):
+        raise AssertionError("Should not be called")
+
+    monkeypatch.setattr(patchy.api, "distribution_version", fail)
+    key = source_key(
+        """\
+        def sample() -> int:
+            return 1
+        """
+    )
+
+    result = patchy.patch_variants(sample, {key: V1})
+
+    assert result == key
+    assert sample() == 10
+
+
+def test_offset_warning_points_at_caller():
+    def sample() -> int:
+        return 1
+
+    assert sample() == 1
+
+    offset = """\
+        @@ -1,1 +1,1 @@
+        -    return 1
+        +    return 10
+        """
+    with pytest.warns(UserWarning, match="offset or fuzz") as record:
+        patchy.patch_variants(sample, {">=0": offset})
+
+    assert record[0].filename == __file__
+    assert sample() == 10
+
+
+def test_select_by_version(monkeypatch, runs):
+    def sample() -> int:
+        return 2
+
+    assert sample() == 2
+
+    monkeypatch.setattr(patchy.api, "distribution_version", lambda m: "lib==2.1.0")
+
+    result = patchy.patch_variants(sample, {"<2": V1, ">=2,<3": V2})
+
+    assert result == ">=2,<3"
+    assert sample() == 20
+    assert len(runs) == 1
+
+
+def test_fallback_to_other_variants(monkeypatch, runs):
+    def sample() -> int:
+        return 2
+
+    assert sample() == 2
+
+    monkeypatch.setattr(patchy.api, "distribution_version", lambda m: "lib==1.0")
+
+    result = patchy.patch_variants(sample, {"<2": V1, ">=2": V2})
+
+    assert result == ">=2"
+    assert sample() == 20
+    # The wrong variant is rejected without running `patch`
+    assert len(runs) == 1
+
+
+def test_fallback_without_distribution(runs):
+    def sample() -> int:
+        return 2
+
+    assert sample() == 2
+
+    result = patchy.patch_variants(sample, {"==1.*": V1, "==2.*": V2})
+
+    assert result == "==2.*"
+    assert sample() == 20
+
+
+def test_variant_can_be_unpatched():
+    def sample() -> int:
+        return 2
+
+    assert sample() == 2
+
+    patchy.patch_variants(sample, {"<2": V1, ">=2": V2})
+
+    patchy.unpatch(sample, V2)
+    assert sample() == 2
+
+
+def test_none_apply(runs):
+    def sample() -> int:
+        return 3
+
+    with pytest.raises(ValueError) as excinfo:
+        patchy.patch_variants(sample, {"<2": V1, ">=2": V2})
+
+    assert str(excinfo.value) == (
+        "None of the patch variants could be applied to 'sample'. Tried: <2, >=2."
+    )
+    assert runs == []
+    assert sample() == 3
+
+
+def test_quick_fail_after_running_patch(runs):
+    def sample() -> int:
+        return 1
+
+    assert sample() == 1
+
+    # Removed lines are present, but context doesn't match
+    variant = """\
+        @@ -1,3 +1,3 @@
+         def nope():
+         def other():
+         def sample():
+        -    return 1
+        +    return 10
+        """
+
+    with pytest.raises(ValueError) as excinfo:
+        patchy.patch_variants(sample, {"==1": variant})
+
+    assert "Tried: ==1." in str(excinfo.value)
+    assert len(runs) == 1
+
+
+def test_invalid_key():
+    def sample() -> int:
+        return 1
+
+    assert sample() == 1
+
+    with pytest.raises(ValueError) as excinfo:
+        patchy.patch_variants(sample, {"lots": V1})
+
+    assert str(excinfo.value) == "Invalid version specifier 'lots'."
+
+
+def test_by_path():
+    assert module_sample() == 1
+
+    result = patchy.patch_variants(
+        "tests.test_patch_variants.module_sample",
+        {
+            ">=0": """\
+                @@ -1,2 +1,2 @@
+                 def module_sample() -> int:
+                -    return 1
+                +    return 5
+                """
+        },
+    )
+
+    assert result == ">=0"
+    assert module_sample() == 5
+
+
+def module_sample() -> int:
+    return 1
+
+
+@pytest.mark.parametrize(
+    "version,specifier,expected",
+    [
+        ("4.2.1", "==4.2.1", True),
+        ("4.2", "==4.2.0", True),
+        ("4.2.1", "!=4.2.1", False),
+        ("4.2.1", ">=4.2,<5", True),
+        ("5.0", ">=4.2,<5", False),
+        ("4.1.9", ">=4.2,<5", False),
+        ("4.2.1", ">4.2", True),
+        ("4.2.1", "<=4.2", False),
+        ("4.2.7", "==4.2.*", True),
+        ("4.3.0", "==4.2.*", False),
+        ("4.3.0", "!=4.2.*", True),
+        ("4.2.1rc1", "==4.2.1", False),
+        ("4.2.dev1", "==4.2", False),
+        ("4.2.1+local", "==4.2.1", True),
+        ("5.0rc1", "<5", False),
+        ("5.0rc1", "<=5", True),
+        ("5.0.dev1", "<5", False),
+        ("4.9rc1", "<5", True),
+        ("5.0rc1", "<5.0rc2", True),
+        ("5.0rc1", ">=5", False),
+        ("5.0rc1", ">=5.0b2,<5.0rc2", True),
+        ("5.0.dev1", "<5.0a1", True),
+        ("5.0a1.dev2", "<5.0a1", True),
+        ("5.0.post1", ">5", False),
+        ("5.0.post1", ">=5", True),
+        ("5.0.1", ">5", True),
+        ("5.0.post2", ">5.0.post1", True),
+        ("5.0-1", "==5.0.post1", True),
+        ("5.0.post1.dev1", "<5.0.post1", False),
+        ("5.0.post1.dev1", "<=5.0.post1", True),
+        ("5.0.post1.dev1", ">5", False),
+        ("5.0.post1", ">5.0rc1", True),
+        ("5.0.post1", ">5.0.dev1", True),
+        ("5.0rc1.post1", ">5.0rc1", False),
+        ("5.0rc1.post1", ">5.0rc1.dev1", True),
+        ("5.0rc1", "<5.0.post1", True),
+        ("5.0.dev1", "<5.0.post1", True),
+        ("5.0rc1.post1", "<5.0.post1", True),
+        ("5.0alpha1", "==5.0a1", True),
+        ("5.0-rc.1", "==5.0rc1", True),
+        ("5.0.1rc1", "==5.0.*", True),
+        ("4.2.1rc1", "~=4.2.0", True),
+        ("unknown", "<0.1", True),
+        ("4.2.5", "~=4.2.1", True),
+        ("4.3.0", "~=4.2.1", False),
+        ("4.2.0", "~=4.2.1", False),
+        ("4.9", "~=4.2", True),
+        ("5.0", "~=4.2", False),
+    ],
+)
+def test_version_matches(version, specifier, expected):
+    assert version_matches(version, specifier) is expected
+
+
+@pytest.mark.parametrize("specifier", ["4.2", ">=x", "~=4", ">=4.*", ">=4,"])
+def test_version_matches_invalid(specifier):
+    with pytest.raises(ValueError) as excinfo:
+        version_matches("4.2", specifier)
+
+    assert str(excinfo.value) == f"Invalid version specifier {specifier!r}."
@@ -0,0 +1,258 @@
+from __future__ import annotations
+
+from textwrap import dedent
+
+import pytest
+
+import patchy
+import patchy.api
+from patchy import pytest_plugin
+
+pytest_plugins = ["pytester"]
+
+
+@pytest.fixture
+def run(pytester):
+    pytester.makepyfile(
+        example=dedent(
+            """\
+            def sample() -> int:
+                return 1
+            """
+        )
+    )
+
+    def run(source: str) -> pytest.RunResult:
+        pytester.makepyfile(test_it=dedent(source))
+        # Block the entry point, in case patchy is installed
+        result: pytest.RunResult = pytester.runpytest_inprocess(
+            "-p", "no:patchy", "-p", "no:randomly", plugins=[pytest_plugin]
+        )
+        return result
+
+    return run
+
+
+TESTS = '''\
+import example
+
+PATCH = """\\
+@@ -1,2 +1,2 @@
+ def sample() -> int:
+-    return 1
++    return 2
+"""
+
+
+def test_one(patchy):
+    patchy.patch(example.sample, PATCH)
+    assert example.sample() == 2
+
+
+def test_two(patchy):
+    assert example.sample() == 1
+    patchy.patch("example.sample", PATCH)
+    assert example.sample() == 2
+
+
+def test_three():
+    assert example.sample() == 1
+'''
+
+
+def test_patch(run):
+    result = run(TESTS)
+
+    result.assert_outcomes(passed=3)
+    result.stdout.fnmatch_lines(["patchy: 2 patches applied (1 compiled) in *s"])
+
+
+def test_unpatch(run):
+    result = run(
+        '''\
+        import example
+
+        PATCH = """\\
+        @@ -1,2 +1,2 @@
+         def sample() -> int:
+        -    return 1
+        +    return 2
+        """
+
+
+        def test_it(patchy):
+            patchy.patch(example.sample, PATCH)
+            patchy.unpatch(example.sample, PATCH)
+            assert example.sample() == 1
+            patchy.patch(example.sample, PATCH)
+            assert example.sample() == 2
+        '''
+    )
+
+    result.assert_outcomes(passed=1)
+    result.stdout.fnmatch_lines(["patchy: 3 patches applied (1 compiled) in *s"])
+
+
+def test_unpatch_compiled(run):
+    result = run(
+        '''\
+        import patchy as patchy_module
+
+        import example
+
+        PATCH = """\\
+        @@ -1,2 +1,2 @@
+         def sample() -> int:
+        -    return 1
+        +    return 2
+        """
+
+
+        def test_one(patchy):
+            patchy_module.patch(example.sample, PATCH)
+            patchy.unpatch(example.sample, PATCH)
+            assert example.sample() == 1
+
+
+        def test_two(patchy):
+            patchy.patch(example.sample, PATCH)
+            patchy_module.replace(
+                example.sample,
+                None,
+                "def sample() -> int:\\n    return 2\\n",
+            )
+            patchy.unpatch(example.sample, PATCH)
+            assert example.sample() == 1
+        '''
+    )
+
+    result.assert_outcomes(passed=2)
+    result.stdout.fnmatch_lines(["patchy: 3 patches applied (2 compiled) in *s"])
+
+
+def test_restores_other_changes(run):
+    result = run(
+        '''\
+        import patchy as patchy_module
+
+        import example
+
+        PATCH = """\\
+        @@ -1,2 +1,2 @@
+         def sample() -> int:
+        -    return 1
+        +    return 2
+        """
+
+
+        def test_one(patchy):
+            patchy_module.patch(example.sample, PATCH)
+            assert example.sample() == 2
+
+
+        def test_two():
+            assert example.sample() == 1
+            assert patchy_module.patched() == []
+        '''
+    )
+
+    result.assert_outcomes(passed=2)
+    result.stdout.no_fnmatch_line("patchy: *")
+
+
+def test_restores_earlier_patches(run):
+    result = run(
+        '''\
+        import patchy as patchy_module
+
+        import example
+
+        PATCH = """\\
+        @@ -1,2 +1,2 @@
+         def sample() -> int:
+        -    return 1
+        +    return 2
+        """
+
+        PATCH_2 = """\\
+        @@ -1,2 +1,2 @@
+         def sample() -> int:
+        -    return 2
+        +    return 3
+        """
+
+        patchy_module.patch(example.sample, PATCH)
+
+
+        def test_one(patchy):
+            patchy.patch(example.sample, PATCH_2)
+            assert example.sample() == 3
+            patchy_module.unpatch_all()
+            assert example.sample() == 1
+
+
+        def test_two():
+            assert example.sample() == 2
+            assert patchy_module.patched() == [example.sample]
+        '''
+    )
+
+    result.assert_outcomes(passed=2)
+
+
+def sample() -> int:
+    return 1
+
+
+def test_snapshot_restore():
+    assert sample() == 1
+
+    patchy.patch(
+        sample,
+        """\
+        @@ -1,2 +1,2 @@
+         def sample() -> int:
+        -    return 1
+        +    return 2
+        """,
+    )
+    snapshot = patchy.api._snapshot()
+    patchy.patch(
+        sample,
+        """\
+        @@ -1,2 +1,2 @@
+         def sample() -> int:
+        -    return 2
+        +    return 3
+        """,
+    )
+
+    patchy.api._restore(snapshot)
+
+    assert sample() == 2
+    assert patchy.api._get_source(sample) == dedent(
+        """\
+        def sample() -> int:
+            return 2
+        """
+    )
+    assert len(patchy.api._registry[sample].history) == 1
+
+
+def test_snapshot_restore_unchanged():
+    patchy.patch(
+        sample,
+        """\
+        @@ -1,2 +1,2 @@
+         def sample() -> int:
+        -    return 1
+        +    return 2
+        """,
+    )
+    code = sample.__code__
+    snapshot = patchy.api._snapshot()
+
+    patchy.api._restore(snapshot)
+
+    assert sample.__code__ is code
+    assert len(patchy.api._registry[sample].history) == 1
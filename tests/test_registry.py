@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+from textwrap import dedent
+
+import patchy.api
+
+PATCH_TEXT = """\
+    @@ -1,2 +1,2 @@
+     def sample() -> int:
+    -    return 1
+    +    return 2
+    """
+
+
+def test_patched_empty():
+    assert patchy.patched() == []
+
+
+def test_patched():
+    def sample() -> int:
+        return 1
+
+    assert sample() == 1
+
+    patchy.patch(sample, PATCH_TEXT)
+
+    assert patchy.patched() == [sample]
+    assert [entry.patch_text for entry in patchy.api._registry[sample].history] == [
+        dedent(PATCH_TEXT)
+    ]
+
+
+def test_patched_method():
+    class Foo:
+        @classmethod
+        def sample(cls) -> int:
+            return 1
+
+    assert Foo.sample() == 1
+
+    patchy.patch(
+        Foo.sample,
+        """\
+        @@ -3,1 +3,1 @@
+        -    return 1
+        +    return 2
+        """,
+    )
+
+    assert patchy.patched() == [Foo.__dict__["sample"].__func__]
+
+
+def test_unpatch_all():
+    def sample() -> int:
+        return 1
+
+    def other() -> int:
+        return 1
+
+    original_code = sample.__code__
+    patchy.patch(sample, PATCH_TEXT)
+    patchy.patch(
+        sample,
+        """\
+        @@ -2,1 +2,1 @@
+        -    return 2
+        +    return 3
+        """,
+    )
+    patchy.replace(other, None, "def other() -> int:\n    return 5\n")
+    assert sample() == 3
+    assert other() == 5
+
+    patchy.unpatch_all()
+
+    assert sample.__code__ is original_code
+    assert sample() == 1
+    assert other() == 1
+    assert patchy.patched() == []
+    assert sample not in patchy.api._source_map
+
+
+def test_unpatch_all_no_patch_command(monkeypatch):
+    def sample() -> int:
+        return 1
+
+    patchy.patch(sample, PATCH_TEXT)
+    monkeypatch.setattr(patchy.api, "_apply_patch", None)
+
+    patchy.unpatch_all()
+
+    assert sample() == 1
@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+import importlib
+import importlib.machinery
+import sys
+import warnings
+from textwrap import dedent
+from typing import Any
+
+import pytest
+
+import patchy.api
+from patchy import reloading
+
+PATCH_TEXT = """\
+    @@ -1,2 +1,2 @@
+     def sample() -> int:
+    -    return 1
+    +    return 2
+    """
+
+
+@pytest.fixture
+def module(make_module):
+    return make_module(
+        "reload_mod",
+        """\
+        def sample() -> int:
+            return 1
+
+
+        def other() -> int:
+            return 1
+
+
+        class Foo:
+            def method(self) -> int:
+                return 1
+
+            def __private(self) -> int:
+                return 1
+
+            def private(self) -> int:
+                return self.__private()
+        """,
+    )
+
+
+def test_reload_repatches(module):
+    patchy.patch(module.sample, PATCH_TEXT)
+    patchy.patch(
+        module.Foo.method,
+        """\
+        @@ -2,1 +2,1 @@
+        -    return 1
+        +    return 3
+        """,
+    )
+
+    module = importlib.reload(module)
+
+    assert module.sample() == 2
+    assert module.Foo().method() == 3
+    assert module.other() == 1
+
+
+def test_reload_uses_warm_cache(module, monkeypatch):
+    patchy.patch(module.sample, PATCH_TEXT)
+
+    def mkdtemp(*args: Any, **kwargs: Any) -> None:  # pragma: no cover
+        raise AssertionError("mkdtemp should not be called, the patch is cached.")
+
+    monkeypatch.setattr(patchy.api, "mkdtemp", mkdtemp)
+    module = importlib.reload(module)
+
+    assert module.sample() == 2
+
+
+def test_reload_repatches_private_method(module):
+    patchy.patch(
+        module.Foo._Foo__private,
+        """\
+        @@ -1,2 +1,2 @@
+         def __private(self) -> int:
+        -    return 1
+        +    return 3
+        """,
+    )
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        module = importlib.reload(module)
+
+    assert module.Foo().private() == 3
+
+
+def test_reload_repatches_class(module):
+    patchy.patch_class(
+        module.Foo,
+        """\
+        @@ -1,6 +1,6 @@
+         class Foo:
+             def method(self) -> int:
+        -        return 1
+        +        return 3
+
+             def __private(self) -> int:
+                 return 1
+        """,
+    )
+
+    module = importlib.reload(module)
+
+    assert module.Foo().method() == 3
+
+
+def test_reload_after_unpatch(module):
+    patchy.patch(module.sample, PATCH_TEXT)
+    patchy.unpatch(module.sample, PATCH_TEXT)
+    assert reloading._module_ops["reload_mod"] == []
+
+    module = importlib.reload(module)
+
+    assert module.sample() == 1
+
+
+def test_reload_unpatch_without_patch(module):
+    patchy.patch(
+        module.other,
+        """\
+        @@ -1,2 +1,2 @@
+         def other() -> int:
+        -    return 1
+        +    return 2
+        """,
+    )
+    patchy.unpatch(
+        module.sample,
+        """\
+        @@ -1,2 +1,2 @@
+         def sample() -> int:
+        -    return 0
+        +    return 1
+        """,
+    )
+
+    module = importlib.reload(module)
+
+    assert module.sample() == 0
+    assert module.other() == 2
+
+
+def test_reload_replays_unpatch_of_earlier_patch(module):
+    # Pairs are cancelled out when tracked, but may be restored together
+    reloading.restore(
+        {
+            "reload_mod": [
+                reloading._Op("sample", dedent(PATCH_TEXT), True, None),
+                reloading._Op("sample", dedent(PATCH_TEXT), False, None),
+            ]
+        }
+    )
+
+    module = importlib.reload(module)
+
+    assert module.sample() == 1
+    assert patchy.patched() == []
+    assert len(reloading._module_ops["reload_mod"]) == 2
+
+
+def test_reload_replace(module):
+    patchy.patch(module.sample, PATCH_TEXT)
+    patchy.replace(module.sample, None, "def sample() -> int:\n    return 4\n")
+    assert len(reloading._module_ops["reload_mod"]) == 1
+
+    module = importlib.reload(module)
+
+    assert module.sample() == 4
+
+
+def test_reload_changed_source_warns(module, tmp_path):
+    patchy.patch(module.sample, PATCH_TEXT)
+    (tmp_path / "reload_mod.py").write_text("def sample() -> int:\n    return 5\n")
+
+    with pytest.warns(UserWarning, match="Could not re-apply change"):
+        module = importlib.reload(module)
+
+    assert module.sample() == 5
+    assert reloading._module_ops["reload_mod"] == []
+
+
+def test_local_functions_not_tracked():
+    def sample() -> int:
+        return 1
+
+    assert sample() == 1
+    patchy.patch(sample, PATCH_TEXT)
+
+    assert sample() == 2
+    assert all(
+        "<locals>" not in op.qualname
+        for ops in reloading._module_ops.values()
+        for op in ops
+    )
+
+
+def test_finder_ignores_imports():
+    assert reloading._finder.find_spec("reload_mod", None) is None
+
+
+def test_finder_no_spec(module, tmp_path):
+    patchy.patch(module.sample, PATCH_TEXT)
+    (tmp_path / "reload_mod.py").unlink()
+
+    assert reloading._finder.find_spec("reload_mod", None, module) is None
+
+
+def test_finder_loader_not_wrapped(module, monkeypatch):
+    patchy.patch(module.sample, PATCH_TEXT)
+    spec = importlib.machinery.ModuleSpec("reload_mod", None)
+
+    class Finder:
+        def find_spec(self, *args: Any) -> importlib.machinery.ModuleSpec:
+            return spec
+
+    monkeypatch.setattr(sys, "meta_path", [Finder(), *sys.meta_path])
+
+    assert reloading._finder.find_spec("reload_mod", None, module) is spec
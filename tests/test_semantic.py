@@ -0,0 +1,299 @@
+from __future__ import annotations
+
+import importlib
+import sys
+from textwrap import dedent
+from typing import Any
+
+import pytest
+
+import patchy
+import patchy.api
+from patchy import reloading
+
+MODULES = ("sem_pkg", "sem_pkg.helpers", "sem_pkg.a", "sem_pkg.sub", "sem_pkg.sub.b")
+
+
+@pytest.fixture
+def package(tmp_path):
+    root = tmp_path / "sem_pkg"
+    files = {
+        "__init__.py": """\
+            from sem_pkg.helpers import fast, slow
+
+
+            def top(x):
+                return slow(x)
+            """,
+        "helpers.py": """\
+            def slow(x):
+                return x + 1
+
+
+            def fast(x):
+                return x + 100
+            """,
+        "a.py": """\
+            import functools
+
+            from sem_pkg.helpers import fast, slow
+
+
+            def one(x):
+                return slow(x) * 2
+
+
+            def nested(x):
+                # Twice
+                return slow(slow(x))  # slowly
+
+
+            def same(x, y):
+                return max(x, x) + max(x, y)
+
+
+            def untouched(x):
+                return x
+
+
+            def decorated(func):
+                @functools.wraps(func)
+                def wrapper(*args):
+                    return func(*args)
+
+                return wrapper
+
+
+            @decorated
+            def wrapped(x):
+                return slow(x)
+
+
+            class Thing:
+                def method(self, x):
+                    return slow(x)
+
+                def __private(self, x):
+                    return slow(x)
+
+                def private(self, x):
+                    return self.__private(x)
+
+                @property
+                def prop(self):
+                    return slow(1)
+            """,
+        "sub/__init__.py": "",
+        "sub/b.py": """\
+            from sem_pkg.helpers import fast, slow
+
+
+            def two(x):
+                if x:
+                    return slow(x)
+                return slow
+            """,
+        "sub/notes.txt": "slow(x)",
+    }
+    for name, source in files.items():
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(dedent(source))
+    sys.path.insert(0, str(tmp_path))
+    try:
+        yield root
+    finally:
+        sys.path.pop(0)
+        for module in MODULES:
+            sys.modules.pop(module, None)
+            reloading._module_ops.pop(module, None)
+
+
+def module(name: str) -> Any:
+    return importlib.import_module(name)
+
+
+def test_index(package):
+    index = patchy.FunctionIndex("sem_pkg")
+
+    assert len(index) == 14
+
+
+def test_index_single_module(package):
+    index = patchy.FunctionIndex("sem_pkg.sub.b")
+
+    assert len(index) == 1
+
+
+def test_index_missing():
+    with pytest.raises(LookupError) as excinfo:
+        patchy.FunctionIndex("sem_pkg_nope")
+
+    assert str(excinfo.value) == "Could not find a module for 'sem_pkg_nope'."
+
+
+def test_find(package):
+    index = patchy.FunctionIndex("sem_pkg")
+
+    assert index.find("slow($x)") == [
+        "sem_pkg.top",
+        "sem_pkg.a.one",
+        "sem_pkg.a.nested",
+        "sem_pkg.a.wrapped",
+        "sem_pkg.a.Thing.method",
+        "sem_pkg.a.Thing.__private",
+        "sem_pkg.a.Thing.prop",
+        "sem_pkg.sub.b.two",
+    ]
+
+
+def test_find_repeated_metavariable(package):
+    index = patchy.FunctionIndex("sem_pkg")
+
+    assert index.find("max($a, $a)") == ["sem_pkg.a.same"]
+
+
+def test_find_only_metavariables(package):
+    index = patchy.FunctionIndex("sem_pkg.sub.b")
+
+    assert index.find("$f($x)") == ["sem_pkg.sub.b.two"]
+
+
+def test_find_no_match(package):
+    index = patchy.FunctionIndex("sem_pkg")
+
+    assert index.find("nothing($x)") == []
+
+
+def test_find_candidates_no_match(package):
+    index = patchy.FunctionIndex("sem_pkg")
+
+    assert index.find("slow($x, $y)") == []
+
+
+def test_find_bare_metavariable(package):
+    index = patchy.FunctionIndex("sem_pkg.sub.b")
+
+    assert index.find("$x") == ["sem_pkg.sub.b.two"]
+
+
+def test_find_invalid_pattern(package):
+    index = patchy.FunctionIndex("sem_pkg")
+
+    with pytest.raises(ValueError) as excinfo:
+        index.find("slow(")
+
+    assert str(excinfo.value).startswith("Invalid pattern 'slow('")
+
+
+def test_semantic_patch(package):
+    changed = patchy.semantic_patch("sem_pkg", "slow($x)", "fast($x)")
+
+    assert changed == [
+        "sem_pkg.top",
+        "sem_pkg.a.one",
+        "sem_pkg.a.nested",
+        "sem_pkg.a.Thing.method",
+        "sem_pkg.a.Thing.__private",
+        "sem_pkg.sub.b.two",
+    ]
+    a = module("sem_pkg.a")
+    assert module("sem_pkg").top(1) == 101
+    assert a.one(1) == 202
+    assert a.nested(1) == 201
+    assert a.wrapped(1) == 2
+    assert a.Thing().method(1) == 101
+    assert a.Thing().private(1) == 101
+    assert a.Thing().prop == 2
+    assert module("sem_pkg.sub.b").two(1) == 101
+    assert module("sem_pkg.sub.b").two(0) is module("sem_pkg.helpers").slow
+    assert patchy.api._get_source(a.one) == dedent(
+        """\
+        def one(x):
+            return fast(x) * 2
+        """
+    )
+
+
+def test_semantic_patch_index(package):
+    index = patchy.FunctionIndex("sem_pkg.a")
+
+    changed = patchy.semantic_patch(index, "max($a, $a)", "$a")
+
+    assert changed == ["sem_pkg.a.same"]
+    assert module("sem_pkg.a").same(1, 2) == 3
+
+
+def test_semantic_patch_already_changed(package):
+    a = module("sem_pkg.a")
+    patchy.replace(
+        a.one,
+        None,
+        """\
+        def one(x):
+            return x
+        """,
+    )
+
+    changed = patchy.semantic_patch("sem_pkg.a", "slow($x)", "fast($x)")
+
+    assert "sem_pkg.a.one" not in changed
+    assert a.one(1) == 1
+
+
+def test_semantic_patch_unbound_metavariable(package):
+    with pytest.raises(ValueError) as excinfo:
+        patchy.semantic_patch("sem_pkg", "slow($x)", "fast($x, $y, $z)")
+
+    assert str(excinfo.value) == (
+        "Replacement uses metavariables not in pattern: $y, $z."
+    )
+
+
+def test_semantic_patch_tracked_for_reload(package):
+    patchy.semantic_patch("sem_pkg.sub.b", "slow($x)", "fast($x)")
+
+    b = importlib.reload(module("sem_pkg.sub.b"))
+
+    assert b.two(1) == 101
+
+
+def test_semantic_patch_keeps_comments(package):
+    patchy.semantic_patch("sem_pkg.a", "slow($x)", "fast($x)")
+
+    assert patchy.api._get_source(module("sem_pkg.a").nested) == dedent(
+        """\
+        def nested(x):
+            # Twice
+            return fast(fast(x))  # slowly
+        """
+    )
+
+
+def test_semantic_patch_brackets(package):
+    patchy.semantic_patch("sem_pkg.a", "slow($x)", "$x + 100")
+
+    a = module("sem_pkg.a")
+    assert a.one(1) == 202
+    assert a.nested(1) == 201
+    assert "return (x + 100) * 2\n" in patchy.api._get_source(a.one)
+    assert "return (x + 100) + 100  # slowly\n" in patchy.api._get_source(a.nested)
+
+
+def test_semantic_unpatch(package):
+    patchy.semantic_patch("sem_pkg.a", "slow($x)", "fast($x)")
+    a = module("sem_pkg.a")
+    assert a.one(1) == 202
+
+    changed = patchy.semantic_unpatch("sem_pkg.a", "slow($x)", "fast($x)")
+
+    assert changed == [
+        "sem_pkg.a.one",
+        "sem_pkg.a.nested",
+        "sem_pkg.a.Thing.method",
+        "sem_pkg.a.Thing.__private",
+    ]
+    assert a.one(1) == 4
+    assert a.nested(1) == 3
+    assert a.Thing().method(1) == 2
+    assert patchy.semantic_unpatch("sem_pkg.a", "slow($x)", "fast($x)") == []
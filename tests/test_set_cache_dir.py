@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import inspect
+import sys
+import warnings
+from collections.abc import Callable
+from pathlib import Path
+from textwrap import dedent
+from typing import Any
+
+import pytest
+
+import patchy.api
+from patchy.fingerprint import distribution_version
+
+PATCH_TEXT = """\
+    @@ -1,2 +1,2 @@
+     def sample() -> int:
+    -    return 1
+    +    return 2
+    """
+
+OFFSET_PATCH_TEXT = """\
+    @@ -1,1 +1,1 @@
+    -    return 1
+    +    return 2
+    """
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    patchy.set_cache_dir(tmp_path / "cache")
+    yield tmp_path / "cache"
+    patchy.set_cache_dir(None)
+
+
+@pytest.fixture
+def module_path(make_module):
+    module = make_module(
+        "disk_cache_mod",
+        """\
+        def sample() -> int:
+            return 1
+        """,
+    )
+    return Path(module.__file__)
+
+
+def fresh_sample() -> Callable[[], int]:
+    sys.modules.pop("disk_cache_mod", None)
+    from disk_cache_mod import sample  # type: ignore [import-not-found]
+
+    return sample  # type: ignore [no-any-return]
+
+
+def no_mkdtemp(*args: Any, **kwargs: Any) -> None:  # pragma: no cover
+    raise AssertionError("mkdtemp should not be called, the patch should be cached.")
+
+
+def test_reuses_cached_result(cache_dir, module_path, monkeypatch):
+    sample = fresh_sample()
+    patchy.patch(sample, PATCH_TEXT)
+    assert sample() == 2
+    assert len(list(cache_dir.iterdir())) == 1
+
+    patchy.api._patching_cache.clear()
+    monkeypatch.setattr(patchy.api, "mkdtemp", no_mkdtemp)
+    sample = fresh_sample()
+    patchy.patch(sample, PATCH_TEXT)
+    assert sample() == 2
+
+
+def test_cached_result_skips_source(cache_dir, module_path, monkeypatch):
+    sample = fresh_sample()
+    patchy.patch(sample, PATCH_TEXT)
+
+    def getsource(obj: Any) -> str:  # pragma: no cover
+        raise AssertionError("The source should not be fetched on a cache hit.")
+
+    patchy.api._patching_cache.clear()
+    monkeypatch.setattr(inspect, "getsource", getsource)
+    sample = fresh_sample()
+    patchy.patch(sample, PATCH_TEXT)
+    assert sample() == 2
+
+
+def test_changed_file_reapplies(cache_dir, module_path, monkeypatch):
+    sample = fresh_sample()
+    patchy.patch(sample, PATCH_TEXT)
+
+    module_path.write_text(module_path.read_text() + "\n\nx = 1\n")
+    patchy.api._patching_cache.clear()
+    sample = fresh_sample()
+    called = []
+    orig_apply_patch = patchy.api._apply_patch
+
+    def apply_patch(*args: Any, **kwargs: Any) -> str:
+        called.append(True)
+        return orig_apply_patch(*args, **kwargs)
+
+    monkeypatch.setattr(patchy.api, "_apply_patch", apply_patch)
+    patchy.patch(sample, PATCH_TEXT)
+
+    assert called == [True]
+    assert sample() == 2
+
+
+def test_reuses_rebased_result(cache_dir, module_path, monkeypatch):
+    sample = fresh_sample()
+    with pytest.warns(UserWarning, match="only applied with an offset or fuzz"):
+        patchy.patch(sample, OFFSET_PATCH_TEXT)
+    assert len(list(cache_dir.iterdir())) == 2
+
+    module_path.write_text(module_path.read_text() + "\n\nx = 1\n")
+    patchy.api._patching_cache.clear()
+    monkeypatch.setattr(patchy.api, "mkdtemp", no_mkdtemp)
+    sample = fresh_sample()
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        patchy.patch(sample, OFFSET_PATCH_TEXT)
+
+    assert sample() == 2
+
+
+def test_rebased_result_stores_patch(cache_dir, module_path):
+    sample = fresh_sample()
+    with pytest.warns(UserWarning):
+        patchy.patch(sample, OFFSET_PATCH_TEXT)
+
+    key = patchy.api._rebased_key(
+        "def sample() -> int:\n    return 1\n", dedent(OFFSET_PATCH_TEXT)
+    )
+    assert patchy.api._disk_cache is not None
+    assert patchy.api._disk_cache.retrieve(key) == {
+        "patch": "@@ -1,2 +1,2 @@\n def sample() -> int:\n-    return 1\n+    return 2\n",
+        "source": "def sample() -> int:\n    return 2\n",
+    }
+
+
+def test_same_name_definitions_cached_separately(cache_dir, make_module):
+    module = make_module(
+        "disk_cache_same_name_mod",
+        """\
+        def sample() -> int:
+            return 1
+
+
+        first = sample
+
+
+        def sample() -> int:  # noqa: F811
+            return 1
+            raise AssertionError("unreachable")
+        """,
+    )
+    patch_text = """\
+        @@ -2 +2 @@
+        -    return 1
+        +    return 2
+        """
+    patchy.patch(module.first, patch_text)
+    patchy.patch(module.sample, patch_text)
+
+    assert module.first() == 2
+    assert module.sample() == 2
+    assert "raise" in patchy.api._get_source(module.sample)
+
+
+def test_already_patched_skips_cache(cache_dir, module_path):
+    sample = fresh_sample()
+    patchy.replace(sample, None, "def sample() -> int:\n    return 1\n")
+    patchy.patch(sample, PATCH_TEXT)
+    assert sample() == 2
+    assert not cache_dir.exists()
+
+
+def test_no_source_file_skips_cache(cache_dir):
+    namespace: dict[str, Any] = {}
+    exec("def sample() -> int:\n    return 1\n", namespace)
+    sample = namespace["sample"]
+    with pytest.raises(OSError):
+        patchy.patch(sample, PATCH_TEXT)
+    assert not cache_dir.exists()
+
+
+def test_unwritable_cache_dir_still_patches(tmp_path, module_path):
+    (tmp_path / "notadir").write_text("")
+    patchy.set_cache_dir(tmp_path / "notadir" / "cache")
+    try:
+        sample = fresh_sample()
+        patchy.patch(sample, PATCH_TEXT)
+    finally:
+        patchy.set_cache_dir(None)
+    assert sample() == 2
+
+
+def test_distribution_version():
+    assert distribution_version("_pytest.main") == f"pytest=={pytest.__version__}"
+
+
+def test_distribution_version_none():
+    assert distribution_version("tests.test_set_cache_dir") is None
@@ -0,0 +1,277 @@
+from __future__ import annotations
+
+import logging
+import warnings
+from textwrap import dedent
+
+import pytest
+
+import patchy
+from patchy.api import _get_source
+
+logger = logging.getLogger(__name__)
+
+
+def test_strip():
+    def sample(x: int) -> int:
+        logger.debug("x is %s", x)
+        return x + 1
+
+    assert sample(1) == 2
+
+    assert patchy.strip_calls(sample, "logger.debug") == 1
+
+    assert sample(1) == 2
+    assert _get_source(sample) == dedent(
+        """\
+        def sample(x: int) -> int:
+            return x + 1
+        """
+    )
+
+
+def test_strip_arguments_not_evaluated():
+    calls = []
+
+    def expensive() -> str:
+        calls.append(1)
+        return "lots"
+
+    def sample(x: int) -> int:
+        logger.debug("state: %s", expensive())
+        return x
+
+    assert sample(1) == 1
+    assert calls == [1]
+
+    patchy.strip_calls(sample, "logger.debug")
+
+    assert sample(1) == 1
+    assert calls == [1]
+
+
+def test_strip_wildcard():
+    def sample(x: int) -> int:
+        logger.debug("x is %s", x)
+        if x:
+            logger.info("x is set")
+        logger.warning("x is %s", x)
+        return x
+
+    assert sample(0) == 0
+    assert sample(1) == 1
+
+    assert patchy.strip_calls(sample, "logger.[di]*") == 2
+
+    assert _get_source(sample) == dedent(
+        """\
+        def sample(x: int) -> int:
+            if x:
+                pass
+            logger.warning("x is %s", x)
+            return x
+        """
+    )
+
+
+def test_strip_keeps_comments():
+    def sample(x: int) -> int:
+        # Log the input
+        logger.debug("x is %s", x)
+        if x:  # set?
+            logger.debug("x is set")  # noisy
+        return x + 1  # plus 'one'
+
+    assert sample(0) == 1
+    assert sample(1) == 2
+
+    assert patchy.strip_calls(sample, "logger.debug") == 2
+
+    assert sample(1) == 2
+    assert _get_source(sample) == dedent(
+        """\
+        def sample(x: int) -> int:
+            # Log the input
+            if x:  # set?
+                pass
+            return x + 1  # plus 'one'
+        """
+    )
+
+
+def test_strip_shared_line_unparsed():
+    def sample(x: int) -> int:
+        # fmt: off
+        logger.debug("x"); y = x  # noqa: E702
+        # fmt: on
+        logger.debug("y")
+        return y
+
+    assert sample(1) == 1
+
+    assert patchy.strip_calls(sample, "logger.debug") == 2
+
+    assert sample(1) == 1
+    assert _get_source(sample) == dedent(
+        """\
+        def sample(x: int) -> int:
+            y = x
+            return y
+        """
+    )
+
+
+def test_strip_nested_blocks():
+    def sample(values: list[int]) -> int:
+        total = 0
+        for value in values:
+            warnings.warn("slow", stacklevel=2)
+            total += value
+        else:
+            warnings.warn("done", stacklevel=2)
+        try:
+            total += 1
+        except ValueError:  # pragma: no cover
+            warnings.warn("failed", stacklevel=2)
+            raise
+        finally:
+            warnings.warn("finally", stacklevel=2)
+        return total
+
+    with pytest.warns(UserWarning):
+        assert sample([1]) == 2
+
+    assert patchy.strip_calls(sample, "warnings.warn") == 4
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        assert sample([1]) == 2
+
+
+def test_strip_nested_function():
+    def sample(x: int) -> int:
+        def inner() -> int:
+            logger.debug("inner")
+            return x
+
+        return inner()
+
+    assert sample(1) == 1
+
+    assert patchy.strip_calls(sample, "logger.debug") == 1
+
+    assert sample(1) == 1
+    assert "logger" not in _get_source(sample)
+
+
+def test_strip_keeps_used_results():
+    def sample(x: int) -> int:
+        result = abs(x)
+        abs(x)
+        return result
+
+    assert sample(-1) == 1
+
+    assert patchy.strip_calls(sample, "abs") == 1
+
+    assert sample(-1) == 1
+    assert "result = abs(x)" in _get_source(sample)
+
+
+def test_strip_no_calls():
+    def sample(x: int) -> int:  # pragma: no cover
+        print(x)
+        return x
+
+    with pytest.raises(ValueError) as excinfo:
+        patchy.strip_calls(sample, "logger.debug")
+
+    assert str(excinfo.value) == "'sample' has no calls to 'logger.debug'."
+    assert patchy.patched() == []
+
+
+def test_strip_twice():
+    def sample(x: int) -> int:
+        logger.debug("x")
+        return x
+
+    assert sample(1) == 1
+    patchy.strip_calls(sample, "logger.debug")
+
+    with pytest.raises(ValueError) as excinfo:
+        patchy.strip_calls(sample, "logger.debug")
+
+    assert str(excinfo.value) == (
+        "Calls to 'logger.debug' are already stripped from 'sample'."
+    )
+
+
+def test_strip_other_matcher():
+    def sample(x: int) -> int:
+        logger.debug("x")
+        logger.info("x")
+        return x
+
+    assert sample(1) == 1
+    patchy.strip_calls(sample, "logger.debug")
+
+    assert patchy.strip_calls(sample, "logger.info") == 1
+
+    patchy.restore_calls(sample, "logger.info")
+    patchy.restore_calls(sample, "logger.debug")
+    assert patchy.patched() == []
+
+
+def test_restore():
+    def sample(x: int) -> int:
+        logger.debug("x")
+        return x
+
+    assert sample(1) == 1
+    original_code = sample.__code__
+    patchy.strip_calls(sample, "logger.debug")
+
+    patchy.restore_calls(sample, "logger.debug")
+
+    assert sample.__code__ is original_code
+    assert patchy.patched() == []
+
+
+def test_restore_after_replace():
+    def sample(x: int) -> int:
+        logger.debug("x")
+        return x
+
+    assert sample(1) == 1
+    patchy.strip_calls(sample, "logger.debug")
+    patchy.replace(
+        sample,
+        None,
+        """\
+        def sample(x: int) -> int:
+            return x * 2
+        """,
+    )
+
+    with pytest.raises(ValueError) as excinfo:
+        patchy.restore_calls(sample, "logger.debug")
+
+    assert str(excinfo.value) == (
+        "Calls to 'logger.debug' aren't stripped from 'sample'."
+    )
+    assert sample(1) == 2
+
+
+def test_by_path():
+    assert target(1) == 1
+
+    patchy.strip_calls("tests.test_strip_calls.target", "logger.debug")
+    assert "logger" not in _get_source(target)
+    patchy.restore_calls("tests.test_strip_calls.target", "logger.debug")
+
+    assert patchy.patched() == []
+
+
+def target(x: int) -> int:
+    logger.debug("x")
+    return x
@@ -3,6 +3,8 @@ from __future__ import annotations
 import sys
 from textwrap import dedent
 
+import pytest
+
 import patchy.api
 
 
@@ -23,6 +25,26 @@ def test_context_manager():
     assert sample() == 1234
 
 
+def test_offset_warning_points_at_caller():
+    def sample() -> int:
+        return 1234
+
+    patch_text = """\
+        @@ -1,1 +1,1 @@
+        -    return 1234
+        +    return 5678
+        """
+
+    assert sample() == 1234
+    with (
+        pytest.warns(UserWarning, match="offset or fuzz") as record,
+        patchy.temp_patch(sample, patch_text),
+    ):
+        assert sample() == 5678
+    assert record[0].filename == __file__
+    assert sample() == 1234
+
+
 def test_decorator():
     def sample() -> int:
         return 3456
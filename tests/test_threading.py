@@ -0,0 +1,318 @@
+from __future__ import annotations
+
+import linecache
+import subprocess
+import threading
+from collections.abc import Callable
+from textwrap import dedent
+from typing import Any
+
+import pytest
+
+import patchy
+import patchy.api
+from patchy.cache import PatchingCache
+
+PATCH = """\
+    @@ -1,2 +1,2 @@
+     def sample() -> int:
+    -    return 1
+    +    return 2
+    """
+
+
+def run_threads(count: int, target: Callable[[int], Any]) -> None:
+    barrier = threading.Barrier(count)
+    errors: list[BaseException] = []
+
+    def run(index: int) -> None:
+        barrier.wait()
+        try:
+            target(index)
+        except BaseException as exc:  # pragma: no cover
+            errors.append(exc)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+
+def test_patch_while_calling():
+    def sample() -> int:
+        return 1
+
+    results: set[int] = set()
+    done = threading.Event()
+
+    def work(index: int) -> None:
+        if index == 0:
+            for _ in range(50):
+                patchy.patch(sample, PATCH)
+                patchy.unpatch(sample, PATCH)
+            done.set()
+        else:
+            while not done.is_set():
+                results.add(sample())
+
+    run_threads(4, work)
+
+    assert results <= {1, 2}
+    assert sample() == 1
+    assert patchy.patched() == []
+
+
+def test_patch_many_functions_concurrently():
+    funcs = []
+    for _ in range(8):
+
+        def sample() -> int:
+            return 1
+
+        funcs.append(sample)
+
+    def work(index: int) -> None:
+        for _ in range(10):
+            patchy.patch(funcs[index], PATCH)
+            assert funcs[index]() == 2
+            patchy.unpatch(funcs[index], PATCH)
+            assert funcs[index]() == 1
+
+    run_threads(8, work)
+
+    assert patchy.patched() == []
+
+
+def test_patching_cache_concurrent_stores():
+    cache = PatchingCache(maxsize=10)
+
+    def work(index: int) -> None:
+        for i in range(200):
+            source = f"{index}-{i}"
+            cache.store(source, "patch", True, source + "!")
+            try:
+                assert cache.retrieve(source, "patch", True) == source + "!"
+            except KeyError:  # pragma: no cover
+                # Evicted by another thread
+                pass
+
+    run_threads(4, work)
+
+    assert len(cache._cache) <= 10
+
+
+def test_replace_while_patching():
+    def sample() -> int:
+        return 1
+
+    new_source = dedent(
+        """\
+        def sample() -> int:
+            return 3
+        """
+    )
+
+    def work(index: int) -> None:
+        for _ in range(20):
+            if index % 2:
+                patchy.replace(sample, None, new_source)
+            else:
+                patchy.unpatch_all()
+
+    run_threads(4, work)
+
+    assert sample() in {1, 3}
+    patchy.unpatch_all()
+    assert sample() == 1
+
+
+@pytest.fixture
+def lock_held(monkeypatch):
+    """
+    Record whether the lock is held each time `patch` is run or code is
+    compiled.
+    """
+    held: list[bool] = []
+
+    def wrap(original: Callable[..., Any]) -> Callable[..., Any]:
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            held.append(patchy.api._lock._is_owned())  # type: ignore [attr-defined]
+            return original(*args, **kwargs)
+
+        return wrapper
+
+    monkeypatch.setattr(subprocess, "run", wrap(subprocess.run))
+    monkeypatch.setattr(patchy.api, "compile", wrap(compile), raising=False)
+    return held
+
+
+@pytest.mark.parametrize(
+    "apply",
+    [
+        lambda sample: patchy.patch(sample, PATCH),
+        lambda sample: patchy.ensure_patched(sample, PATCH),
+        lambda sample: patchy.patch_variants(sample, {">=0": PATCH}),
+    ],
+    ids=["patch", "ensure_patched", "patch_variants"],
+)
+def test_patch_without_lock(lock_held, apply):
+    def sample() -> int:
+        return 1
+
+    apply(sample)
+
+    assert sample() == 2
+    assert lock_held
+    assert not any(lock_held)
+
+
+def test_patch_class_without_lock(lock_held):
+    class Foo:
+        def sample(self) -> int:
+            return 1
+
+    patchy.patch_class(
+        Foo,
+        """\
+        @@ -1,3 +1,3 @@
+         class Foo:
+             def sample(self) -> int:
+        -        return 1
+        +        return 2
+        """,
+    )
+
+    assert Foo().sample() == 2
+    assert lock_held
+    assert not any(lock_held)
+
+
+def test_patch_retries_after_concurrent_change(monkeypatch):
+    def sample() -> int:
+        return 1
+
+    calls = []
+    compile_source = patchy.api._compile_source
+
+    def _compile_source(*args: Any, **kwargs: Any) -> Any:
+        calls.append(args)
+        if len(calls) == 1:
+            # Another thread changes the function meanwhile
+            patchy.replace(sample, None, "def sample() -> int:\n    return 1\n")
+        return compile_source(*args, **kwargs)
+
+    monkeypatch.setattr(patchy.api, "_compile_source", _compile_source)
+
+    patchy.patch(sample, PATCH)
+
+    assert sample() == 2
+    assert len(calls) == 3
+    record = patchy.api._registry[sample]
+    assert [entry.patch_text for entry in record.history] == [None, dedent(PATCH)]
+
+
+def test_patch_class_retries_after_concurrent_change(monkeypatch):
+    class Foo:
+        def sample(self) -> int:
+            return 1
+
+        def other(self) -> int:
+            return 1
+
+    calls = []
+    compile_methods = patchy.api._compile_methods
+
+    def _compile_methods(*args: Any, **kwargs: Any) -> Any:
+        calls.append(args)
+        if len(calls) == 1:
+            # Another thread patches the class meanwhile
+            patchy.patch_class(
+                Foo,
+                """\
+                @@ -4,3 +4,3 @@
+
+                     def other(self) -> int:
+                -        return 1
+                +        return 3
+                """,
+            )
+        return compile_methods(*args, **kwargs)
+
+    monkeypatch.setattr(patchy.api, "_compile_methods", _compile_methods)
+
+    patchy.patch_class(
+        Foo,
+        """\
+        @@ -1,5 +1,5 @@
+         class Foo:
+             def sample(self) -> int:
+        -        return 1
+        +        return 2
+
+             def other(self) -> int:
+        """,
+    )
+
+    assert Foo().sample() == 2
+    assert Foo().other() == 3
+    assert len(calls) == 3
+
+
+def test_line_cache_released_when_collected():
+    def sample() -> int:
+        return 1
+
+    assert sample() == 1
+    patchy.patch(sample, PATCH)
+    filename = sample.__code__.co_filename
+    assert filename in linecache.cache
+
+    del sample
+
+    assert filename not in linecache.cache
+
+
+def test_line_cache_release_deferred_while_locked_elsewhere():
+    def sample() -> int:
+        return 1
+
+    def other() -> int:
+        return 1
+
+    assert sample() == 1
+    assert other() == 1
+    patchy.patch(sample, PATCH)
+    filename = sample.__code__.co_filename
+
+    locked = threading.Event()
+    done = threading.Event()
+
+    def hold_lock() -> None:
+        with patchy.api._lock:
+            locked.set()
+            done.wait()
+
+    thread = threading.Thread(target=hold_lock)
+    thread.start()
+    locked.wait()
+    try:
+        del sample
+        assert filename in linecache.cache
+    finally:
+        done.set()
+        thread.join()
+
+    patchy.patch(
+        other,
+        """\
+        @@ -1,2 +1,2 @@
+         def other() -> int:
+        -    return 1
+        +    return 2
+        """,
+    )
+
+    assert filename not in linecache.cache
+    assert patchy.api._pending_releases == []
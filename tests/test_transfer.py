@@ -0,0 +1,268 @@
+from __future__ import annotations
+
+import importlib
+import marshal
+import multiprocessing
+from textwrap import dedent
+
+import pytest
+
+import patchy
+import patchy.api
+
+PATCH_TEXT = """\
+    @@ -1,2 +1,2 @@
+     def sample() -> int:
+    -    return 1
+    +    return 2
+    """
+
+
+@pytest.fixture
+def module(make_module):
+    return make_module(
+        "transfer_mod",
+        """\
+        def sample() -> int:
+            return 1
+
+
+        class Foo:
+            def method(self) -> int:
+                return 1
+
+            @classmethod
+            def cmethod(cls) -> int:
+                return 1
+
+            def __private(self) -> int:
+                return 1
+
+            def private(self) -> int:
+                return self.__private()
+        """,
+    )
+
+
+def test_export_empty():
+    patchy.install_patches(patchy.export_patches())
+
+    assert patchy.patched() == []
+
+
+def test_install(module):
+    patchy.patch(module.sample, PATCH_TEXT)
+    data = patchy.export_patches()
+    patchy.unpatch_all()
+    assert module.sample() == 1
+
+    patchy.install_patches(data)
+
+    assert module.sample() == 2
+    assert patchy.patched() == [module.sample]
+    assert patchy.api._get_source(module.sample) == dedent(
+        """\
+        def sample() -> int:
+            return 2
+        """
+    )
+
+
+def test_install_skips_compiling(module, monkeypatch):
+    patchy.patch(module.sample, PATCH_TEXT)
+    data = patchy.export_patches()
+    patchy.unpatch_all()
+
+    def fail(*args: object) -> None:  # pragma: no cover
+        raise AssertionError("Should not be called")
+
+    monkeypatch.setattr(patchy.api, "_apply_patch", fail)
+    monkeypatch.setattr(patchy.api, "_compile_source", fail)
+    patchy.install_patches(data)
+
+    assert module.sample() == 2
+
+
+def test_install_then_unpatch(module):
+    patchy.patch(module.sample, PATCH_TEXT)
+    patchy.replace(
+        module.Foo.method,
+        None,
+        """\
+        def method(self) -> int:
+            return 3
+        """,
+    )
+    data = patchy.export_patches()
+    patchy.unpatch_all()
+
+    patchy.install_patches(data)
+
+    assert module.Foo().method() == 3
+    patchy.unpatch(module.sample, PATCH_TEXT)
+    assert module.sample() == 1
+    assert patchy.patched() == [module.Foo.method]
+
+
+def test_install_classmethod(module):
+    patchy.patch(
+        module.Foo.cmethod,
+        """\
+        @@ -1,3 +1,3 @@
+         @classmethod
+         def cmethod(cls) -> int:
+        -    return 1
+        +    return 4
+        """,
+    )
+    data = patchy.export_patches()
+    patchy.unpatch_all()
+
+    patchy.install_patches(data)
+
+    assert module.Foo.cmethod() == 4
+
+
+def test_install_private_method(module):
+    patchy.patch(
+        module.Foo._Foo__private,
+        """\
+        @@ -1,2 +1,2 @@
+         def __private(self) -> int:
+        -    return 1
+        +    return 6
+        """,
+    )
+    data = patchy.export_patches()
+    patchy.unpatch_all()
+
+    patchy.install_patches(data)
+
+    assert module.Foo().private() == 6
+
+
+def test_install_class_source(module):
+    class_patch = """\
+        @@ -1,5 +1,5 @@
+         class Foo:
+             def method(self) -> int:
+        -        return 1
+        +        return 5
+
+             @classmethod
+        """
+    patchy.patch_class(module.Foo, class_patch)
+    data = patchy.export_patches()
+    patchy.unpatch_all()
+
+    patchy.install_patches(data)
+
+    assert module.Foo().method() == 5
+    patchy.unpatch_class(module.Foo, class_patch)
+    assert module.Foo().method() == 1
+
+
+def test_install_twice(module):
+    patchy.patch(module.sample, PATCH_TEXT)
+    data = patchy.export_patches()
+
+    patchy.install_patches(data)
+
+    assert module.sample() == 2
+    patchy.unpatch(module.sample, PATCH_TEXT)
+    assert module.sample() == 1
+
+
+def test_install_tracks_for_reload(module):
+    patchy.patch(module.sample, PATCH_TEXT)
+    data = patchy.export_patches()
+    patchy.unpatch_all()
+    patchy.install_patches(data)
+
+    module = importlib.reload(module)
+
+    assert module.sample() == 2
+
+
+def test_install_changed_code(module):
+    patchy.patch(module.sample, PATCH_TEXT)
+    data = patchy.export_patches()
+    patchy.unpatch_all()
+    patchy.replace(
+        module.sample,
+        None,
+        """\
+        def sample() -> int:
+            return 3
+        """,
+    )
+
+    with pytest.raises(ValueError) as excinfo:
+        patchy.install_patches(data)
+
+    assert "'transfer_mod.sample' differs" in str(excinfo.value)
+
+
+def test_install_changed_code_installs_nothing(module):
+    patchy.patch(module.sample, PATCH_TEXT)
+    patchy.patch(
+        module.Foo.method,
+        """\
+        @@ -1,2 +1,2 @@
+         def method(self) -> int:
+        -    return 1
+        +    return 3
+        """,
+    )
+    data = patchy.export_patches()
+    patchy.unpatch_all()
+    patchy.replace(
+        module.Foo.method,
+        None,
+        """\
+        def method(self) -> int:
+            return 4
+        """,
+    )
+
+    with pytest.raises(ValueError):
+        patchy.install_patches(data)
+
+    assert module.sample() == 1
+    assert patchy.patched() == [module.Foo.method]
+
+
+def test_install_other_python_version():
+    data = marshal.dumps((b"nope", [], []))
+
+    with pytest.raises(ValueError) as excinfo:
+        patchy.install_patches(data)
+
+    assert "different version of Python" in str(excinfo.value)
+
+
+def test_export_skips_local_functions():
+    def sample() -> int:
+        return 1
+
+    assert sample() == 1
+
+    patchy.patch(sample, PATCH_TEXT)
+
+    _, functions, _ = marshal.loads(patchy.export_patches())
+
+    assert functions == []
+
+
+def test_spawn_initializer(module):
+    patchy.patch(module.sample, PATCH_TEXT)
+
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(
+        1,
+        initializer=patchy.install_patches,
+        initargs=(patchy.export_patches(),),
+    ) as pool:
+        result = pool.apply(module.sample)
+
+    assert result == 2
@@ -1,5 +1,9 @@
 from __future__ import annotations
 
+import warnings
+from textwrap import dedent
+from typing import Any
+
 import pytest
 
 import patchy.api
@@ -74,3 +78,113 @@ def test_unpatch_invalid_hunk():
         or "1 out of 1 hunks failed" in msg
     )
     assert sample() == 1
+
+
+PATCH_TEXT = """\
+    @@ -1,2 +1,2 @@
+     def sample() -> int:
+    -    return 1
+    +    return 2
+    """
+
+
+def no_apply_patch(*args: Any) -> str:  # pragma: no cover
+    raise AssertionError("_apply_patch should not be called.")
+
+
+def test_unpatch_from_history(monkeypatch):
+    def sample() -> int:
+        return 1
+
+    assert sample() == 1
+
+    original_code = sample.__code__
+    patchy.patch(sample, PATCH_TEXT)
+    monkeypatch.setattr(patchy.api, "_apply_patch", no_apply_patch)
+
+    patchy.unpatch(sample, PATCH_TEXT)
+
+    assert sample.__code__ is original_code
+    assert sample not in patchy.api._registry
+    assert sample not in patchy.api._source_map
+
+
+def test_unpatch_from_history_restores_previous():
+    def sample() -> int:
+        return 1
+
+    assert sample() == 1
+
+    patchy.patch(sample, PATCH_TEXT)
+    patched_code = sample.__code__
+    second_patch = """\
+        @@ -2,1 +2,1 @@
+        -    return 2
+        +    return 3
+        """
+    patchy.patch(sample, second_patch)
+    assert sample() == 3
+
+    patchy.unpatch(sample, second_patch)
+
+    assert sample.__code__ is patched_code
+    assert patchy.api._get_source(sample) == dedent(
+        """\
+        def sample() -> int:
+            return 2
+        """
+    )
+
+
+def test_unpatch_not_last_uses_reverse_diff():
+    def sample() -> int:
+        x = 1
+        return x
+
+    assert sample() == 1
+
+    first_patch = """\
+        @@ -1,3 +1,3 @@
+         def sample() -> int:
+        -    x = 1
+        +    x = 2
+             return x
+        """
+    second_patch = """\
+        @@ -2,2 +2,2 @@
+             x = 2
+        -    return x
+        +    return x * 10
+        """
+    patchy.patch(sample, first_patch)
+    patchy.patch(sample, second_patch)
+    assert sample() == 20
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        patchy.unpatch(sample, first_patch)
+
+    assert sample() == 10
+    assert [entry.patch_text for entry in patchy.api._registry[sample].history] == [
+        dedent(first_patch),
+        dedent(second_patch),
+        None,
+    ]
+
+
+def test_unpatch_code_changed_elsewhere_uses_reverse_diff():
+    def sample() -> int:
+        return 1
+
+    def other() -> int:
+        return 2
+
+    assert sample() == 1
+    assert other() == 2
+
+    patchy.patch(sample, PATCH_TEXT)
+    sample.__code__ = other.__code__.replace(co_name="sample")
+
+    patchy.unpatch(sample, PATCH_TEXT)
+
+    assert sample() == 1
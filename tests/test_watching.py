@@ -0,0 +1,296 @@
+from __future__ import annotations
+
+import os
+import sys
+import time
+from collections.abc import Callable, Iterable
+from pathlib import Path
+from textwrap import dedent
+
+import pytest
+
+import patchy
+from patchy import check, watching
+
+
+@pytest.fixture
+def module(make_module):
+    return make_module(
+        "watch_mod",
+        """\
+        def sample() -> int:
+            return 1
+
+
+        def other() -> int:
+            return 1
+        """,
+    )
+
+
+@pytest.fixture
+def patch_dir(tmp_path):
+    path = tmp_path / "patches"
+    path.mkdir()
+    return path
+
+
+def write_patch(path: Path, name: str, value: int) -> None:
+    (path / f"watch_mod.{name}.patch").write_text(
+        dedent(
+            f"""\
+            @@ -1,2 +1,2 @@
+             def {name}() -> int:
+            -    return 1
+            +    return {value}
+            """
+        )
+    )
+
+
+def wait_for(condition: Callable[[], bool]) -> None:
+    deadline = time.monotonic() + 10
+    while not condition():
+        if time.monotonic() > deadline:  # pragma: no cover
+            raise AssertionError("Timed out")
+        time.sleep(0.01)
+
+
+def test_scan_applies(module, patch_dir):
+    write_patch(patch_dir, "sample", 2)
+    watcher = patchy.PatchWatcher([str(patch_dir)])
+
+    assert watcher.scan() == ["watch_mod.sample"]
+
+    assert module.sample() == 2
+
+
+def test_scan_unchanged(module, patch_dir):
+    write_patch(patch_dir, "sample", 2)
+    watcher = patchy.PatchWatcher([str(patch_dir)])
+    watcher.scan()
+
+    assert watcher.scan() == []
+
+    assert module.sample() == 2
+
+
+def test_scan_touched(module, patch_dir):
+    write_patch(patch_dir, "sample", 2)
+    watcher = patchy.PatchWatcher([str(patch_dir)])
+    watcher.scan()
+    os.utime(patch_dir / "watch_mod.sample.patch", ns=(0, 0))
+
+    assert watcher.scan() == []
+
+
+def test_scan_changed(module, patch_dir):
+    write_patch(patch_dir, "sample", 2)
+    write_patch(patch_dir, "other", 2)
+    watcher = patchy.PatchWatcher([str(patch_dir)])
+    watcher.scan()
+    other_code = module.other.__code__
+
+    write_patch(patch_dir, "sample", 30)
+
+    assert watcher.scan() == ["watch_mod.sample"]
+    assert module.sample() == 30
+    assert module.other.__code__ is other_code
+    assert len(patchy.api._registry[module.sample].history) == 1
+
+
+def test_scan_deleted(module, patch_dir):
+    write_patch(patch_dir, "sample", 2)
+    watcher = patchy.PatchWatcher([str(patch_dir)])
+    watcher.scan()
+
+    (patch_dir / "watch_mod.sample.patch").unlink()
+
+    assert watcher.scan() == ["watch_mod.sample"]
+    assert module.sample() == 1
+    assert patchy.patched() == []
+
+
+def test_scan_file_path(module, patch_dir):
+    write_patch(patch_dir, "sample", 2)
+    filename = patch_dir / "watch_mod.sample.patch"
+    watcher = patchy.PatchWatcher([str(filename)])
+    watcher.scan()
+    assert module.sample() == 2
+
+    filename.unlink()
+
+    assert watcher.scan() == ["watch_mod.sample"]
+    assert module.sample() == 1
+
+
+def test_scan_invalid_keeps_previous(module, patch_dir):
+    write_patch(patch_dir, "sample", 2)
+    watcher = patchy.PatchWatcher([str(patch_dir)])
+    watcher.scan()
+
+    (patch_dir / "watch_mod.sample.patch").write_text("@@ -1,1 +1,1 @@\n-nope\n+no\n")
+
+    with pytest.warns(UserWarning, match="Could not apply"):
+        assert watcher.scan() == []
+    assert module.sample() == 2
+
+
+def test_scan_invalid_new(module, patch_dir):
+    (patch_dir / "watch_mod.sample.patch").write_text("@@ -1,1 +1,1 @@\n-nope\n+no\n")
+    watcher = patchy.PatchWatcher([str(patch_dir)])
+
+    with pytest.warns(UserWarning, match="Could not apply"):
+        assert watcher.scan() == []
+    assert module.sample() == 1
+
+
+def test_scan_unreadable(module, patch_dir):
+    (patch_dir / "watch_mod.sample.patch").write_bytes(b"\xff\xfe")
+    write_patch(patch_dir, "other", 2)
+    watcher = patchy.PatchWatcher([str(patch_dir)])
+
+    with pytest.warns(UserWarning, match="Could not apply .*watch_mod.sample"):
+        assert watcher.scan() == ["watch_mod.other"]
+    assert module.other() == 2
+
+    write_patch(patch_dir, "sample", 2)
+
+    assert watcher.scan() == ["watch_mod.sample"]
+    assert module.sample() == 2
+
+
+def test_scan_unapply_fails(module, patch_dir):
+    write_patch(patch_dir, "sample", 2)
+    watcher = patchy.PatchWatcher([str(patch_dir)])
+    watcher.scan()
+    patchy.replace(
+        module.sample,
+        None,
+        """\
+        def sample() -> int:
+            return 5
+        """,
+    )
+
+    write_patch(patch_dir, "sample", 3)
+
+    with pytest.warns(UserWarning, match="Could not unapply old version"):
+        assert watcher.scan() == []
+    assert module.sample() == 5
+
+
+def test_scan_deleted_unapply_fails(module, patch_dir):
+    write_patch(patch_dir, "sample", 2)
+    watcher = patchy.PatchWatcher([str(patch_dir)])
+    watcher.scan()
+    patchy.replace(
+        module.sample,
+        None,
+        """\
+        def sample() -> int:
+            return 5
+        """,
+    )
+
+    (patch_dir / "watch_mod.sample.patch").unlink()
+
+    with pytest.warns(UserWarning, match="Could not unapply old version"):
+        assert watcher.scan() == []
+    assert module.sample() == 5
+
+
+def test_start_twice(patch_dir):
+    watcher = patchy.PatchWatcher([str(patch_dir)], interval=0.01)
+    with watcher, pytest.raises(RuntimeError):
+        watcher.start()
+
+
+def test_stop_not_started(patch_dir):
+    watcher = patchy.PatchWatcher([str(patch_dir)])
+
+    watcher.stop()
+
+    assert watcher.backend is None
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="Linux only")
+def test_watch_inotify(module, patch_dir):
+    write_patch(patch_dir, "sample", 2)
+
+    with patchy.PatchWatcher([str(patch_dir)], interval=0.01) as watcher:
+        assert watcher.backend == "inotify"
+        assert module.sample() == 2
+
+        write_patch(patch_dir, "sample", 30)
+        wait_for(lambda: module.sample() == 30)
+
+    assert watcher.backend is None
+
+
+def test_watch_polling(module, patch_dir):
+    write_patch(patch_dir, "sample", 2)
+
+    with patchy.PatchWatcher(
+        [str(patch_dir)], interval=0.01, use_inotify=False
+    ) as watcher:
+        assert watcher.backend == "polling"
+        assert module.sample() == 2
+
+        write_patch(patch_dir, "sample", 30)
+        wait_for(lambda: module.sample() == 30)
+
+
+def test_watch_survives_bad_patch(module, patch_dir):
+    bad = patch_dir / "watch_mod.sample.patch"
+    with (
+        pytest.warns(UserWarning, match="Could not apply"),
+        patchy.PatchWatcher(
+            [str(patch_dir)], interval=0.01, use_inotify=False
+        ) as watcher,
+    ):
+        bad.write_bytes(b"\xff\xfe")
+        wait_for(lambda: str(bad) in watcher._stats)
+
+        write_patch(patch_dir, "sample", 30)
+        wait_for(lambda: module.sample() == 30)
+
+
+def test_watch_survives_scan_error(module, patch_dir, monkeypatch):
+    calls = []
+    orig_iter_patch_files = check.iter_patch_files
+
+    def iter_patch_files(patch_paths: Iterable[str]) -> list[tuple[str, str]]:
+        calls.append(True)
+        if len(calls) == 2:
+            raise OSError("Flaky disk")
+        return orig_iter_patch_files(patch_paths)
+
+    monkeypatch.setattr(watching, "iter_patch_files", iter_patch_files)
+
+    with (
+        pytest.warns(UserWarning, match="Could not scan patch files: Flaky disk"),
+        patchy.PatchWatcher([str(patch_dir)], interval=0.01, use_inotify=False),
+    ):
+        wait_for(lambda: len(calls) > 2)
+        write_patch(patch_dir, "sample", 30)
+        wait_for(lambda: module.sample() == 30)
+
+
+def test_watch_missing_directory_polls(tmp_path):
+    with patchy.PatchWatcher(
+        [str(tmp_path / "missing" / "watch_mod.sample.patch")], interval=0.01
+    ) as watcher:
+        assert watcher.backend == "polling"
+
+
+def test_drain_end_of_file():
+    read_fd, write_fd = os.pipe()
+    os.write(write_fd, b"event")
+    os.close(write_fd)
+    try:
+        watching._drain(read_fd)
+
+        assert os.read(read_fd, 1) == b""
+    finally:
+        os.close(read_fd)